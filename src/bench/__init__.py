@@ -0,0 +1,14 @@
+# synthetic data + benchmark package
+
+from .synthetic import write_synthetic_bag, make_feature_frame, racecar_topics
+from .harness import run_benchmarks, run_case, compare, save_results
+
+__all__ = [
+    "write_synthetic_bag",
+    "make_feature_frame",
+    "racecar_topics",
+    "run_benchmarks",
+    "run_case",
+    "compare",
+    "save_results",
+]
@@ -0,0 +1,273 @@
+# benchmark harness for the proxy, feature and training paths
+#
+# every case runs in a fresh spawned process so peak RSS belongs to that case
+# alone. results are plain JSON so two commits can be diffed with compare().
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import multiprocessing as mp
+from datetime import datetime
+from pathlib import Path
+from queue import Empty
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+BENCHES = ["cli_startup", "process_one_bag", "get_distance_km_from_topic", "extract_all_features", "run_pipeline"]
+
+# `<script> --help` is timed in a fresh interpreter, so the number is the
+# import cost of the script plus interpreter startup
+STARTUP_SCRIPTS = ["run_proxy.py", "extract_features.py", "train_model.py", "score.py", "export_onboard.py"]
+HEAVY_MODULES = ["numpy", "pandas", "sklearn", "xgboost", "matplotlib", "joblib", "yaml"]
+
+# a distance case whose km is further than this (relative) from the
+# generator's path length fails, a fast wrong answer is no benchmark
+DIST_TOLERANCE = 0.05
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # linux reports KiB, macOS bytes
+    if sys.platform == "darwin":
+        return round(peak / 1e6, 2)
+    return round(peak / 1024, 2)
+
+
+def _run_case(bench, params, queue):
+    # runs inside the child process
+    try:
+        if bench == "process_one_bag":
+            from proxy.compute import process_one_bag
+            from utils.loaders import load_weights
+            weights = load_weights(params.get("weights"))
+            t0 = time.perf_counter()
+            process_one_bag(Path(params["db_path"]), weights)
+            wall = time.perf_counter() - t0
+
+        elif bench == "get_distance_km_from_topic":
+            from proxy.odometry import get_distance_km_from_topic
+            t0 = time.perf_counter()
+            km = get_distance_km_from_topic(params["db_path"])
+            wall = time.perf_counter() - t0
+            expected = params.get("expected_km")
+            if expected and (km is None or abs(km - expected) > DIST_TOLERANCE * expected):
+                queue.put({"ok": False, "km": km, "expected_km": expected,
+                           "error": f"distance {km if km is None else round(km, 3)} km, generator drove {expected} km"})
+                return
+
+        elif bench == "extract_all_features":
+            from features import extract_all_features
+            t0 = time.perf_counter()
+            extract_all_features(
+                root_path=params["data_dir"],
+                output_csv=params["output_csv"],
+                slice_seconds=params.get("slice_seconds", 60),
+                weights_path=params.get("weights"),
+            )
+            wall = time.perf_counter() - t0
+
+        elif bench == "run_pipeline":
+            import matplotlib
+            matplotlib.use("Agg")
+            from utils.loaders import load_and_prepare
+            from ml import run_pipeline
+            X, y, feats, groups, _, df = load_and_prepare(params["features_csv"])
+            t0 = time.perf_counter()
+            run_pipeline(
+                X, y, df, feats, groups,
+                output_dir=params["output_dir"],
+                plots_dir=Path(params["output_dir"]) / "plots",
+                n_estimators=params.get("n_estimators", 100),
+                skip_plots=True,
+                verbose=False,
+            )
+            wall = time.perf_counter() - t0
+
+        else:
+            raise ValueError(f"unknown bench: {bench}")
+
+        queue.put({"ok": True, "wall_s": wall, "peak_rss_mb": _peak_rss_mb()})
+    except Exception as e:
+        queue.put({"ok": False, "error": repr(e)})
+
+
+def run_case(bench, params, repeat=1):
+    # best-of-N wall time, peak RSS of the worst repeat
+    ctx = mp.get_context("spawn")
+    walls = []
+    rss = []
+    for _ in range(repeat):
+        q = ctx.Queue()
+        p = ctx.Process(target=_run_case, args=(bench, params, q))
+        p.start()
+        res = None
+        while res is None:
+            try:
+                res = q.get(timeout=1.0)
+            except Empty:
+                if p.is_alive():
+                    continue
+                # crashed (segfault, OOM kill) before putting a result, the
+                # last get covers a result still in flight when it exited
+                try:
+                    res = q.get(timeout=1.0)
+                except Empty:
+                    res = {"ok": False, "error": f"case process died with exit code {p.exitcode}"}
+        p.join()
+        if not res["ok"]:
+            return res
+        walls.append(res["wall_s"])
+        if res["peak_rss_mb"] is not None:
+            rss.append(res["peak_rss_mb"])
+
+    return {
+        "ok": True,
+        "wall_s": round(min(walls), 4),
+        "wall_s_all": [round(w, 4) for w in walls],
+        "peak_rss_mb": max(rss) if rss else None,
+    }
+
+
+def cli_startup(script, repeat=3):
+    # best-of-N wall time of `python <script> --help`, plus which heavy
+    # modules it imported (from -X importtime)
+    path = Path(__file__).resolve().parent.parent / "scripts" / script
+    walls = []
+    for _ in range(max(repeat, 3)):
+        t0 = time.perf_counter()
+        out = subprocess.run([sys.executable, str(path), "--help"], capture_output=True)
+        walls.append(time.perf_counter() - t0)
+        if out.returncode != 0:
+            return {"ok": False, "error": out.stderr.decode(errors="replace")[-500:]}
+    out = subprocess.run([sys.executable, "-X", "importtime", str(path), "--help"], capture_output=True, text=True)
+    imported = {line.rsplit("|", 1)[-1].strip() for line in out.stderr.splitlines() if line.startswith("import time:")}
+    return {
+        "ok": True,
+        "wall_s": round(min(walls), 4),
+        "wall_s_all": [round(w, 4) for w in walls],
+        "peak_rss_mb": None,
+        "heavy_imports": [m for m in HEAVY_MODULES if m in imported],
+    }
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=Path(__file__).resolve().parent)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run_benchmarks(work_dir, durations=(60, 300), feature_rows=(2000, 20000), benches=None,
+                   repeat=1, weights_path=None, n_vehicles=1, rate_scale=1.0, payload_scale=0.01):
+    from .synthetic import write_synthetic_bag, make_feature_frame
+    from utils.loaders import load_weights
+
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    if benches is None:
+        benches = BENCHES
+    weights = load_weights(weights_path)
+
+    results = []
+
+    if "cli_startup" in benches:
+        for script in STARTUP_SCRIPTS:
+            res = cli_startup(script, repeat=repeat)
+            res.update({"bench": "cli_startup", "size": script})
+            results.append(res)
+            heavy = ", ".join(res.get("heavy_imports", [])) or "-"
+            print(f"  {'cli_startup':<28} {script:>20}  {res.get('wall_s', float('nan')) * 1000:8.1f}ms  ({heavy})")
+
+    bag_benches = ["process_one_bag", "get_distance_km_from_topic", "extract_all_features"]
+    for dur in durations if any(b in benches for b in bag_benches) else []:
+        # one bag per size, reused by all bag-level benches
+        data_dir = work_dir / f"bags_{dur:g}s"
+        db_path = data_dir / "S0" / f"SYN-{dur:g}s.db3"
+        info = write_synthetic_bag(db_path, duration_s=dur, n_vehicles=n_vehicles, rate_scale=rate_scale,
+                                   payload_scale=payload_scale, weights=weights)
+        mb = info["bytes"] / 1e6
+        print(f"  bag {db_path.name}: {info['n_messages']} msgs, {mb:.1f} MB")
+
+        for bench in bag_benches:
+            if bench not in benches:
+                continue
+            params = {"db_path": str(db_path), "data_dir": str(data_dir), "weights": weights_path,
+                      "output_csv": str(work_dir / f"features_{dur:g}s.csv"), "expected_km": info["expected_km"]}
+            res = run_case(bench, params, repeat=repeat)
+            res.update({"bench": bench, "size": f"{dur:g}s", "n_messages": info["n_messages"], "mb": round(mb, 2)})
+            if res["ok"] and res["wall_s"] > 0:
+                res["msgs_per_s"] = round(info["n_messages"] / res["wall_s"], 1)
+                res["mb_per_s"] = round(mb / res["wall_s"], 2)
+            results.append(res)
+            print(f"  {bench:<28} {res['size']:>8}  {res.get('wall_s', float('nan')):8.3f}s")
+            if not res["ok"]:
+                print(f"    failed: {res['error']}")
+
+    if "run_pipeline" in benches:
+        for n in feature_rows:
+            csv_path = work_dir / f"synthetic_features_{n}.csv"
+            make_feature_frame(n).to_csv(csv_path, index=False)
+            params = {"features_csv": str(csv_path), "output_dir": str(work_dir / f"models_{n}")}
+            res = run_case("run_pipeline", params, repeat=repeat)
+            res.update({"bench": "run_pipeline", "size": f"{n}rows", "n_rows": n})
+            if res["ok"] and res["wall_s"] > 0:
+                res["rows_per_s"] = round(n / res["wall_s"], 1)
+            results.append(res)
+            print(f"  {'run_pipeline':<28} {res['size']:>8}  {res.get('wall_s', float('nan')):8.3f}s")
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "rate_scale": rate_scale,
+            "payload_scale": payload_scale,
+            "n_vehicles": n_vehicles,
+        },
+        "results": results,
+    }
+
+
+def compare(old, new, threshold=0.10):
+    # returns rows of (bench, size, old, new, ratio, regression?) keyed on bench+size
+    old_map = {(r["bench"], r["size"]): r for r in old["results"] if r.get("ok")}
+    rows = []
+    for r in new["results"]:
+        key = (r["bench"], r["size"])
+        if not r.get("ok") or key not in old_map:
+            continue
+        o = old_map[key]["wall_s"]
+        n = r["wall_s"]
+        ratio = n / o if o > 0 else float("inf")
+        rows.append({
+            "bench": r["bench"],
+            "size": r["size"],
+            "old_wall_s": o,
+            "new_wall_s": n,
+            "ratio": round(ratio, 3),
+            "old_rss_mb": old_map[key].get("peak_rss_mb"),
+            "new_rss_mb": r.get("peak_rss_mb"),
+            "regression": ratio > 1 + threshold,
+        })
+    return rows
+
+
+def save_results(results, path):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,351 @@
+# synthetic rosbag2 (.db3) generator with the RACECAR topic layout
+#
+# writes the same sqlite schema rosbag2 uses (topics / messages + timestamp
+# index). odometry and bestpos are real little-endian CDR messages driving
+# around an oval, everything else is a fixed size dummy payload so bags of
+# any size can be made quickly.
+
+import math
+import re
+import sqlite3
+from pathlib import Path
+
+import numpy as np
+
+
+# (topic template, msg type, rate hz, payload bytes at payload_scale=1.0)
+CAMERAS = ["front_left", "front_right", "front_left_center", "front_right_center", "rear_left", "rear_right"]
+LIDARS = ["front", "left", "right"]
+SIDE_RADARS = ["left", "right"]
+NOVATELS = ["novatel_top", "novatel_bottom"]
+
+NOVATEL_TOPICS = [
+    ("bestpos", "novatel_oem7_msgs/msg/BESTPOS", 20.0, None),
+    ("bestgnsspos", "novatel_oem7_msgs/msg/BESTGNSSPOS", 20.0, None),
+    ("bestvel", "novatel_oem7_msgs/msg/BESTVEL", 20.0, 120),
+    ("rawimux", "novatel_oem7_msgs/msg/RAWIMU", 125.0, 100),
+    ("heading2", "novatel_oem7_msgs/msg/HEADING2", 1.0, 120),
+    ("oem7raw", "novatel_oem7_msgs/msg/Oem7RawMsg", 50.0, 400),
+    ("time", "novatel_oem7_msgs/msg/TIME", 1.0, 80),
+]
+
+RADAR_FRONT_TOPICS = [
+    ("esr_status1", "delphi_esr_msgs/msg/EsrStatus1", 20.0, 80),
+    ("esr_track", "delphi_esr_msgs/msg/EsrTrack", 1280.0, 90),
+    ("esr_valid1", "delphi_esr_msgs/msg/EsrValid1", 20.0, 80),
+    ("esr_vehicle1", "delphi_esr_msgs/msg/EsrVehicle1", 20.0, 80),
+    ("from_can_bus", "can_msgs/msg/Frame", 3500.0, 40),
+    ("to_can_bus", "can_msgs/msg/Frame", 20.0, 40),
+    ("radar_visz_moving", "visualization_msgs/msg/Marker", 20.0, 600),
+]
+
+# Las Vegas Motor Speedway, used as the origin for the bestpos track
+ORIGIN_LAT = 36.2720
+ORIGIN_LON = -115.0108
+EARTH_R = 6371008.8
+
+
+class _CdrWriter:
+    # minimal little-endian CDR encoder (alignment is relative to the body,
+    # i.e. after the 4 byte encapsulation header)
+
+    def __init__(self):
+        self.buf = bytearray(b"\x00\x01\x00\x00")
+
+    def _align(self, n):
+        pad = (-(len(self.buf) - 4)) % n
+        if pad:
+            self.buf += b"\x00" * pad
+
+    def _put(self, fmt, size, value):
+        self._align(size)
+        self.buf += np.array([value], dtype=fmt).tobytes()
+
+    def u8(self, v):
+        self.buf += bytes([v & 0xFF])
+
+    def u16(self, v):
+        self._put("<u2", 2, v)
+
+    def u32(self, v):
+        self._put("<u4", 4, v)
+
+    def i32(self, v):
+        self._put("<i4", 4, v)
+
+    def f32(self, v):
+        self._put("<f4", 4, v)
+
+    def f64(self, v):
+        self._put("<f8", 8, v)
+
+    def f64s(self, values):
+        self._align(8)
+        self.buf += np.asarray(values, dtype="<f8").tobytes()
+
+    def string(self, s):
+        raw = s.encode() + b"\x00"
+        self.u32(len(raw))
+        self.buf += raw
+
+    def header(self, t_ns, frame_id):
+        self.i32(int(t_ns // 1_000_000_000))
+        self.u32(int(t_ns % 1_000_000_000))
+        self.string(frame_id)
+
+    def bytes(self):
+        return bytes(self.buf)
+
+
+def encode_odometry(t_ns, x, y, yaw, speed, frame_id="odom", child_frame_id="base_link"):
+    # nav_msgs/msg/Odometry
+    w = _CdrWriter()
+    w.header(t_ns, frame_id)
+    w.string(child_frame_id)
+    w.f64s([x, y, 0.0])
+    w.f64s([0.0, 0.0, math.sin(yaw / 2), math.cos(yaw / 2)])
+    w.f64s([0.0] * 36)
+    w.f64s([speed, 0.0, 0.0])
+    w.f64s([0.0, 0.0, 0.0])
+    w.f64s([0.0] * 36)
+    return w.bytes()
+
+
+def encode_bestpos(t_ns, lat, lon, hgt, seq, frame_id="gps", message_name="BESTPOS", message_id=42):
+    # novatel_oem7_msgs/msg/BESTPOS (BESTGNSSPOS has the same layout)
+    w = _CdrWriter()
+    w.header(t_ns, frame_id)
+    # Oem7Header
+    w.string(message_name)
+    w.u16(message_id)
+    w.u8(0)
+    w.u32(seq)
+    w.u8(180)
+    w.u16(2200)
+    w.u32(int(t_ns // 1_000_000) % 604_800_000)
+    # solution
+    w.u32(0)
+    w.u32(50)
+    w.f64(lat)
+    w.f64(lon)
+    w.f64(hgt)
+    w.f32(-24.0)
+    w.u32(61)
+    w.f32(0.02)
+    w.f32(0.02)
+    w.f32(0.04)
+    for c in b"0\x00\x00\x00":
+        w.u8(c)
+    w.f32(1.0)
+    w.f32(0.0)
+    for v in (20, 18, 18, 16, 0, 0, 0, 0):
+        w.u8(v)
+    return w.bytes()
+
+
+def track_position(t_s, speed_mps, track_km=2.4):
+    # oval-ish track: a circle of the given circumference, constant speed
+    radius = track_km * 1000.0 / (2 * math.pi)
+    theta = (speed_mps * t_s) / radius
+    x = radius * np.cos(theta)
+    y = radius * np.sin(theta)
+    yaw = theta + math.pi / 2
+    return x, y, yaw
+
+
+def xy_to_latlon(x, y):
+    lat = ORIGIN_LAT + np.degrees(y / EARTH_R)
+    lon = ORIGIN_LON + np.degrees(x / (EARTH_R * math.cos(math.radians(ORIGIN_LAT))))
+    return lat, lon
+
+
+def racecar_topics(n_vehicles=1, cameras=6, lidars=3, side_radars=2, first_vehicle=3):
+    # concrete topic names following the weight patterns in configs/weights.yaml
+    out = []
+    for v in range(first_vehicle, first_vehicle + n_vehicles):
+        ns = f"/vehicle_{v}"
+        for cam in CAMERAS[:cameras]:
+            out.append((f"{ns}/camera/{cam}/image/compressed", "sensor_msgs/msg/CompressedImage", 20.0, 150_000))
+        for lid in LIDARS[:lidars]:
+            out.append((f"{ns}/luminar_{lid}_points", "sensor_msgs/msg/PointCloud2", 20.0, 1_200_000))
+        for nov in NOVATELS:
+            for name, mtype, rate, size in NOVATEL_TOPICS:
+                out.append((f"{ns}/{nov}/{name}", mtype, rate, size))
+        for name, mtype, rate, size in RADAR_FRONT_TOPICS:
+            out.append((f"{ns}/radar_front/{name}", mtype, rate, size))
+        for side in SIDE_RADARS[:side_radars]:
+            out.append((f"{ns}/radar_{side}/detection", "radar_msgs/msg/RadarDetection", 20.0, 2_000))
+            out.append((f"{ns}/radar_{side}/marker", "visualization_msgs/msg/Marker", 20.0, 600))
+        out.append((f"{ns}/local_odometry", "nav_msgs/msg/Odometry", 20.0, None))
+    return out
+
+
+def check_topics_against_weights(topics, weights):
+    # every generated topic should hit a weight pattern, otherwise the
+    # generator and the config have drifted apart
+    missing = []
+    for name, _, _, _ in topics:
+        if not any(re.match(p, name) for p in weights):
+            missing.append(name)
+    return missing
+
+
+def write_synthetic_bag(
+    db_path,
+    duration_s=60.0,
+    n_vehicles=1,
+    cameras=6,
+    lidars=3,
+    side_radars=2,
+    rate_scale=1.0,
+    payload_scale=0.01,
+    speed_mps=40.0,
+    jitter=0.05,
+    drop_prob=0.0,
+    seed=0,
+    start_ns=1_640_000_000_000_000_000,
+    weights=None,
+):
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+
+    rng = np.random.default_rng(seed)
+    topics = racecar_topics(n_vehicles, cameras, lidars, side_radars)
+
+    if weights:
+        missing = check_topics_against_weights(topics, weights)
+        if missing:
+            print(f"Warning: {len(missing)} synthetic topics match no weight pattern, e.g. {missing[0]}")
+
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    cur.execute("PRAGMA journal_mode=OFF")
+    cur.execute("PRAGMA synchronous=OFF")
+    cur.execute(
+        "CREATE TABLE topics(id INTEGER PRIMARY KEY, name TEXT NOT NULL, type TEXT NOT NULL, "
+        "serialization_format TEXT NOT NULL, offered_qos_profiles TEXT NOT NULL)"
+    )
+    cur.execute(
+        "CREATE TABLE messages(id INTEGER PRIMARY KEY, topic_id INTEGER NOT NULL, "
+        "timestamp INTEGER NOT NULL, data BLOB NOT NULL)"
+    )
+
+    dur_ns = int(duration_s * 1e9)
+    all_tid = []
+    all_ts = []
+    blobs = {}
+    kinds = {}
+
+    for tid, (name, mtype, rate, size) in enumerate(topics, start=1):
+        cur.execute("INSERT INTO topics VALUES (?, ?, ?, 'cdr', '')", (tid, name, mtype))
+
+        rate = rate * rate_scale
+        n = int(duration_s * rate)
+        if n <= 0:
+            continue
+        period = 1e9 / rate
+        ts = start_ns + (np.arange(n) * period).astype(np.int64)
+        if jitter > 0:
+            ts += (rng.normal(0.0, jitter * period, n)).astype(np.int64)
+        if drop_prob > 0:
+            ts = ts[rng.random(n) >= drop_prob]
+        ts = np.clip(ts, start_ns, start_ns + dur_ns - 1)
+
+        all_tid.append(np.full(len(ts), tid, dtype=np.int32))
+        all_ts.append(ts)
+
+        if name.endswith("local_odometry"):
+            kinds[tid] = "odom"
+        elif name.endswith("/bestpos") or name.endswith("/bestgnsspos"):
+            kinds[tid] = "bestgnsspos" if name.endswith("gnsspos") else "bestpos"
+        else:
+            kinds[tid] = "blob"
+            blobs[tid] = rng.integers(0, 256, max(8, int(size * payload_scale)), dtype=np.uint8).tobytes()
+
+    tids = np.concatenate(all_tid)
+    tss = np.concatenate(all_ts)
+    order = np.argsort(tss, kind="stable")
+    tids = tids[order]
+    tss = tss[order]
+
+    # vehicles start spread around the track so multi-agent bags differ
+    vehicle_of = {}
+    for tid, (name, _, _, _) in enumerate(topics, start=1):
+        vehicle_of[tid] = int(name.split("/")[1].split("_")[1])
+
+    seqs = {}
+
+    def rows():
+        for tid, ts in zip(tids.tolist(), tss.tolist()):
+            kind = kinds[tid]
+            if kind == "blob":
+                yield (tid, ts, blobs[tid])
+                continue
+
+            t_s = (ts - start_ns) / 1e9 + vehicle_of[tid] * 7.0
+            x, y, yaw = track_position(t_s, speed_mps)
+            if kind == "odom":
+                yield (tid, ts, encode_odometry(ts, float(x), float(y), float(yaw), speed_mps))
+            else:
+                lat, lon = xy_to_latlon(x, y)
+                seqs[tid] = seqs.get(tid, 0) + 1
+                name = "BESTGNSSPOS" if kind == "bestgnsspos" else "BESTPOS"
+                mid = 1429 if kind == "bestgnsspos" else 42
+                yield (tid, ts, encode_bestpos(ts, float(lat), float(lon), 600.0, seqs[tid],
+                                               message_name=name, message_id=mid))
+
+    cur.executemany("INSERT INTO messages (topic_id, timestamp, data) VALUES (?, ?, ?)", rows())
+    cur.execute("CREATE INDEX timestamp_idx ON messages (timestamp ASC)")
+    conn.commit()
+    conn.close()
+
+    return {
+        "path": str(db_path),
+        "duration_s": duration_s,
+        "n_topics": len(topics),
+        "n_messages": int(len(tss)),
+        "bytes": db_path.stat().st_size,
+        "expected_km": round(speed_mps * duration_s / 1000.0, 4),
+    }
+
+
+def make_feature_frame(n_rows, n_runs=20, seed=0):
+    # synthetic features.csv-shaped table for timing the training path
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    run = rng.integers(0, n_runs, n_rows)
+    speed = rng.uniform(60, 260, n_runs)[run] + rng.normal(0, 5, n_rows)
+    duration = np.full(n_rows, 60.0)
+    dist = speed * duration / 3600
+
+    image = rng.uniform(0.005, 0.03, n_rows)
+    lidar = rng.uniform(0.005, 0.02, n_rows)
+    radar = rng.uniform(0.5, 0.8, n_rows)
+    imu = rng.uniform(0.02, 0.04, n_rows)
+    odom = rng.uniform(0.001, 0.004, n_rows)
+    total = rng.uniform(3e5, 6e5, n_rows)
+    weighted = total * (3 * image + 10 * lidar + 1.5 * radar + 2.5 * imu + 0.1 * odom) + rng.normal(0, 1e4, n_rows)
+
+    return pd.DataFrame({
+        "run_id": [f"SYN-{r:04d}" for r in run],
+        "bag_name": [f"SYN-{r:04d}_slice{i}" for i, r in enumerate(run)],
+        "slice_idx": np.arange(n_rows),
+        "duration": duration,
+        "distance_km": dist,
+        "weighted_pts": weighted,
+        "pts_per_km": weighted / dist,
+        "total_msgs": total.astype(int),
+        "avg_speed_kmh": speed,
+        "image_ratio": image,
+        "lidar_ratio": lidar,
+        "radar_ratio": radar,
+        "imu_ratio": imu,
+        "odometry_ratio": odom,
+        "lidar_to_camera_ratio": lidar / image,
+        "radar_to_lidar_ratio": radar / lidar,
+        "perception_to_nav_ratio": (image + lidar + radar) / (imu + odom),
+        "n_active_topics": rng.integers(55, 70, n_rows),
+    })
@@ -1,9 +1,12 @@
 # feature extraction package
 
-from .extractors import extract_features
+from .extractors import extract_features, extract_features_per_vehicle
 from .build_features import extract_all_features
+from .slicer import extract_distance_slices
 
 __all__ = [
     "extract_features",
+    "extract_features_per_vehicle",
     "extract_all_features",
+    "extract_distance_slices",
 ]
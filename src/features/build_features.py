@@ -1,15 +1,20 @@
 # main feature pipeline
 
 import sqlite3
-import csv
+import os
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from .extractors import extract_features
+from .extractors import extract_features, extract_features_per_vehicle
+from .slicer import extract_distance_slices
+from proxy.jitter import topic_gap_stats, gap_feature_columns
 from utils.loaders import load_weights, normalize_weights
 from utils.db_utils import find_all_db3_files
+from utils.progress import ProgressTracker
+from utils.tables import write_rows, parquet_engine
+from utils.store import ResultsStore
 
 
 def extract_all_features(
@@ -19,6 +24,17 @@ def extract_all_features(
     exclude_patterns=None,
     weights_path=None,
     odometry_topic="local_odometry",
+    progress_log=None,
+    metrics_file=None,
+    per_vehicle=False,
+    distance_sources=None,
+    slice_mode="time",
+    slice_km=1.0,
+    min_lap_km=1.0,
+    lap_radius_m=30.0,
+    gap_stats=True,
+    output_format="csv",
+    store=None,
 ):
     if root_path is None:
         root_path = Path(".")
@@ -30,6 +46,13 @@ def extract_all_features(
     
     print("FEATURE EXTRACTION")
     
+    if output_format == "parquet":
+        parquet_engine()  # fail before the extraction, not after
+    
+    if slice_mode != "time" and per_vehicle:
+        print("Per-vehicle output only works with time slices, ignoring --per-vehicle")
+        per_vehicle = False
+    
     weight_map = load_weights(weights_path)
     weight_map = normalize_weights(weight_map)
     
@@ -44,6 +67,8 @@ def extract_all_features(
     all_rows = []
     slice_ns = int(slice_seconds * 1e9)
     count = 0
+    progress = ProgressTracker(len(db_files), "features", log_path=progress_log, metrics_path=metrics_file)
+    row_bags = []  # bag of every row, for the results store
 
     for db3_file in sorted(db_files):
         count += 1
@@ -57,10 +82,12 @@ def extract_all_features(
             db.close()
         except Exception as e:
             print(f"   Error reading database: {e}")
+            progress.update(db3_file.name, ok=False)
             continue
         
         if t_min is None or t_max is None:
             print(f"   No messages found, skipping")
+            progress.update(db3_file.name, nbytes=os.path.getsize(db3_file))
             continue
         
         current = int(t_min)
@@ -68,34 +95,77 @@ def extract_all_features(
         idx = 0
         bag_name = db3_file.stem
         slice_count = 0
+        bag_msgs = 0
         
-        while current < t_max_i:
-            row = extract_features(
-                str(db3_file),
-                current,
-                current + slice_ns,
-                bag_name,
-                idx,
-                weight_map,
-                odometry_topic
+        if slice_mode != "time":
+            rows = extract_distance_slices(
+                db3_file, bag_name, weight_map, odometry_topic, distance_sources,
+                mode=slice_mode, slice_km=slice_km, min_lap_km=min_lap_km, lap_radius_m=lap_radius_m,
+                gap_stats=gap_stats,
             )
-            if row:
+            all_rows.extend(rows)
+            slice_count = len(rows)
+            bag_msgs = sum(r["total_msgs"] for r in rows)
+            current = t_max_i  # skip the time loop
+        
+        # inter-arrival stats for every time slice from one ordered pass
+        segments = None
+        if gap_stats and current < t_max_i:
+            n_slices = -(-(t_max_i - current) // slice_ns)
+            segments = topic_gap_stats(str(db3_file), [current + k * slice_ns for k in range(n_slices + 1)])
+        
+        while current < t_max_i:
+            if per_vehicle:
+                rows = extract_features_per_vehicle(
+                    str(db3_file), current, current + slice_ns, bag_name, idx, weight_map, odometry_topic,
+                    distance_sources
+                )
+            else:
+                row = extract_features(
+                    str(db3_file),
+                    current,
+                    current + slice_ns,
+                    bag_name,
+                    idx,
+                    weight_map,
+                    odometry_topic,
+                    distance_sources
+                )
+                rows = [row] if row else []
+            for row in rows:
+                if segments is not None:
+                    row.update(gap_feature_columns(segments[idx], row["vehicle_id"]))
                 all_rows.append(row)
+                bag_msgs += row["total_msgs"]
+            if rows:
                 slice_count += 1
             current += slice_ns
             idx += 1
         
+        row_bags.extend([db3_file] * (len(all_rows) - len(row_bags)))
         print(f"   Extracted {slice_count} slices")
+        progress.update(db3_file.name, msgs=bag_msgs, nbytes=os.path.getsize(db3_file))
+    
+    progress.finish()
     
     print("SAVING RESULTS")
     
     if all_rows:
-        output_path = Path(output_csv)
-        with open(output_path, "w", newline="") as f:
-            writer = csv.DictWriter(f, fieldnames=all_rows[0].keys())
-            writer.writeheader()
-            writer.writerows(all_rows)
+        output_path = write_rows(all_rows, output_csv, output_format)
         print(f"Saved {len(all_rows)} feature rows to: {output_path}")
+        if store:
+            if slice_mode == "time":
+                slicing = f"time:{slice_seconds:g}"
+            elif slice_mode == "distance":
+                slicing = f"distance:{slice_km:g}"
+            else:
+                slicing = f"lap:{min_lap_km:g}:{lap_radius_m:g}"
+            if per_vehicle:
+                # per-vehicle and aggregate rows of a bag must not mix
+                slicing += ":vehicle"
+            with ResultsStore(store) as st:
+                st.add_feature_rows(all_rows, slicing, row_bags)
+            print(f"Stored {len(all_rows)} rows in: {store}")
     else:
         print("No valid data extracted.")
     
@@ -11,12 +11,12 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from proxy.deterministic import weighted_msg_count
-from proxy.odometry import (
-    get_distance_km_from_topic,
-)
+from proxy.distance import get_distance_km, distance_sources
+from proxy.vehicles import per_vehicle_weighted, ALL_VEHICLES
 
 
-def extract_features(db_path, start_ns, end_ns, bag_name, slice_idx, weight_map, odometry_topic="local_odometry"):
+def extract_features(db_path, start_ns, end_ns, bag_name, slice_idx, weight_map, odometry_topic="local_odometry",
+                     sources=None):
     # exrtact features for one time slice
 
     conn = sqlite3.connect(db_path)
@@ -39,6 +39,36 @@ def extract_features(db_path, start_ns, end_ns, bag_name, slice_idx, weight_map,
         return None
 
     topic_counts = {topics.get(tid, "<unknown>"): cnt for tid, cnt in rows}
+    weighted_counts = weighted_msg_count(db_path, weight_map, start_ns=start_ns, end_ns=end_ns)
+    total_weighted_pts = sum(weighted_counts.values())
+    distance_km = get_distance_km(db_path, distance_sources(odometry_topic, sources), start_ns=start_ns, end_ns=end_ns)
+
+    return build_feature_row(bag_name, slice_idx, duration, topic_counts, total_weighted_pts, distance_km)
+
+
+def extract_features_per_vehicle(db_path, start_ns, end_ns, bag_name, slice_idx, weight_map, odometry_topic="local_odometry",
+                                 sources=None):
+    # same slice, one row per vehicle namespace. counts and odometry for all
+    # vehicles come from one query each instead of a pass per vehicle
+    duration = (end_ns - start_ns) / 1e9
+    if duration <= 0:
+        return []
+
+    out = []
+    by_vehicle = per_vehicle_weighted(db_path, weight_map, odometry_topic, start_ns=start_ns, end_ns=end_ns,
+                                      sources=sources)
+    for vid, v in by_vehicle.items():
+        if not v["counts"]:
+            continue
+        out.append(build_feature_row(
+            bag_name, slice_idx, duration, v["counts"], sum(v["weighted"].values()), v["distance_km"],
+            vehicle=vid,
+        ))
+    return out
+
+
+def build_feature_row(run_id, slice_idx, duration, topic_counts, total_weighted_pts, distance_km, vehicle=ALL_VEHICLES):
+    # features for one slice from its per-topic counts
     total_msgs = sum(topic_counts.values())
     image_msgs = sum(c for t, c in topic_counts.items() if "image" in t.lower())
     lidar_msgs = sum(c for t, c in topic_counts.items() if "luminar" in t.lower() or "lidar" in t.lower())
@@ -67,18 +97,22 @@ def extract_features(db_path, start_ns, end_ns, bag_name, slice_idx, weight_map,
     radar_to_lidar_ratio = radar_msgs / lidar_msgs if lidar_msgs > 0 else 0
     perception_to_nav_ratio = perception_msgs / navigation_msgs if navigation_msgs > 0 else 0
 
-    weighted_counts = weighted_msg_count(db_path, weight_map, start_ns=start_ns, end_ns=end_ns)
-    total_weighted_pts = sum(weighted_counts.values())
-    distance_km = get_distance_km_from_topic(db_path, topic_name_substring=odometry_topic, start_ns=start_ns, end_ns=end_ns)
-    
     duration_hours = duration / 3600
     avg_speed_kmh = distance_km / duration_hours if (distance_km and duration_hours > 0) else 0
     
     pts_per_km = (total_weighted_pts / distance_km) if distance_km and distance_km > 0 else "N/A"
 
+    # per-vehicle rows keep run_id = bag so the grouped split never
+    # separates vehicles of the same run
+    if vehicle == ALL_VEHICLES:
+        slice_name = f"{run_id}_slice{slice_idx}"
+    else:
+        slice_name = f"{run_id}_{vehicle}_slice{slice_idx}"
+
     return {
-        "run_id": bag_name,
-        "bag_name": f"{bag_name}_slice{slice_idx}",
+        "run_id": run_id,
+        "vehicle_id": vehicle,
+        "bag_name": slice_name,
         "slice_idx": slice_idx,
         
         "duration": duration,
@@ -0,0 +1,158 @@
+# distance / lap slicing
+#
+# a cumulative distance index is built once per bag, segment boundaries come
+# out of np.searchsorted on it, and every message is dropped into its segment
+# during one ordered pass over (topic_id, timestamp). per-km slices cost about
+# the same as per-minute ones that way. the per-topic gap stats ride along
+# in the same pass.
+
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from proxy.deterministic import match_weights
+from proxy.distance import build_distance_index, distance_sources
+from proxy.jitter import GapStats, gap_feature_columns
+
+from .extractors import build_feature_row
+
+
+SCAN_BATCH_SIZE = 100_000
+
+
+def distance_boundaries(index, slice_km, t_min, t_max):
+    # segment edges in ns: the bag start, every slice_km crossing, bag end + 1.
+    # also returns each segment's distance
+    cum = index["cum_km"]
+    t = index["t_ns"]
+
+    marks = np.arange(slice_km, cum[-1], slice_km)
+    cross = np.searchsorted(cum, marks, side="left")
+    edges = np.concatenate(([t_min], t[cross], [t_max + 1])).astype(np.int64)
+
+    km_edges = np.concatenate(([0.0], marks, [cum[-1]]))
+    seg_km = np.diff(km_edges)
+    return edges, seg_km
+
+
+def lap_boundaries(index, t_min, t_max, min_lap_km=1.0, radius_m=30.0):
+    # a lap closes whenever the car comes back within radius_m of where the
+    # track starts, having driven at least min_lap_km since the last closure
+    x = index["x_m"]
+    y = index["y_m"]
+    cum = index["cum_km"]
+    t = index["t_ns"]
+
+    d = np.hypot(x - x[0], y - y[0])
+    near = np.flatnonzero(d < radius_m)
+
+    # each pass through the start circle is one run of consecutive indices,
+    # the closest point of the run is where the lap ends
+    runs = np.split(near, np.flatnonzero(np.diff(near) > 1) + 1) if len(near) else []
+    best = [r[np.argmin(d[r])] for r in runs if len(r)]
+
+    closes = []
+    last_km = 0.0
+    for i in best:
+        if cum[i] - last_km >= min_lap_km:
+            closes.append(i)
+            last_km = cum[i]
+
+    closes = np.asarray(closes, dtype=np.int64)
+    edges = np.concatenate(([t_min], t[closes], [t_max + 1])).astype(np.int64)
+    km_edges = np.concatenate(([0.0], cum[closes], [cum[-1]]))
+    return edges, np.diff(km_edges)
+
+
+def count_slices(db_path, edges, batch_size=SCAN_BATCH_SIZE, gaps=None):
+    # one ordered pass over (topic_id, timestamp). returns topic names and a
+    # (n_segments, n_topics) count matrix for the half-open segments [e_i, e_i+1).
+    # a GapStats passed as gaps is fed the same batches
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM topics")
+    topics = cur.fetchall()
+    col_of = {tid: j for j, (tid, _) in enumerate(topics)}
+    names = [name for _, name in topics]
+
+    n_seg = len(edges) - 1
+    n_top = len(topics) + 1  # last column catches topic ids missing from topics
+    counts = np.zeros(n_seg * n_top, dtype=np.int64)
+
+    # topic_id -> column lookup as an array
+    max_tid = max(col_of) if col_of else 0
+    lut = np.full(max_tid + 2, n_top - 1, dtype=np.int64)
+    for tid, j in col_of.items():
+        lut[tid] = j
+
+    cur.execute("SELECT topic_id, timestamp FROM messages ORDER BY timestamp")
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        arr = np.array(batch, dtype=np.int64)
+        if gaps is not None:
+            gaps.feed(arr[:, 0], arr[:, 1])
+        tid = np.clip(arr[:, 0], 0, max_tid + 1)
+        seg = np.searchsorted(edges, arr[:, 1], side="right") - 1
+        ok = (seg >= 0) & (seg < n_seg)
+        counts += np.bincount(seg[ok] * n_top + lut[tid[ok]], minlength=n_seg * n_top)
+    conn.close()
+
+    counts = counts.reshape(n_seg, n_top)
+    if counts[:, -1].any():
+        names.append("unknown")
+    else:
+        counts = counts[:, :-1]
+    return names, counts
+
+
+def extract_distance_slices(db_path, bag_name, weight_map, odometry_topic="local_odometry", sources=None,
+                            mode="distance", slice_km=1.0, min_lap_km=1.0, lap_radius_m=30.0, gap_stats=True):
+    # feature rows for per-km ("distance") or per-lap ("lap") segments of one bag
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(timestamp), MAX(timestamp) FROM messages")
+    t_min, t_max = cur.fetchone()
+    cur.execute("SELECT id, name FROM topics")
+    topics = dict(cur.fetchall())
+    conn.close()
+    if t_min is None:
+        return []
+
+    index = build_distance_index(str(db_path), distance_sources(odometry_topic, sources))
+    if index is None:
+        print("   No distance track, can't slice by distance")
+        return []
+
+    if mode == "lap":
+        edges, seg_km = lap_boundaries(index, t_min, t_max, min_lap_km=min_lap_km, radius_m=lap_radius_m)
+    else:
+        edges, seg_km = distance_boundaries(index, slice_km, t_min, t_max)
+
+    gaps = GapStats(topics, edges) if gap_stats else None
+    names, counts = count_slices(db_path, edges, gaps=gaps)
+    segments = gaps.finish() if gaps is not None else None
+    weights = np.array([match_weights(n, weight_map) for n in names])
+    weighted = counts @ weights
+
+    starts = np.concatenate(([0.0], np.cumsum(seg_km)[:-1]))
+
+    rows = []
+    for i in range(len(seg_km)):
+        duration = (edges[i + 1] - edges[i]) / 1e9
+        if duration <= 0 or not counts[i].any():
+            continue
+        nz = np.flatnonzero(counts[i])
+        topic_counts = {names[j]: int(counts[i, j]) for j in nz}
+        km = float(seg_km[i]) if seg_km[i] > 0 else None
+        row = build_feature_row(bag_name, i, duration, topic_counts, float(weighted[i]), km)
+        row["start_km"] = float(starts[i])
+        if segments is not None:
+            row.update(gap_feature_columns(segments[i]))
+        rows.append(row)
+    return rows
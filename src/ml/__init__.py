@@ -1,33 +1,65 @@
 # ML pipeline package
+#
+# nothing is imported up front: sklearn, xgboost, matplotlib and pandas
+# load on first access of a name below (PEP 562), so scripts that only
+# need one corner of the package (score.py, export_onboard.py, --help)
+# don't pay for the rest
 
-from utils.loaders import load_and_prepare, split_data
+import importlib
 
-from .train import train_and_evaluate, get_best_model
-from .save import save_model, save_importances, save_importance_summary, save_robustness_results
-from .robustness import test_feature_dropout
-from .plots import plot_feature_importance, plot_predictions, plot_robustness
-from .sanity import plot_sanity_checks
-from .pipeline import run_pipeline
-
-__all__ = [
+_LAZY = {
     # Pipeline
-    "run_pipeline",
+    "run_pipeline": ".pipeline",
+    "run_pipeline_out_of_core": ".outofcore",
+    "build_feature_memmap": ".outofcore",
+    "cross_validate": ".cv",
+    "fold_ids": ".cv",
     # Data loading
-    "load_and_prepare",
-    "split_data",
+    "load_and_prepare": "utils.loaders",
+    "split_data": "utils.loaders",
     # Training
-    "train_and_evaluate",
-    "get_best_model",
+    "make_model": ".models",
+    "thread_budget": ".models",
+    "successive_halving": ".search",
+    "ModelCache": ".cache",
+    "update_models": ".incremental",
+    "Scorer": ".score",
+    "train_and_evaluate": ".train",
+    "get_best_model": ".train",
     # Saving
-    "save_model",
-    "save_importances",
-    "save_importance_summary",
-    "save_robustness_results",
+    "save_model": ".save",
+    "save_importances": ".save",
+    "save_importance_summary": ".save",
+    "save_robustness_results": ".save",
+    "save_ablation_results": ".save",
+    "save_predictions": ".save",
     # Robustness
-    "test_feature_dropout",
+    "test_feature_dropout": ".robustness",
+    "run_ablation": ".ablation",
+    "ablation_grid": ".ablation",
     # Plotting
-    "plot_feature_importance",
-    "plot_predictions",
-    "plot_robustness",
-    "plot_sanity_checks",
-]
+    "plot_feature_importance": ".plots",
+    "plot_predictions": ".plots",
+    "plot_robustness": ".plots",
+    "plot_sanity_checks": ".sanity",
+    # Sanity checks
+    "run_sanity_checks": ".sanity",
+    "load_sanity_inputs": ".sanity",
+    "bootstrap_r": ".sanity",
+    "render_plots": ".render",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
+
+
+__all__ = list(_LAZY)
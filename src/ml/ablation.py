@@ -0,0 +1,135 @@
+# exhaustive sensor-ablation grid + permutation importance
+#
+# all 2^5 - 1 combinations of missing sensor families, and every feature
+# permuted n_repeats times. the work is cut into chunks that each fit under
+# DROPOUT_BATCH_ROWS stacked rows and spread over joblib workers (loky).
+# X_test / y_test go to the workers as read-only memmaps (joblib dumps
+# arrays above max_nbytes once and every worker maps the same file), the
+# model is pickled once per chunk. workers predict single threaded so
+# n_jobs processes don't each start a full thread pool.
+
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+
+from .robustness import (SENSOR_FAMILIES, DROPOUT_BATCH_ROWS, dropout_combinations, dropout_masks,
+                         predict_stacked, block_metrics)
+
+
+def ablation_grid():
+    # every non-empty set of missing families (31 for 5 families)
+    return dropout_combinations(max_size=len(SENSOR_FAMILIES), min_size=1)
+
+
+@contextmanager
+def _single_thread(model):
+    # n_jobs=1 while predicting, then the caller's value again: with n_jobs=1
+    # (or joblib's in-process path) the model here is the fitted model the
+    # pipeline saves and caches, not a pickled copy
+    params = model.get_params() if hasattr(model, "get_params") else {}
+    if "n_jobs" not in params:
+        yield model
+        return
+    model.set_params(n_jobs=1)
+    try:
+        yield model
+    finally:
+        model.set_params(n_jobs=params["n_jobs"])
+
+
+def _ablation_chunk(model, X, y, masks, columns):
+    with _single_thread(model):
+        pred = predict_stacked(model, X, masks, columns=columns)
+    return block_metrics(pred, y)
+
+
+def _permutation_chunk(model, X, y, tasks, columns, seed):
+    # tasks: (feature index, repeat) pairs, each gets its own seeded shuffle
+    n, k = X.shape
+    stack = np.repeat(np.asarray(X)[None, :, :], len(tasks), axis=0)
+    for i, (j, r) in enumerate(tasks):
+        rng = np.random.default_rng([seed, j, r])
+        stack[i, :, j] = X[rng.permutation(n), j]
+    flat = stack.reshape(-1, k)
+    if columns is not None:
+        flat = pd.DataFrame(flat, columns=columns, copy=False)
+    with _single_thread(model):
+        pred = np.asarray(model.predict(flat)).reshape(len(tasks), n)
+    return block_metrics(pred, y)
+
+
+def _chunks(items, per_chunk):
+    return [items[i:i + per_chunk] for i in range(0, len(items), per_chunk)]
+
+
+def run_ablation(model, X_test, y_test, feature_names, model_name, scenarios=None, n_repeats=5, n_jobs=-1,
+                 seed=0, batch_rows=DROPOUT_BATCH_ROWS):
+    # rows for the consolidated table: one per ablation scenario and one per
+    # feature (permutation importance = mean r2 drop over the repeats)
+    if scenarios is None:
+        scenarios = ablation_grid()
+
+    columns = list(X_test.columns) if hasattr(X_test, "columns") else None
+    names = columns if columns is not None else list(feature_names)
+    X = np.ascontiguousarray(np.asarray(X_test, dtype=np.float64))
+    y = np.asarray(y_test, dtype=np.float64)
+    n = len(X)
+
+    # baseline once in the parent
+    base_r2, base_rmse = block_metrics(
+        predict_stacked(model, X, np.zeros((1, len(names)), dtype=bool), columns=columns), y)
+    base_r2, base_rmse = float(base_r2[0]), float(base_rmse[0])
+
+    per_chunk = max(1, batch_rows // max(n, 1))
+    masks = dropout_masks(scenarios, names)
+    abl_chunks = _chunks(list(range(len(scenarios))), per_chunk)
+    perm_tasks = [(j, r) for j in range(len(names)) for r in range(n_repeats)]
+    perm_chunks = _chunks(perm_tasks, per_chunk)
+
+    jobs = [delayed(_ablation_chunk)(model, X, y, masks[c], columns) for c in abl_chunks]
+    jobs += [delayed(_permutation_chunk)(model, X, y, c, columns, seed) for c in perm_chunks]
+    res = Parallel(n_jobs=n_jobs, max_nbytes="1M", mmap_mode="r")(jobs)
+
+    abl_r2 = np.concatenate([r[0] for r in res[:len(abl_chunks)]]) if abl_chunks else np.empty(0)
+    abl_rmse = np.concatenate([r[1] for r in res[:len(abl_chunks)]]) if abl_chunks else np.empty(0)
+    perm_r2 = np.concatenate([r[0] for r in res[len(abl_chunks):]]) if perm_chunks else np.empty(0)
+    perm_rmse = np.concatenate([r[1] for r in res[len(abl_chunks):]]) if perm_chunks else np.empty(0)
+
+    def pct(rmse):
+        return (rmse - base_rmse) / base_rmse * 100 if base_rmse > 0 else 0.0
+
+    rows = []
+    for i, (name, feats) in enumerate(scenarios):
+        rows.append({
+            "model": model_name,
+            "kind": "ablation",
+            "name": name,
+            "n_families": name.count("+") + 1,
+            "r2": float(abl_r2[i]),
+            "rmse": float(abl_rmse[i]),
+            "r2_degradation": base_r2 - float(abl_r2[i]),
+            "r2_degradation_std": 0.0,
+            "rmse_increase_pct": float(pct(abl_rmse[i])),
+            "repeats": 1,
+        })
+
+    if n_repeats > 0:
+        r2 = perm_r2.reshape(len(names), n_repeats)
+        rmse = perm_rmse.reshape(len(names), n_repeats)
+        drop = base_r2 - r2
+        for j, feat in enumerate(names):
+            rows.append({
+                "model": model_name,
+                "kind": "permutation",
+                "name": feat,
+                "n_families": 0,
+                "r2": float(r2[j].mean()),
+                "rmse": float(rmse[j].mean()),
+                "r2_degradation": float(drop[j].mean()),
+                "r2_degradation_std": float(drop[j].std()),
+                "rmse_increase_pct": float(pct(rmse[j]).mean()),
+                "repeats": n_repeats,
+            })
+    return rows
@@ -0,0 +1,102 @@
+# content-addressed cache for fitted models and their derived results
+#
+# a model's key is a hash of everything its fit depends on: the feature
+# matrix, target and groups (bytes, not file names), the split settings,
+# the estimator's own get_params() (minus thread counts) and the library
+# versions. stages that only depend on the fitted model (test predictions,
+# dropout rows, ablation grid) are stored under that key with their own
+# settings hashed into the file name, so a rerun recomputes only what
+# changed. layout:
+#   <root>/<key>/model.joblib, y_pred.npy, meta.json, <stage>-<hash>.json
+
+import hashlib
+import json
+from pathlib import Path
+
+import joblib
+import numpy as np
+import sklearn
+import xgboost
+
+# params that change speed but not the fitted model
+IGNORED_PARAMS = {"n_jobs", "nthread", "verbosity", "warm_start"}
+
+
+def _digest(*parts):
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        if isinstance(p, np.ndarray):
+            h.update(str((p.dtype.str, p.shape)).encode())
+            h.update(np.ascontiguousarray(p).data)
+        else:
+            h.update(json.dumps(p, sort_keys=True, default=str).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def data_key(X, y, groups, features):
+    # same rows, values and run ids in the same order -> same key
+    g = None if groups is None else np.asarray(groups).astype(str).astype(object)
+    g = None if g is None else _digest(list(g))
+    return _digest(np.asarray(X, dtype=np.float64), np.asarray(y, dtype=np.float64), g, list(features))
+
+
+def model_key(data, model, split):
+    params = {k: v for k, v in model.get_params().items() if k not in IGNORED_PARAMS}
+    return _digest(data, type(model).__name__, params, split,
+                   {"sklearn": sklearn.__version__, "xgboost": xgboost.__version__})
+
+
+def forget_model_keys(output_dir, names):
+    # models written to output_dir without the cache (--no-cache,
+    # --out-of-core, --update) no longer match their model_keys.json entries
+    keys_path = Path(output_dir) / "model_keys.json"
+    if not keys_path.exists():
+        return
+    with open(keys_path) as f:
+        keys = json.load(f)
+    for name in names:
+        keys.pop(name, None)
+    with open(keys_path, "w") as f:
+        json.dump(keys, f, indent=2)
+
+
+class ModelCache:
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def _dir(self, key):
+        return self.root / key
+
+    def get(self, key):
+        # (model, y_pred) or None
+        d = self._dir(key)
+        if not (d / "meta.json").exists():
+            return None
+        return joblib.load(d / "model.joblib"), np.load(d / "y_pred.npy")
+
+    def put(self, key, model, y_pred, meta=None):
+        d = self._dir(key)
+        d.mkdir(parents=True, exist_ok=True)
+        joblib.dump(model, d / "model.joblib")
+        np.save(d / "y_pred.npy", np.asarray(y_pred))
+        # meta.json last, it marks the entry complete
+        with open(d / "meta.json", "w") as f:
+            json.dump(meta or {}, f, indent=2, default=str)
+
+    def model_path(self, key):
+        return self._dir(key) / "model.joblib"
+
+    def get_stage(self, key, stage, settings):
+        p = self._dir(key) / f"{stage}-{_digest(settings)}.json"
+        if not p.exists():
+            return None
+        with open(p) as f:
+            return json.load(f)
+
+    def put_stage(self, key, stage, settings, rows):
+        d = self._dir(key)
+        d.mkdir(parents=True, exist_ok=True)
+        with open(d / f"{stage}-{_digest(settings)}.json", "w") as f:
+            json.dump(rows, f)
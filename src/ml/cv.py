@@ -0,0 +1,174 @@
+# grouped k-fold cross-validation over worker processes
+#
+# run_ids never straddle a fold (GroupKFold-style assignment). X, y and the fold id of every
+# row are copied once into shared memory blocks; workers attach to them by
+# name and see the same pages, so nothing the size of the matrix is pickled.
+# each worker trains every selected model on its fold with an even share of
+# the cpu threads.
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from threadpoolctl import threadpool_limits
+
+from .models import MODEL_NAMES, make_model
+
+
+def fold_ids(groups, k=5, random_state=42):
+    # fold number per row, whole runs per fold. like GroupKFold: runs go,
+    # largest first, to the fold with the fewest rows so far. runs of equal
+    # size are shuffled first (GroupKFold's shuffle= needs scikit-learn 1.6)
+    names, inv, counts = np.unique(np.asarray(groups), return_inverse=True, return_counts=True)
+    if len(names) < k:
+        raise ValueError(f"cannot make {k} folds from {len(names)} run_ids")
+    perm = np.random.default_rng(random_state).permutation(len(names))
+    order = perm[np.argsort(-counts[perm], kind="stable")]
+    group_fold = np.empty(len(names), dtype=np.int32)
+    sizes = np.zeros(k, dtype=np.int64)
+    for g in order:
+        f = int(np.argmin(sizes))
+        group_fold[g] = f
+        sizes[f] += counts[g]
+    return group_fold[inv.ravel()]
+
+
+def _share(arr):
+    arr = np.ascontiguousarray(arr)
+    shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _run_fold(fold, specs, models, params, threads):
+    handles = []
+    try:
+        arrays = []
+        for spec in specs:
+            shm, arr = _attach(spec)
+            handles.append(shm)
+            arrays.append(arr)
+        X, y, folds = arrays
+        test = folds == fold
+        # fancy indexing makes the per-fold train/test copies, the shared
+        # block itself stays read-only
+        X_train, X_test = X[~test], X[test]
+        y_train, y_test = y[~test], y[test]
+
+        rows = []
+        for name in models:
+            t0 = time.perf_counter()
+            m = make_model(name, n_jobs=threads, **params)
+            with threadpool_limits(limits=threads):
+                m.fit(X_train, y_train)
+                pred = m.predict(X_test)
+            rows.append({
+                "model": name,
+                "fold": fold,
+                "n_train": int(len(y_train)),
+                "n_test": int(len(y_test)),
+                "r2": r2_score(y_test, pred),
+                "mae": mean_absolute_error(y_test, pred),
+                "rmse": mean_squared_error(y_test, pred) ** 0.5,
+                "fit_s": time.perf_counter() - t0,
+            })
+        del X, y, folds, arrays
+        return rows
+    finally:
+        for shm in handles:
+            shm.close()
+
+
+def cross_validate(X, y, groups, features, output_dir, k=5, models=None, random_state=42,
+                   n_estimators=300, max_depth=6, n_jobs=-1, n_threads=None, verbose=True):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if models is None:
+        models = MODEL_NAMES
+    models = [m for m in MODEL_NAMES if m in models]
+
+    total = n_threads or os.cpu_count() or 1
+    workers = min(k, total if n_jobs is None or n_jobs <= 0 else n_jobs)
+    threads = max(1, total // workers)
+    params = {"n_estimators": n_estimators, "max_depth": max_depth, "random_state": random_state}
+
+    if groups is None or len(groups) == 0:
+        # no run_id column: like split_data, fall back to row-level folds
+        # (every row its own group), so slices of one run can straddle folds
+        if verbose: print("  no run_id groups, folds are split by row")
+        groups = np.arange(len(y))
+    folds = fold_ids(groups, k=k, random_state=random_state)
+    blocks = [
+        _share(np.asarray(X, dtype=np.float64)),
+        _share(np.asarray(y, dtype=np.float64)),
+        _share(folds),
+    ]
+    specs = [spec for _, spec in blocks]
+
+    if verbose: print(f"  {k}-fold grouped CV on {workers} processes x {threads} threads...")
+    t0 = time.perf_counter()
+    rows = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futs = [pool.submit(_run_fold, f, specs, models, params, threads) for f in range(k)]
+            for fut in futs:
+                rows += fut.result()
+    finally:
+        for shm, _ in blocks:
+            shm.close()
+            shm.unlink()
+    wall_s = time.perf_counter() - t0
+
+    per_fold = pd.DataFrame(rows)
+    per_fold.to_csv(output_dir / "cv_folds.csv", index=False)
+
+    agg = per_fold.groupby("model", sort=False).agg(
+        r2_mean=("r2", "mean"), r2_std=("r2", "std"),
+        mae_mean=("mae", "mean"), mae_std=("mae", "std"),
+        rmse_mean=("rmse", "mean"), rmse_std=("rmse", "std"),
+        fit_s=("fit_s", "sum"), folds=("fold", "count"),
+    ).reset_index()
+    agg.to_csv(output_dir / "cv_summary.csv", index=False)
+
+    best = agg.loc[agg["r2_mean"].idxmax()]
+    summary = {
+        "timestamp": datetime.now().isoformat(),
+        "n_samples": int(len(y)),
+        "n_features": len(features),
+        "feature_names": list(features),
+        "cv_folds": k,
+        "n_groups": int(len(np.unique(np.asarray(groups)))),
+        "workers": workers,
+        "threads_per_worker": threads,
+        "wall_s": round(wall_s, 3),
+        "best_model": best["model"],
+        "best_r2": round(float(best["r2_mean"]), 4),
+        "models": [],
+    }
+    for _, r in agg.iterrows():
+        summary["models"].append({
+            "name": r["model"],
+            "r2": round(float(r["r2_mean"]), 4),
+            "r2_std": round(float(r["r2_std"]), 4),
+            "mae": round(float(r["mae_mean"]), 4),
+            "rmse": round(float(r["rmse_mean"]), 4),
+            "fit_s": round(float(r["fit_s"]), 3),
+        })
+
+    with open(output_dir / "cv_summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    return summary
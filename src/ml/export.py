@@ -0,0 +1,170 @@
+# export trained models to the numpy-only format read by onboard.Predictor
+
+import json
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+
+def _tree_depth(left, right, root):
+    depth, level = 0, np.array([root])
+    while True:
+        level = level[left[level] >= 0]
+        if len(level) == 0:
+            return depth
+        level = np.concatenate([left[level], right[level]])
+        depth += 1
+
+
+def _pack_forest(trees, name, features, aggregate, split, base_score=0.0):
+    # trees: list of (left, right, feature, threshold, value, default_left)
+    # with node ids local to the tree; children get shifted to global ids
+    parts = {k: [] for k in ("left", "right", "feature", "threshold", "value", "default_left")}
+    roots = []
+    depth = 0
+    offset = 0
+    for left, right, feat, thr, value, dleft in trees:
+        depth = max(depth, _tree_depth(left, right, 0))
+        roots.append(offset)
+        leaf = left < 0
+        parts["left"].append(np.where(leaf, -1, left + offset))
+        parts["right"].append(np.where(leaf, -1, right + offset))
+        parts["feature"].append(np.where(leaf, 0, feat))
+        parts["threshold"].append(thr)
+        parts["value"].append(value)
+        parts["default_left"].append(dleft)
+        offset += len(left)
+    out = {k: np.concatenate(v) for k, v in parts.items()}
+    out["left"] = out["left"].astype(np.int32)
+    out["right"] = out["right"].astype(np.int32)
+    out["feature"] = out["feature"].astype(np.int32)
+    out["value"] = out["value"].astype(np.float64)
+    out["default_left"] = out["default_left"].astype(bool)
+    out.update(
+        kind="forest", name=name, features=np.asarray(features), roots=np.asarray(roots, dtype=np.int32),
+        aggregate=aggregate, split=split, base_score=float(base_score), depth=depth,
+    )
+    return out
+
+
+def _export_linear(model, name, features):
+    return {
+        "kind": "linear", "name": name, "features": np.asarray(features),
+        "coef": np.asarray(model.coef_, dtype=np.float64).ravel(),
+        "intercept": float(np.ravel(model.intercept_)[0]) if np.ndim(model.intercept_) else float(model.intercept_),
+    }
+
+
+def _export_random_forest(model, name, features):
+    trees = []
+    for est in model.estimators_:
+        t = est.tree_
+        trees.append((t.children_left, t.children_right, t.feature, t.threshold,
+                      t.value[:, 0, 0], np.zeros(t.node_count, dtype=bool)))
+    # thresholds stay float64, sklearn compares float32 inputs against them
+    return _pack_forest(trees, name, features, aggregate="mean", split="le")
+
+
+def _export_booster(booster, name, features, n_trees=None):
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+    dumped = learner["gradient_booster"]["model"]["trees"]
+    if n_trees is not None:
+        dumped = dumped[:n_trees]
+    trees = []
+    for t in dumped:
+        left = np.asarray(t["left_children"])
+        # leaves keep their (already shrunk) value in split_conditions
+        cond = np.asarray(t["split_conditions"], dtype=np.float32)
+        trees.append((left, np.asarray(t["right_children"]), np.asarray(t["split_indices"]), cond,
+                      cond.astype(np.float64), np.asarray(t["default_left"], dtype=bool)))
+    return _pack_forest(trees, name, features, aggregate="sum", split="lt", base_score=base_score)
+
+
+def _export_xgboost(model, name, features):
+    try:
+        # early stopping: predict() only uses the trees up to the best round
+        n_trees = model.best_iteration + 1
+    except AttributeError:
+        n_trees = None
+    return _export_booster(model.get_booster(), name, features, n_trees)
+
+
+def _export_booster_model(model, name, features):
+    # ml.outofcore.BoosterModel, a plain Booster trained with xgb.train
+    return _export_booster(model.booster, name, features)
+
+
+EXPORTERS = {
+    "LinearRegression": _export_linear,
+    "RandomForestRegressor": _export_random_forest,
+    "XGBRegressor": _export_xgboost,
+    "BoosterModel": _export_booster_model,
+}
+
+
+def export_model(model, name, features, out_dir):
+    kind = type(model).__name__
+    if kind not in EXPORTERS:
+        raise ValueError(f"can't export {kind}, supported: {list(EXPORTERS)}")
+    arrays = EXPORTERS[kind](model, name, features)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    path = out_dir / f"{name}.npz"
+    np.savez(path, **arrays)
+    return path
+
+
+def export_models(models_dir, out_dir, models=None, X_check=None, verbose=True):
+    # exports every model of training_summary.json. with X_check (features in
+    # training order) each export is compared against the original model
+    from onboard import Predictor
+
+    models_dir = Path(models_dir)
+    with open(models_dir / "training_summary.json") as f:
+        summary = json.load(f)
+    features = summary["feature_names"]
+    names = models or [m["name"] for m in summary["models"]]
+
+    rows = []
+    for name in names:
+        src = models_dir / f"{name}.joblib"
+        if not src.exists():
+            if verbose: print(f"  {name}: no {src.name}, skipped")
+            continue
+        model = joblib.load(src)
+        try:
+            path = export_model(model, name, features, out_dir)
+        except ValueError as e:
+            if verbose: print(f"  {name}: {e}, skipped")
+            continue
+        row = {"model": name, "path": str(path), "kb": round(path.stat().st_size / 1024, 1),
+               "joblib_kb": round(src.stat().st_size / 1024, 1)}
+
+        t0 = time.perf_counter()
+        pred = Predictor(path)
+        row["load_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+        if X_check is not None:
+            X = np.asarray(X_check, dtype=np.float64)
+            # out-of-core models were fitted without column names
+            ref = model.predict(X_check if hasattr(model, "feature_names_in_") else X)
+            ref = np.asarray(ref, dtype=np.float64)
+            got = pred.predict(X)
+            row["max_abs_diff"] = float(np.abs(got - ref).max())
+            row["max_rel_diff"] = float((np.abs(got - ref) / np.maximum(np.abs(ref), 1e-12)).max())
+            pred.predict(X[0])
+            t0 = time.perf_counter()
+            reps = 200
+            for _ in range(reps):
+                pred.predict(X[0])
+            row["one_slice_us"] = round((time.perf_counter() - t0) / reps * 1e6, 1)
+        rows.append(row)
+        if verbose:
+            extra = ""
+            if "max_abs_diff" in row:
+                extra = f", max rel diff {row['max_rel_diff']:.1e}, {row['one_slice_us']:.0f} us/slice"
+            print(f"  {name}: {row['kb']:.0f} KB, load {row['load_ms']:.1f} ms{extra}")
+    return rows
@@ -0,0 +1,182 @@
+# incremental model updates from new slices
+#
+# instead of refitting on every historical slice, the saved models are
+# extended with the new ones:
+#   xgboost            keeps boosting from the saved booster (xgb_model=)
+#   random_forest      warm_start, new trees are grown on the new slices only
+#   linear_regression  X^T X / X^T y of everything seen so far are kept in
+#                      linear_regression_stats.npz, the update adds the new
+#                      rows' and re-solves
+# a grouped slice of the new runs is held out first. the old and the updated
+# models are both scored on it, so the report shows drift (old model on new
+# data vs its own test score) and whether the update helped.
+
+import json
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from .cache import forget_model_keys
+from .save import save_model, save_importances
+from .search import validation_split
+
+STATS_FILE = "linear_regression_stats.npz"
+
+
+def linear_stats(X, y):
+    # X^T X and X^T y with an intercept column appended
+    X = np.asarray(X, dtype=np.float64)
+    xb = np.empty((X.shape[0], X.shape[1] + 1))
+    xb[:, :-1] = X
+    xb[:, -1] = 1.0
+    return xb.T @ xb, xb.T @ np.asarray(y, dtype=np.float64), len(X)
+
+
+def linear_from_stats(xtx, xty, features):
+    beta = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+    model = LinearRegression()
+    model.coef_ = beta[:-1]
+    model.intercept_ = float(beta[-1])
+    model.n_features_in_ = len(features)
+    model.feature_names_in_ = np.asarray(features, dtype=object)
+    return model
+
+
+def save_linear_stats(X, y, features, where):
+    xtx, xty, n = linear_stats(X, y)
+    np.savez(Path(where) / STATS_FILE, xtx=xtx, xty=xty, n=n, features=np.asarray(features))
+
+
+def _metrics(model, X, y):
+    # out-of-core models were fitted without column names
+    pred = model.predict(X if hasattr(model, "feature_names_in_") else np.asarray(X))
+    return {
+        "r2": float(r2_score(y, pred)),
+        "mae": float(mean_absolute_error(y, pred)),
+        "rmse": float(mean_squared_error(y, pred) ** 0.5),
+    }
+
+
+def update_models(X_new, y_new, features, output_dir, groups=None, models=None, new_trees=50,
+                  val_size=0.2, random_state=42, verbose=True):
+    output_dir = Path(output_dir)
+    with open(output_dir / "training_summary.json") as f:
+        summary = json.load(f)
+    if list(features) != list(summary["feature_names"]):
+        raise RuntimeError(
+            f"new features {list(features)} don't match the trained models' {summary['feature_names']}"
+        )
+    trained = {m["name"]: m for m in summary["models"]}
+    if models is None:
+        models = list(trained)
+
+    X_fit, X_val, y_fit, y_val = validation_split(X_new, y_new, groups, val_size=val_size,
+                                                  random_state=random_state)
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "n_new": len(y_new),
+        "n_fit": len(y_fit),
+        "n_val": len(y_val),
+        "models": [],
+    }
+
+    for name in models:
+        path = output_dir / f"{name}.joblib"
+        if name not in trained or not path.exists():
+            if verbose: print(f"  {name}: no saved model, skipped")
+            continue
+        old = joblib.load(path)
+        before = _metrics(old, X_val, y_val)
+
+        t0 = time.perf_counter()
+        if name == "xgboost" and type(old).__name__ == "BoosterModel":
+            # out-of-core model, a plain Booster: keep boosting it with xgb.train
+            import xgboost as xgb
+            from .outofcore import BoosterModel, booster_params
+            dnew = xgb.DMatrix(np.asarray(X_fit, dtype=np.float32), label=np.asarray(y_fit), feature_names=list(features))
+            new = BoosterModel(xgb.train(booster_params(old.booster), dnew, num_boost_round=new_trees,
+                                         xgb_model=old.booster), list(features))
+            size = new.booster.num_boosted_rounds()
+        elif name == "xgboost":
+            new = type(old)(**old.get_params())
+            new.set_params(n_estimators=new_trees)
+            new.fit(X_fit, y_fit, xgb_model=old.get_booster())
+            size = new.get_booster().num_boosted_rounds()
+        elif name == "random_forest":
+            new = old
+            new.set_params(warm_start=True, n_estimators=old.n_estimators + new_trees)
+            new.fit(X_fit, y_fit)
+            new.set_params(warm_start=False)
+            size = len(new.estimators_)
+        elif name == "linear_regression":
+            stats_path = output_dir / STATS_FILE
+            if not stats_path.exists():
+                if verbose: print(f"  {name}: no {STATS_FILE}, skipped (retrain once to create it)")
+                continue
+            st = np.load(stats_path)
+            xtx, xty, n = linear_stats(X_fit, y_fit)
+            xtx, xty, n = st["xtx"] + xtx, st["xty"] + xty, int(st["n"]) + n
+            new = linear_from_stats(xtx, xty, features)
+            np.savez(stats_path, xtx=xtx, xty=xty, n=n, features=np.asarray(features))
+            size = n
+        else:
+            continue
+        update_s = time.perf_counter() - t0
+
+        after = _metrics(new, X_val, y_val)
+        save_model(new, name, output_dir)
+        save_importances(new, name, features, output_dir)
+
+        row = {
+            "name": name,
+            "r2_test": trained[name]["r2"],
+            "r2_new_before": round(before["r2"], 4),
+            "r2_new_after": round(after["r2"], 4),
+            "rmse_new_before": round(before["rmse"], 4),
+            "rmse_new_after": round(after["rmse"], 4),
+            "drift_r2": round(trained[name]["r2"] - before["r2"], 4),
+            "gain_r2": round(after["r2"] - before["r2"], 4),
+            "size": size,
+            "update_s": round(update_s, 3),
+        }
+        report["models"].append(row)
+        if verbose:
+            print(f"  {name}: R² on new {before['r2']:.4f} -> {after['r2']:.4f} ({update_s:.2f}s)")
+
+    with open(output_dir / "update_report.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    # the summary has to follow the models on disk. each updated model gets
+    # its score on the held-out new runs. best_model is only re-picked when
+    # every model was updated, since only then all are scored on the same rows
+    updated = {r["name"]: r for r in report["models"]}
+    for m in summary["models"]:
+        if m["name"] in updated:
+            m["updated"] = report["timestamp"]
+            m["n_updates"] = m.get("n_updates", 0) + 1
+            m["r2_new"] = updated[m["name"]]["r2_new_after"]
+    if updated and all(m["name"] in updated for m in summary["models"]):
+        best = max(report["models"], key=lambda r: r["r2_new_after"])
+        summary["best_model"] = best["name"]
+        summary["best_r2"] = best["r2_new_after"]
+        summary["best_by"] = "update"
+    summary["last_update"] = {k: report[k] for k in ("timestamp", "n_new", "n_fit", "n_val")}
+    summary["last_update"]["models"] = list(updated)
+    with open(output_dir / "training_summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    # one line per model and update, so drift can be followed over days
+    hist = output_dir / "update_history.csv"
+    rows = pd.DataFrame([{"timestamp": report["timestamp"], "n_new": report["n_new"], **r} for r in report["models"]])
+    rows.to_csv(hist, mode="a", header=not hist.exists(), index=False)
+
+    # updated models no longer match their cache entries
+    forget_model_keys(output_dir, [r["name"] for r in report["models"]])
+
+    return report
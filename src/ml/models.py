@@ -0,0 +1,45 @@
+# model factory + cpu budget for concurrent training
+
+import os
+
+from xgboost import XGBRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.ensemble import RandomForestRegressor
+
+MODEL_NAMES = ["linear_regression", "random_forest", "xgboost"]
+
+
+def make_model(name, n_estimators=300, max_depth=6, random_state=42, n_jobs=-1):
+    if name == "linear_regression":
+        # lstsq goes through BLAS, its threads are capped around fit instead
+        return LinearRegression()
+    if name == "random_forest":
+        return RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs)
+    if name == "xgboost":
+        return XGBRegressor(
+            n_estimators=n_estimators,
+            max_depth=max_depth,
+            learning_rate=0.05,
+            subsample=0.9,
+            colsample_bytree=0.9,
+            random_state=random_state,
+            n_jobs=n_jobs,
+            verbosity=0
+        )
+    raise ValueError(f"unknown model '{name}', use one of {MODEL_NAMES}")
+
+
+def thread_budget(models, total=None):
+    # split total threads over models trained at the same time. linear
+    # regression is cheap and gets one, the tree models share the rest evenly
+    # (the first ones get the remainder). never less than one each
+    if total is None or total <= 0:
+        total = os.cpu_count() or 1
+    out = {}
+    trees = [m for m in models if m != "linear_regression"]
+    if "linear_regression" in models:
+        out["linear_regression"] = 1
+    left = total - len(out)
+    for i, m in enumerate(trees):
+        out[m] = max(1, left // len(trees) + (1 if i < left % len(trees) else 0))
+    return {m: out[m] for m in models}
@@ -0,0 +1,368 @@
+# out-of-core training over a memory-mapped float32 feature matrix
+#
+# features.csv is streamed once into raw files (X float32, y / distance
+# float64, run codes int32) that are opened with np.memmap afterwards, so
+# nothing holds the whole table. training and evaluation walk the rows in
+# batches:
+#   linear_regression  normal equations from X^T X / X^T y accumulated per batch
+#   xgboost            QuantileDMatrix built through an xgboost.DataIter
+#   random_forest      needs all rows in memory, not available here
+# the outputs are the same files run_pipeline writes, test_predictions.npz
+# included; train_model.py renders the plots from them afterwards
+# (ml.render), --plots-only redraws them later.
+
+import json
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import xgboost as xgb
+from sklearn.linear_model import LinearRegression
+from sklearn.model_selection import GroupShuffleSplit
+
+from utils.loaders import iter_prepared_chunks
+
+from .robustness import DROPOUT_SCENARIOS, dropout_masks, predict_stacked
+from .save import save_model, save_importances, save_importance_summary, save_robustness_results, save_predictions
+from .cache import forget_model_keys
+from .incremental import STATS_FILE
+from .train import get_best_model
+
+OOC_BATCH_ROWS = 200_000
+OOC_MODELS = ["linear_regression", "xgboost"]
+
+
+def build_feature_memmap(csv_path, out_dir, chunksize=OOC_BATCH_ROWS):
+    # features.csv -> <out_dir>/{X.f32, y.f64, distance.f64, groups.i32, meta.json}
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    codes = {}
+    n = 0
+    features = None
+    with open(out_dir / "X.f32", "wb") as fx, open(out_dir / "y.f64", "wb") as fy, \
+            open(out_dir / "distance.f64", "wb") as fd, open(out_dir / "groups.i32", "wb") as fg:
+        for X, y, groups, dist in iter_prepared_chunks(csv_path, chunksize=chunksize, float_dtype="float32"):
+            if features is None:
+                features = list(X.columns)
+            fx.write(np.ascontiguousarray(X.to_numpy(dtype=np.float32)).tobytes())
+            fy.write(y.to_numpy(dtype=np.float64).tobytes())
+            fd.write(np.asarray(dist, dtype=np.float64).tobytes())
+            if groups is None:
+                g = np.zeros(len(y), dtype=np.int32)
+            else:
+                g = np.array([codes.setdefault(r, len(codes)) for r in groups.to_numpy()], dtype=np.int32)
+            fg.write(g.tobytes())
+            n += len(y)
+
+    if n == 0:
+        raise RuntimeError(f"No valid rows in {csv_path}")
+
+    # renumber runs in sorted order so a group split matches split_data on the same runs
+    names = sorted(codes, key=str)
+    if codes:
+        remap = np.empty(len(codes), dtype=np.int32)
+        for new, name in enumerate(names):
+            remap[codes[name]] = new
+        g = np.memmap(out_dir / "groups.i32", dtype=np.int32, mode="r+", shape=(n,))
+        for i in range(0, n, chunksize):
+            g[i:i + chunksize] = remap[g[i:i + chunksize]]
+        g.flush()
+        del g
+
+    meta = {
+        "source": str(csv_path),
+        "source_mtime": Path(csv_path).stat().st_mtime,
+        "n_rows": n,
+        "features": features,
+        "groups": [str(x) for x in names],
+        "created": datetime.now().isoformat(),
+    }
+    with open(out_dir / "meta.json", "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def open_feature_memmap(mm_dir):
+    mm_dir = Path(mm_dir)
+    with open(mm_dir / "meta.json") as f:
+        meta = json.load(f)
+    n, k = meta["n_rows"], len(meta["features"])
+    return {
+        "meta": meta,
+        "features": meta["features"],
+        "X": np.memmap(mm_dir / "X.f32", dtype=np.float32, mode="r", shape=(n, k)),
+        "y": np.memmap(mm_dir / "y.f64", dtype=np.float64, mode="r", shape=(n,)),
+        "distance_km": np.memmap(mm_dir / "distance.f64", dtype=np.float64, mode="r", shape=(n,)),
+        "groups": np.memmap(mm_dir / "groups.i32", dtype=np.int32, mode="r", shape=(n,)),
+    }
+
+
+def memmap_is_current(mm_dir, csv_path):
+    # true when the memmap was built from this exact file version
+    meta_path = Path(mm_dir) / "meta.json"
+    if not meta_path.exists():
+        return False
+    with open(meta_path) as f:
+        meta = json.load(f)
+    return meta.get("source") == str(csv_path) and meta.get("source_mtime") == Path(csv_path).stat().st_mtime
+
+
+def split_mask(groups, test_size=0.2, random_state=42):
+    # boolean test mask from a grouped split on run codes (only codes are read)
+    codes = np.asarray(groups)
+    splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
+    _, test_idx = next(splitter.split(codes.reshape(-1, 1), groups=codes))
+    mask = np.zeros(len(codes), dtype=bool)
+    mask[test_idx] = True
+    return mask
+
+
+def _batches(n, batch_rows):
+    for i in range(0, n, batch_rows):
+        yield i, min(i + batch_rows, n)
+
+
+class _TrainIter(xgb.DataIter):
+    # feeds the train rows of the memmap to xgboost one batch at a time
+
+    def __init__(self, X, y, train_mask, features, batch_rows):
+        self.X = X
+        self.features = features
+        self.y = y
+        self.train_mask = train_mask
+        self.spans = list(_batches(len(y), batch_rows))
+        self.it = 0
+        super().__init__()
+
+    def next(self, input_data):
+        while self.it < len(self.spans):
+            a, b = self.spans[self.it]
+            self.it += 1
+            m = self.train_mask[a:b]
+            if m.any():
+                input_data(data=np.asarray(self.X[a:b][m]), label=np.asarray(self.y[a:b][m]),
+                           feature_names=self.features)
+                return 1
+        return 0
+
+    def reset(self):
+        self.it = 0
+
+
+class BoosterModel:
+    # the bits of XGBRegressor the rest of ml/ uses, around a trained Booster
+
+    def __init__(self, booster, features):
+        self.booster = booster
+        self.features = features
+
+    @property
+    def feature_importances_(self):
+        # same normalisation as XGBRegressor (gain, sums to 1)
+        score = self.booster.get_score(importance_type="gain")
+        imp = np.array([score.get(f, 0.0) for f in self.features], dtype=np.float32)
+        total = imp.sum()
+        return imp / total if total > 0 else imp
+
+    def predict(self, X):
+        return self.booster.inplace_predict(np.asarray(X, dtype=np.float32))
+
+
+def linear_stats_batched(X, y, train_mask, batch_rows=OOC_BATCH_ROWS):
+    # X^T X, X^T y (intercept column last, float64) and row count, per batch
+    k = X.shape[1]
+    xtx = np.zeros((k + 1, k + 1))
+    xty = np.zeros(k + 1)
+    n = 0
+    for a, b in _batches(len(y), batch_rows):
+        m = train_mask[a:b]
+        if not m.any():
+            continue
+        xb = np.empty((int(m.sum()), k + 1))
+        xb[:, :k] = X[a:b][m]
+        xb[:, k] = 1.0
+        yb = np.asarray(y[a:b][m])
+        xtx += xb.T @ xb
+        xty += xb.T @ yb
+        n += len(yb)
+    return xtx, xty, n
+
+
+def fit_linear_batched(X, y, train_mask, batch_rows=OOC_BATCH_ROWS, stats=None):
+    # least squares with intercept from the batched normal equations
+    k = X.shape[1]
+    xtx, xty, _ = stats or linear_stats_batched(X, y, train_mask, batch_rows)
+    beta = np.linalg.lstsq(xtx, xty, rcond=None)[0]
+
+    model = LinearRegression()
+    model.coef_ = beta[:k]
+    model.intercept_ = float(beta[k])
+    model.n_features_in_ = k
+    return model
+
+
+def fit_xgboost_batched(X, y, train_mask, features, n_estimators=300, max_depth=6, random_state=42,
+                        batch_rows=OOC_BATCH_ROWS):
+    # same hyper-parameters as run_pipeline's XGBRegressor
+    dtrain = xgb.QuantileDMatrix(_TrainIter(X, y, train_mask, features, batch_rows))
+    booster = xgb.train(xgb_params(max_depth, random_state), dtrain, num_boost_round=n_estimators)
+    return BoosterModel(booster, features)
+
+
+def xgb_params(max_depth=6, random_state=42):
+    return {
+        "objective": "reg:squarederror",
+        "max_depth": max_depth,
+        "learning_rate": 0.05,
+        "subsample": 0.9,
+        "colsample_bytree": 0.9,
+        "tree_method": "hist",
+        "seed": random_state,
+        "verbosity": 0,
+    }
+
+
+def booster_params(booster):
+    # xgb_params of a trained booster, to keep boosting it the same way
+    learner = json.loads(booster.save_config())["learner"]
+    depth = int(learner["gradient_booster"]["tree_train_param"]["max_depth"])
+    return xgb_params(max_depth=depth, random_state=int(learner["generic_param"]["seed"]))
+
+
+def predict_batched(model, X, mask, batch_rows=OOC_BATCH_ROWS, zero_cols=None):
+    # predictions for the rows in mask, optionally with some columns zeroed
+    out = []
+    for a, b in _batches(X.shape[0], batch_rows):
+        m = mask[a:b]
+        if not m.any():
+            continue
+        xb = np.array(X[a:b][m], dtype=np.float64 if isinstance(model, LinearRegression) else np.float32)
+        if zero_cols:
+            xb[:, zero_cols] = 0.0
+        out.append(model.predict(xb))
+    return np.concatenate(out) if out else np.empty(0)
+
+
+def _metrics(y_true, pred):
+    err = pred - y_true
+    ss_res = float(err @ err)
+    ss_tot = float(((y_true - y_true.mean()) ** 2).sum())
+    return {
+        "mae": float(np.abs(err).mean()),
+        "rmse": (ss_res / len(y_true)) ** 0.5,
+        "r2": 1 - ss_res / ss_tot if ss_tot > 0 else 0.0,
+    }
+
+
+def dropout_batched(model, X, test_mask, y_test, features, batch_rows=OOC_BATCH_ROWS, scenarios=None):
+    # test_feature_dropout without materialising X_test: every test batch
+    # goes through predict_stacked once for the baseline and all scenarios
+    if scenarios is None:
+        scenarios = DROPOUT_SCENARIOS
+    masks = np.vstack([np.zeros((1, len(features)), dtype=bool), dropout_masks(scenarios, features)])
+
+    ss_res = np.zeros(len(masks))
+    pos = 0
+    for a, b in _batches(X.shape[0], batch_rows):
+        m = test_mask[a:b]
+        if not m.any():
+            continue
+        xb = np.asarray(X[a:b][m])
+        yb = y_test[pos:pos + len(xb)]
+        pos += len(xb)
+        err = predict_stacked(model, xb, masks) - yb[None, :]
+        ss_res += (err * err).sum(axis=1)
+
+    ss_tot = float(((y_test - y_test.mean()) ** 2).sum())
+    r2 = 1 - ss_res / ss_tot if ss_tot > 0 else np.zeros(len(masks))
+    rmse = np.sqrt(ss_res / len(y_test))
+
+    out = []
+    for i, (name, _) in enumerate(scenarios, 1):
+        out.append({
+            "scenario": name,
+            "r2": float(r2[i]),
+            "rmse": float(rmse[i]),
+            "r2_degradation": float(r2[0] - r2[i]),
+            "rmse_increase_pct": float((rmse[i] - rmse[0]) / rmse[0] * 100) if rmse[0] > 0 else 0,
+        })
+    return out
+
+
+def run_pipeline_out_of_core(mm_dir, output_dir, models=None, test_size=0.2, random_state=42,
+                             n_estimators=300, max_depth=6, skip_robustness=False,
+                             batch_rows=OOC_BATCH_ROWS, dropout_scenarios=None, verbose=True):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    if models is None:
+        models = list(OOC_MODELS)
+    if "random_forest" in models:
+        print("  random_forest needs the whole matrix in memory, skipped out of core")
+    models = [m for m in models if m in OOC_MODELS]
+
+    data = open_feature_memmap(mm_dir)
+    X, y, features = data["X"], data["y"], data["features"]
+
+    if verbose: print("  Splitting data...")
+    test_mask = split_mask(data["groups"], test_size=test_size, random_state=random_state)
+    train_mask = ~test_mask
+    y_test = np.asarray(y[test_mask])
+
+    results = []
+    rob = {}
+    for name in models:
+        if verbose: print(f"  Training {name} (out of core)...")
+        if name == "linear_regression":
+            xtx, xty, n = linear_stats_batched(X, y, train_mask, batch_rows)
+            m = fit_linear_batched(X, y, train_mask, batch_rows, stats=(xtx, xty, n))
+            # same sufficient statistics file as run_pipeline, for --update
+            np.savez(output_dir / STATS_FILE, xtx=xtx, xty=xty, n=n, features=np.asarray(features))
+        else:
+            m = fit_xgboost_batched(X, y, train_mask, features, n_estimators=n_estimators, max_depth=max_depth,
+                                    random_state=random_state, batch_rows=batch_rows)
+
+        pred = predict_batched(m, X, test_mask, batch_rows)
+        met = _metrics(y_test, pred)
+        if hasattr(m, "feature_importances_"):
+            top = features[int(np.argmax(m.feature_importances_))]
+        else:
+            top = features[int(np.argmax(np.abs(m.coef_)))]
+        results.append({"model_name": name, "top_feature": top, "model": m, "y_pred": pred, "y_test": y_test, **met})
+
+        save_model(m, name, output_dir)
+        save_importances(m, name, features, output_dir)
+        if not skip_robustness:
+            rob[name] = dropout_batched(m, X, test_mask, y_test, features, batch_rows, scenarios=dropout_scenarios)
+
+    if len(results) == 0:
+        return None
+
+    save_importance_summary(results, features, output_dir)
+    if len(rob) > 0:
+        save_robustness_results(rob, output_dir)
+    dist = np.asarray(data["distance_km"][test_mask])
+    save_predictions(y_test, {r["model_name"]: r["y_pred"] for r in results}, output_dir,
+                     distance_km=dist, pts_per_km=y_test / dist)
+
+    forget_model_keys(output_dir, [r["model_name"] for r in results])
+
+    best = get_best_model(results)
+    summary = {
+        "timestamp": datetime.now().isoformat(),
+        "out_of_core": True,
+        "n_samples": int(len(y)),
+        "n_train": int(train_mask.sum()),
+        "n_features": len(features),
+        "feature_names": features,
+        "best_model": best["model_name"],
+        "best_r2": round(best["r2"], 4),
+        "models": [{"name": r["model_name"], "r2": round(r["r2"], 4), "mae": round(r["mae"], 4),
+                    "rmse": round(r["rmse"], 4)} for r in results],
+    }
+    with open(output_dir / "training_summary.json", "w") as f:
+        json.dump(summary, f, indent=2)
+
+    summary["results"] = results
+    return summary
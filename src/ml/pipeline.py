@@ -3,15 +3,85 @@
 import json
 from pathlib import Path
 from datetime import datetime
-from xgboost import XGBRegressor
-from sklearn.linear_model import LinearRegression
-from sklearn.ensemble import RandomForestRegressor
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from .train import train_and_evaluate, get_best_model
-from .save import save_model, save_importances, save_importance_summary, save_robustness_results
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from .train import train_and_evaluate, evaluate, get_best_model
+from .save import (save_model, save_importances, save_importance_summary, save_robustness_results,
+                   save_ablation_results, save_predictions)
 from .robustness import test_feature_dropout
-from .plots import plot_feature_importance, plot_predictions, plot_robustness
-from .sanity import plot_sanity_checks
+from .ablation import run_ablation
+from .models import MODEL_NAMES, make_model, thread_budget
+from .search import SEARCH_SPACE, successive_halving
+from .cache import ModelCache, data_key, model_key, forget_model_keys
+from .incremental import save_linear_stats
+
+
+def _fit(name, params, tuned, threads, X_train, X_test, y_train, y_test, features, cache=None, key_parts=None):
+    t0 = time.perf_counter()
+    m = make_model(name, n_jobs=threads, **params)
+    if tuned:
+        m.set_params(**tuned)
+
+    key = None
+    if cache is not None:
+        key = model_key(key_parts[0], m, key_parts[1])
+        hit = cache.get(key)
+        if hit is not None:
+            r = evaluate(hit[0], name, hit[1], y_test, features)
+            r.update(train_s=time.perf_counter() - t0, threads=threads, cache_key=key, cached=True)
+            return r
+
+    if name == "linear_regression":
+        with threadpool_limits(limits=threads if threads > 0 else None):
+            r = train_and_evaluate(m, name, X_train, X_test, y_train, y_test, features)
+    else:
+        r = train_and_evaluate(m, name, X_train, X_test, y_train, y_test, features)
+    if cache is not None:
+        cache.put(key, m, r["y_pred"], meta={"model": name, "params": m.get_params(), "split": key_parts[1]})
+    r.update(train_s=time.perf_counter() - t0, threads=threads, cache_key=key, cached=False)
+    return r
+
+
+def _post(r, features, X_test, y_test, output_dir, dropout_scenarios, skip_robustness,
+          ablation, perm_repeats, n_jobs, random_state, cache=None):
+    # everything that only needs the fitted model. with a cache, results
+    # stored under the model's key are reused. the .joblib is always
+    # rewritten (cached models are in memory anyway), so output_dir never
+    # holds a model from another run than its metrics
+    t0 = time.perf_counter()
+    m, name, key = r["model"], r["model_name"], r.get("cache_key")
+    save_model(m, name, output_dir)
+    save_importances(m, name, features, output_dir)
+
+    rob = None
+    if not skip_robustness:
+        settings = {"scenarios": dropout_scenarios}
+        rob = cache.get_stage(key, "dropout", settings) if cache is not None else None
+        if rob is None:
+            rob = test_feature_dropout(m, X_test, y_test, features, name, scenarios=dropout_scenarios)
+            if cache is not None:
+                cache.put_stage(key, "dropout", settings, rob)
+    grid = []
+    if ablation:
+        settings = {"repeats": perm_repeats, "seed": random_state}
+        grid = cache.get_stage(key, "ablation", settings) if cache is not None else None
+        if grid is None:
+            # other models may still be training: stay within this model's
+            # thread share instead of taking every core
+            jobs = r["threads"]
+            if n_jobs is not None and n_jobs > 0 and (jobs <= 0 or n_jobs < jobs):
+                jobs = n_jobs
+            grid = run_ablation(m, X_test, y_test, features, name, n_repeats=perm_repeats,
+                                n_jobs=jobs, seed=random_state)
+            if cache is not None:
+                cache.put_stage(key, "ablation", settings, grid)
+    r["post_s"] = time.perf_counter() - t0
+    return rob, grid
 
 
 def run_pipeline(X, y, df, features, groups, output_dir, plots_dir,
@@ -19,7 +89,9 @@ def run_pipeline(X, y, df, features, groups, output_dir, plots_dir,
                  n_estimators=300, max_depth=6,
                  skip_plots=False, skip_robustness=False,
                  proxy_results_path=None, features_path=None,
-                 verbose=True):
+                 dropout_scenarios=None, ablation=False, perm_repeats=5, n_jobs=-1,
+                 n_threads=None, concurrent=True, search=False, search_budget_s=300, search_candidates=27,
+                 cache_dir=None, max_points=None, verbose=True, search_verbose=None):
     
     from utils.loaders import split_data
     
@@ -32,80 +104,109 @@ def run_pipeline(X, y, df, features, groups, output_dir, plots_dir,
     if models is None:
         models = ["linear_regression", "random_forest", "xgboost"]
     
-    # sanity checks
-    if not skip_plots and proxy_results_path:
-        if Path(proxy_results_path).exists():
-            if verbose: print("  Sanity checks...")
-            plot_sanity_checks(proxy_results_path, plots_dir, features_path=features_path)
-    
     # split
     if verbose: print(f"  Splitting data...")
     split = split_data(X, y, groups, test_size=test_size, random_state=random_state)
     X_train, X_test, y_train, y_test = split[0], split[1], split[2], split[3]
     
-    results = []
-    rob = {}
-    
-    if "linear_regression" in models:
-        if verbose: print("  Training linear_regression...")
-        m = LinearRegression()
-        r = train_and_evaluate(m, "linear_regression", X_train, X_test, y_train, y_test, features)
-        results.append(r)
-        save_model(m, "linear_regression", output_dir)
-        save_importances(m, "linear_regression", features, output_dir)
-        if not skip_robustness:
-            rob["linear_regression"] = test_feature_dropout(m, X_test, y_test, features, "linear_regression")
-    
-    if "random_forest" in models:
-        if verbose: print("  Training random_forest...")
-        m = RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=-1)
-        r = train_and_evaluate(m, "random_forest", X_train, X_test, y_train, y_test, features)
-        results.append(r)
-        save_model(m, "random_forest", output_dir)
-        save_importances(m, "random_forest", features, output_dir)
-        if not skip_robustness:
-            rob["random_forest"] = test_feature_dropout(m, X_test, y_test, features, "random_forest")
-
-    if "xgboost" in models:
-        if verbose: print("  Training xgboost...")
-        m = XGBRegressor(
-            n_estimators=n_estimators, 
-            max_depth=max_depth,
-            learning_rate=0.05, 
-            subsample=0.9, 
-            colsample_bytree=0.9,
-            random_state=random_state, 
-            verbosity=0
-        )
-
-        r = train_and_evaluate(m, "xgboost", X_train, X_test, y_train, y_test, features)
-        results.append(r)
-        save_model(m, "xgboost", output_dir)
-        save_importances(m, "xgboost", features, output_dir)
-        if not skip_robustness:
-            rob["xgboost"] = test_feature_dropout(m, X_test, y_test, features, "xgboost")
+    if concurrent:
+        budget = thread_budget(models, n_threads)
+    else:
+        budget = {name: n_threads or -1 for name in models}
+    params = {"n_estimators": n_estimators, "max_depth": max_depth, "random_state": random_state}
+    order = [name for name in MODEL_NAMES if name in models]
+    
+    if search_verbose is None:
+        search_verbose = verbose
+    
+    # hyperparameter search on the training rows, budget split evenly
+    tuned = {}
+    searched = {}
+    if search:
+        names = [name for name in order if name in SEARCH_SPACE]
+        history = []
+        for name in names:
+            if search_verbose: print(f"  Searching {name} ({search_budget_s / len(names):.0f}s budget)...")
+            g = None if groups is None else np.asarray(groups)[split[4]]
+            res = successive_halving(name, X_train, y_train, g, budget_s=search_budget_s / len(names),
+                                     n_candidates=search_candidates, random_state=random_state,
+                                     n_jobs=n_threads or -1, verbose=search_verbose)
+            history += res.pop("history")
+            searched[name] = res
+            if res["params"] is not None:
+                tuned[name] = res["params"]
+        if history:
+            pd.DataFrame(history).to_csv(output_dir / "search_results.csv", index=False)
+    
+    # model cache: outputs/models/cache by default, cache_dir=False turns it off
+    cache = None
+    key_parts = None
+    saved_keys = {}
+    keys_path = output_dir / "model_keys.json"
+    if cache_dir is not False:
+        cache = ModelCache(cache_dir or output_dir / "cache")
+        key_parts = (data_key(X, y, groups, features), {"test_size": test_size, "random_state": random_state})
+        if keys_path.exists():
+            with open(keys_path) as f:
+                saved_keys = json.load(f)
+    
+    # every model trains at once on its own thread budget. as soon as one is
+    # done, its save / importances / robustness work goes to the post thread,
+    # which overlaps with the models still training
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(order) if concurrent else 1) as train_pool, \
+            ThreadPoolExecutor(max_workers=1) as post_pool:
+        fits = {}
+        for name in order:
+            if verbose: print(f"  Training {name} ({budget[name]} threads)...")
+            fits[name] = train_pool.submit(_fit, name, params, tuned.get(name), budget[name],
+                                           X_train, X_test, y_train, y_test, features, cache, key_parts)
+        posts = {}
+        for fut in as_completed(fits.values()):
+            r = fut.result()
+            posts[r["model_name"]] = post_pool.submit(
+                _post, r, features, X_test, y_test, output_dir, dropout_scenarios, skip_robustness,
+                ablation, perm_repeats, n_jobs, random_state, cache)
+        results = [fits[name].result() for name in order]
+        rob = {}
+        grid = []
+        for name in order:
+            rob_rows, grid_rows = posts[name].result()
+            if rob_rows is not None:
+                rob[name] = rob_rows
+            grid += grid_rows
+    wall_s = time.perf_counter() - t0
     
     if len(results) == 0:
         return None
     
+    if cache is not None:
+        saved_keys.update({r["model_name"]: r["cache_key"] for r in results})
+        with open(keys_path, "w") as f:
+            json.dump(saved_keys, f, indent=2)
+    else:
+        forget_model_keys(output_dir, [r["model_name"] for r in results])
+    
     if verbose: print("  Saving results...")
+    if "linear_regression" in order:
+        # sufficient statistics for incremental updates
+        save_linear_stats(X_train, y_train, features, output_dir)
     save_importance_summary(results, features, output_dir)
     if len(rob) > 0:
         save_robustness_results(rob, output_dir)
-    
+    if len(grid) > 0:
+        save_ablation_results(grid, output_dir)
+    save_predictions(y_test, {r["model_name"]: r["y_pred"] for r in results}, output_dir,
+                     distance_km=df.loc[X_test.index, "distance_km"].to_numpy(),
+                     pts_per_km=df.loc[X_test.index, "pts_per_km"].to_numpy())
+    
+    # plots are a separate stage over the saved files (train_model.py
+    # --plots-only reruns it), matplotlib only loads when it runs
     if not skip_plots:
         if verbose: print("  Making plots...")
-        plot_feature_importance(results, features, plots_dir)
-        
-        dist = df.loc[X_test.index, "distance_km"].to_numpy()
-        true_norm = df.loc[X_test.index, "pts_per_km"].to_numpy()
-        
-        for r in results:
-            plot_predictions(y_test, r["y_pred"], r["model_name"], plots_dir,
-                           distance_km_test=dist, y_test_original=true_norm)
-        
-        if len(rob) > 0:
-            plot_robustness(rob, plots_dir)
+        from .render import render_plots
+        render_plots(output_dir, plots_dir, proxy_results_path=proxy_results_path, features_path=features_path,
+                     n_jobs=n_jobs, max_points=max_points, verbose=verbose)
     
     best = get_best_model(results)
     
@@ -116,6 +217,9 @@ def run_pipeline(X, y, df, features, groups, output_dir, plots_dir,
         "feature_names": features,
         "best_model": best["model_name"],
         "best_r2": round(best["r2"], 4),
+        "wall_s": round(wall_s, 3),
+        "concurrent": concurrent,
+        "search": searched,
         "results": results,
         "models": [],
     }
@@ -125,7 +229,12 @@ def run_pipeline(X, y, df, features, groups, output_dir, plots_dir,
             "name": r["model_name"], 
             "r2": round(r["r2"], 4), 
             "mae": round(r["mae"], 4), 
-            "rmse": round(r["rmse"], 4)
+            "rmse": round(r["rmse"], 4),
+            "threads": r["threads"],
+            "train_s": round(r["train_s"], 3),
+            "post_s": round(r["post_s"], 3),
+            "cached": r["cached"],
+            "cache_key": r["cache_key"],
         })
     
     to_save = {}
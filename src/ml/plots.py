@@ -6,16 +6,42 @@ import matplotlib.pyplot as plt
 from pathlib import Path
 from sklearn.metrics import r2_score, mean_squared_error
 
+# above this many points scatter plots become log-count hexbins, drawing
+# every marker costs more than the training at a few 100k slices
+SCATTER_MAX_POINTS = 20_000
+HEXBIN_GRID = 80
+
+
+def draw_points(ax, x, y, max_points=SCATTER_MAX_POINTS, color=None, **kw):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if max_points is not None and len(x) > max_points:
+        ok = np.isfinite(x) & np.isfinite(y)
+        hb = ax.hexbin(x[ok], y[ok], gridsize=HEXBIN_GRID, bins="log", mincnt=1, cmap="viridis")
+        ax.figure.colorbar(hb, ax=ax, label="slices (log)")
+        return hb
+    return ax.scatter(x, y, color=color, **kw)
+
+
+def importance_table(results, features):
+    # (model, feature, importance) rows like feature_importance_summary.csv
+    rows = []
+    for r in results:
+        if r["model_name"] == "linear_regression" or not hasattr(r["model"], "feature_importances_"):
+            continue
+        for f, imp in zip(features, r["model"].feature_importances_):
+            rows.append({"model": r["model_name"], "feature": f, "importance": imp})
+    return pd.DataFrame(rows, columns=["model", "feature", "importance"])
+
 
 def plot_feature_importance(results, features, plots_dir):
+    # results from training, or the feature_importance_summary.csv table
     plots_dir = Path(plots_dir)
     plots_dir.mkdir(exist_ok=True)
     
+    table = results if isinstance(results, pd.DataFrame) else importance_table(results, features)
     # skip lr
-    to_plot = []
-    for r in results:
-        if r["model_name"] != "linear_regression":
-            to_plot.append(r)
+    to_plot = [m for m in table["model"].unique() if m != "linear_regression"]
     
     if len(to_plot) == 0:
         print("nothing to plot")
@@ -28,14 +54,9 @@ def plot_feature_importance(results, features, plots_dir):
     
     for i in range(len(to_plot)):
         ax = axes[i]
-        model = to_plot[i]["model"]
-        name = to_plot[i]["model_name"]
-        
-        if not hasattr(model, "feature_importances_"):
-            continue
+        name = to_plot[i]
         
-        data = {"feature": features, "importance": model.feature_importances_}
-        df = pd.DataFrame(data)
+        df = table[table["model"] == name]
         df = df.sort_values("importance", ascending=True)
         
         ax.barh(df["feature"], df["importance"], alpha=0.7, color="steelblue")
@@ -48,14 +69,17 @@ def plot_feature_importance(results, features, plots_dir):
     plt.close()
 
 
-def plot_predictions(y_test, y_pred, model_name, plots_dir, distance_km_test=None, y_test_original=None):
+def plot_predictions(y_test, y_pred, model_name, plots_dir, distance_km_test=None, y_test_original=None,
+                     max_points=SCATTER_MAX_POINTS):
     plots_dir = Path(plots_dir)
     plots_dir.mkdir(exist_ok=True)
     
     fig, axes = plt.subplots(1, 2, figsize=(12, 5))
     
     ax = axes[0]
-    ax.scatter(y_test, y_pred, alpha=0.6)
+    y_test = np.asarray(y_test, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    draw_points(ax, y_test, y_pred, max_points, alpha=0.6)
     
     lo = min(y_test.min(), y_pred.min())
     hi = max(y_test.max(), y_pred.max())
@@ -77,7 +101,7 @@ def plot_predictions(y_test, y_pred, model_name, plots_dir, distance_km_test=Non
         pred_norm = y_pred / distance_km_test
         true_norm = y_test_original
         
-        ax.scatter(true_norm, pred_norm, alpha=0.6, color='green')
+        draw_points(ax, true_norm, pred_norm, max_points, alpha=0.6, color='green')
         lo = min(true_norm.min(), pred_norm.min())
         hi = max(true_norm.max(), pred_norm.max())
         ax.plot([lo, hi], [lo, hi], 'r--', label='perfect')
@@ -0,0 +1,109 @@
+# plot rendering stage
+#
+# figures are drawn from what the pipeline saved, not from live models:
+#   feature_importance_summary.csv   -> feature_importance_comparison.png
+#   test_predictions.npz             -> <model>_predictions.png
+#   robustness_feature_dropout.csv   -> robustness_comparison.png
+#   proxy_results + features tables  -> proxy_sanity_checks.png
+# so the stage can run again (train_model.py --plots-only) without
+# retraining. every figure is its own job, each loads only its inputs and
+# draws with the Agg backend. a process pool (at most one worker per figure)
+# only pays off above RENDER_INLINE_JOBS figures, below that starting the
+# workers and their matplotlib imports costs more than drawing inline.
+# scatter plots with more than max_points points become hexbins (see
+# plots.draw_points).
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .plots import SCATTER_MAX_POINTS
+from .save import PREDICTIONS_FILE
+
+RENDER_INLINE_JOBS = 8
+
+
+def plot_jobs(output_dir, proxy_results_path=None, features_path=None):
+    # (figure, args) for every figure whose inputs exist in output_dir
+    output_dir = Path(output_dir)
+    jobs = []
+    if (output_dir / "feature_importance_summary.csv").exists():
+        jobs.append(("feature_importance", {}))
+    if (output_dir / PREDICTIONS_FILE).exists():
+        import numpy as np
+        with np.load(output_dir / PREDICTIONS_FILE) as z:
+            names = [k[len("pred_"):] for k in z.files if k.startswith("pred_")]
+        for name in names:
+            jobs.append(("predictions", {"model": name}))
+    if (output_dir / "robustness_feature_dropout.csv").exists():
+        jobs.append(("robustness", {}))
+    if proxy_results_path and Path(proxy_results_path).exists():
+        jobs.append(("sanity", {"proxy_results_path": str(proxy_results_path),
+                                "features_path": str(features_path) if features_path else None}))
+    return jobs
+
+
+def _render(figure, args, output_dir, plots_dir, max_points):
+    import matplotlib
+    matplotlib.use("Agg")
+    import numpy as np
+    import pandas as pd
+
+    from . import plots
+
+    t0 = time.perf_counter()
+    output_dir = Path(output_dir)
+    if figure == "feature_importance":
+        table = pd.read_csv(output_dir / "feature_importance_summary.csv")
+        plots.plot_feature_importance(table, None, plots_dir)
+        name = "feature_importance_comparison.png"
+    elif figure == "predictions":
+        with np.load(output_dir / PREDICTIONS_FILE) as z:
+            y_true = z["y_true"]
+            y_pred = z[f"pred_{args['model']}"]
+            dist = z["distance_km"] if "distance_km" in z.files else None
+            norm = z["pts_per_km"] if "pts_per_km" in z.files else None
+        plots.plot_predictions(y_true, y_pred, args["model"], plots_dir, distance_km_test=dist,
+                               y_test_original=norm, max_points=max_points)
+        name = f"{args['model']}_predictions.png"
+    elif figure == "robustness":
+        df = pd.read_csv(output_dir / "robustness_feature_dropout.csv")
+        data = {m: rows.drop(columns="model").to_dict("records") for m, rows in df.groupby("model", sort=False)}
+        plots.plot_robustness(data, plots_dir)
+        name = "robustness_comparison.png"
+    else:
+        from .sanity import plot_sanity_checks
+        plot_sanity_checks(args["proxy_results_path"], plots_dir, features_path=args["features_path"],
+                           max_points=max_points)
+        name = "proxy_sanity_checks.png"
+    return {"figure": name, "render_s": round(time.perf_counter() - t0, 3)}
+
+
+def render_plots(output_dir, plots_dir=None, proxy_results_path=None, features_path=None, n_jobs=-1,
+                 max_points=SCATTER_MAX_POINTS, verbose=True):
+    output_dir = Path(output_dir)
+    plots_dir = Path(plots_dir) if plots_dir else output_dir / "plots"
+    plots_dir.mkdir(parents=True, exist_ok=True)
+    if max_points is None:
+        max_points = SCATTER_MAX_POINTS
+
+    jobs = plot_jobs(output_dir, proxy_results_path, features_path)
+    if len(jobs) == 0:
+        if verbose: print("  nothing to plot")
+        return []
+    workers = min(len(jobs), (os.cpu_count() or 1) if n_jobs is None or n_jobs <= 0 else n_jobs)
+    if len(jobs) <= RENDER_INLINE_JOBS:
+        workers = 1
+
+    if verbose: print(f"  Rendering {len(jobs)} figures on {workers} processes...")
+    if workers == 1:
+        rows = [_render(figure, args, output_dir, plots_dir, max_points) for figure, args in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futs = [pool.submit(_render, figure, args, output_dir, plots_dir, max_points) for figure, args in jobs]
+            rows = [f.result() for f in futs]
+    if verbose:
+        for r in rows:
+            print(f"    {r['figure']}: {r['render_s']:.2f}s")
+    return rows
@@ -1,47 +1,106 @@
 # Robustness tests
 
-from sklearn.metrics import r2_score, mean_squared_error
+from itertools import combinations
 
+import numpy as np
+import pandas as pd
 
-def test_feature_dropout(model, X_test, y_test, feature_names, model_name):
-    baseline = model.predict(X_test)
-    r2_ok = r2_score(y_test, baseline)
-    rmse_ok = mean_squared_error(y_test, baseline) ** 0.5
-    
+
+# sensor family -> features that go missing with it
+SENSOR_FAMILIES = {
+    "vision": ["image_ratio", "lidar_to_camera_ratio"],
+    "lidar": ["lidar_ratio", "lidar_to_camera_ratio", "radar_to_lidar_ratio"],
+    "radar": ["radar_ratio", "radar_to_lidar_ratio"],
+    "imu": ["imu_ratio", "perception_to_nav_ratio"],
+    "odometry": ["odometry_ratio", "perception_to_nav_ratio", "avg_speed_kmh", "distance_km"],
+}
+
+DROPOUT_SCENARIOS = [(f"no_{fam}", feats) for fam, feats in SENSOR_FAMILIES.items()]
+
+# cap on rows x scenarios predicted in one call
+DROPOUT_BATCH_ROWS = 2_000_000
+
+
+def dropout_combinations(max_size=2, min_size=1):
+    # every combination of min_size..max_size missing families, e.g.
+    # ("no_vision+no_lidar", [union of their features])
     out = []
-    
-    scenarios = [
-        ("no_vision", ["image_ratio", "lidar_to_camera_ratio"]),
-        ("no_lidar", ["lidar_ratio", "lidar_to_camera_ratio", "radar_to_lidar_ratio"]),
-        ("no_radar", ["radar_ratio", "radar_to_lidar_ratio"]),
-        ("no_imu", ["imu_ratio", "perception_to_nav_ratio"]),
-        ("no_odometry", ["odometry_ratio", "perception_to_nav_ratio", "avg_speed_kmh", "distance_km"]),
-    ]
-    
-    for name, feats in scenarios:
-        X_broken = X_test.copy()
-        
+    fams = list(SENSOR_FAMILIES)
+    for k in range(min_size, max_size + 1):
+        for combo in combinations(fams, k):
+            feats = []
+            for fam in combo:
+                feats += [f for f in SENSOR_FAMILIES[fam] if f not in feats]
+            out.append(("+".join(f"no_{fam}" for fam in combo), feats))
+    return out
+
+
+def dropout_masks(scenarios, feature_names):
+    # (n_scenarios, n_features) bool, True where the feature is zeroed
+    masks = np.zeros((len(scenarios), len(feature_names)), dtype=bool)
+    col = {f: j for j, f in enumerate(feature_names)}
+    for i, (_, feats) in enumerate(scenarios):
         for f in feats:
-            if f in X_broken.columns:
-                X_broken[f] = 0.0
-        
-        pred = model.predict(X_broken)
-        r2 = r2_score(y_test, pred)
-        rmse = mean_squared_error(y_test, pred) ** 0.5
-        
+            if f in col:
+                masks[i, col[f]] = True
+    return masks
+
+
+def block_metrics(pred, y):
+    # r2 / rmse per row of a (blocks, n) prediction matrix
+    err = pred - y[None, :]
+    ss_res = (err * err).sum(axis=1)
+    ss_tot = ((y - y.mean()) ** 2).sum()
+    r2 = 1 - ss_res / ss_tot if ss_tot > 0 else np.zeros(len(pred))
+    rmse = np.sqrt(ss_res / len(y))
+    return r2, rmse
+
+
+def predict_stacked(model, X, masks, columns=None, batch_rows=DROPOUT_BATCH_ROWS):
+    # predictions for X with each mask applied, as (n_masks, n). masked copies
+    # of X are stacked into one array and predicted in as few calls as fit
+    # under batch_rows
+    X = np.asarray(X, dtype=np.float64)
+    n = len(X)
+    per_call = max(1, batch_rows // max(n, 1))
+    out = np.empty((len(masks), n))
+    for s in range(0, len(masks), per_call):
+        m = masks[s:s + per_call]
+        stack = np.where(m[:, None, :], 0.0, X[None, :, :]).reshape(-1, X.shape[1])
+        if columns is not None:
+            stack = pd.DataFrame(stack, columns=columns, copy=False)
+        out[s:s + len(m)] = np.asarray(model.predict(stack)).reshape(len(m), n)
+    return out
+
+
+def test_feature_dropout(model, X_test, y_test, feature_names, model_name, scenarios=None,
+                         batch_rows=DROPOUT_BATCH_ROWS):
+    # baseline + every scenario go through predict as one stacked batch
+    if scenarios is None:
+        scenarios = DROPOUT_SCENARIOS
+
+    columns = list(X_test.columns) if hasattr(X_test, "columns") else None
+    names = columns if columns is not None else feature_names
+    masks = np.vstack([np.zeros((1, len(names)), dtype=bool), dropout_masks(scenarios, names)])
+    pred = predict_stacked(model, X_test, masks, columns=columns, batch_rows=batch_rows)
+
+    r2, rmse = block_metrics(pred, np.asarray(y_test, dtype=np.float64))
+    r2_ok, rmse_ok = r2[0], rmse[0]
+
+    out = []
+    for i, (name, _) in enumerate(scenarios, 1):
         # degradation
-        r2_drop = r2_ok - r2
         if rmse_ok > 0:
-            rmse_jump = (rmse - rmse_ok) / rmse_ok * 100
+            rmse_jump = (rmse[i] - rmse_ok) / rmse_ok * 100
         else:
             rmse_jump = 0
-        
+
         out.append({
             "scenario": name,
-            "r2": r2,
-            "rmse": rmse,
-            "r2_degradation": r2_drop,
-            "rmse_increase_pct": rmse_jump,
+            "r2": float(r2[i]),
+            "rmse": float(rmse[i]),
+            "r2_degradation": float(r2_ok - r2[i]),
+            "rmse_increase_pct": float(rmse_jump),
         })
-            
+
     return out
@@ -1,94 +1,198 @@
 # sanity checks
+#
+# the proxy should behave like an energy measure:
+#   SC1  distance vs total SWP     (run)    accumulates with distance
+#   SC2  duration vs SWP/hr        (run)    time normalization removes duration
+#   SC3  speed vs SWP/km           (run)    distance normalization removes speed
+#   SC4  speed vs SWP/km           (slice)  same, per slice
+# the engine below needs no matplotlib. every check is a Pearson r over all
+# rows and per scenario, with a percentile bootstrap CI. the resamples are
+# drawn as one (resamples, n) index matrix per batch and all their r values
+# come out of one array expression. plot_sanity_checks only draws SC1-SC3.
+
+from pathlib import Path
 
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from pathlib import Path
 
+from utils.tables import read_table
+
+RUN_COLUMNS = ["database_name", "database_path", "scenario", "duration_seconds", "duration_hours",
+               "distance_km", "weighted_msg_count", "pts_per_hour", "pts_per_km"]
+SLICE_COLUMNS = ["run_id", "scenario", "duration", "distance_km", "weighted_pts"]
+
+# (check, x, y, tests, level)
+CHECKS = [
+    ("SC1", "Distance", "Total SWP", "Accumulation", "run"),
+    ("SC2", "Duration", "SWP/hr", "Time norm", "run"),
+    ("SC3", "Speed", "SWP/km", "Distance norm", "run"),
+    ("SC4", "Speed", "SWP/km", "Distance norm", "slice"),
+]
+
+N_BOOT = 2000
+# fewer points give no r and no interval
+MIN_POINTS = 3
+# index cells per resampling batch (~32 MB each for the indices, x and y)
+BOOT_BATCH_CELLS = 4_000_000
+
+
+def _num(df, col):
+    return pd.to_numeric(df[col], errors="coerce") if col in df.columns else pd.Series(np.nan, index=df.index)
+
+
+def load_sanity_inputs(proxy_results_path=None, features_path=None, store=None, where=None):
+    # (runs, slices) with only the columns the checks use. from a results
+    # store, where (SQL) selects rows of both tables, e.g. "scenario = 'S3'"
+    if store is not None:
+        from utils.store import ResultsStore
+        with ResultsStore(store) as st:
+            runs = st.query("proxy_results", where=where, columns=RUN_COLUMNS)
+            slices = st.query("features", where=where, columns=SLICE_COLUMNS)
+        return runs, (slices if len(slices) else None)
+
+    runs = read_table(proxy_results_path, columns=RUN_COLUMNS)
+    slices = None
+    if features_path and Path(features_path).exists():
+        slices = read_table(features_path, columns=SLICE_COLUMNS)
+    return runs, slices
+
+
+def check_pairs(runs, slices=None):
+    # {check: (x, y, scenario)} with the rows each check is computed on
+    df = runs[(_num(runs, "duration_seconds") > 0) & (_num(runs, "distance_km") > 0)]
+    if "scenario" in df.columns:
+        scen = df["scenario"]
+    elif "database_path" in df.columns:
+        from utils.store import scenario_of
+        scen = df["database_path"].map(scenario_of)
+    else:
+        scen = pd.Series(None, index=df.index, dtype=object)
+    scen = scen.to_numpy(dtype=object)
+
+    dist = _num(df, "distance_km").to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = dist / _num(df, "duration_hours").to_numpy(dtype=float)
+    pairs = {
+        "SC1": (dist, _num(df, "weighted_msg_count").to_numpy(dtype=float), scen),
+        "SC2": (_num(df, "duration_seconds").to_numpy(dtype=float), _num(df, "pts_per_hour").to_numpy(dtype=float), scen),
+        "SC3": (speed, _num(df, "pts_per_km").to_numpy(dtype=float), scen),
+    }
+    speed_ok = np.isfinite(speed) & (speed > 0)
+    pairs["SC3"] = tuple(a[speed_ok] for a in pairs["SC3"])
+
+    if slices is None or len(slices) == 0:
+        pairs["SC4"] = (np.empty(0), np.empty(0), np.empty(0, dtype=object))
+        return pairs
+    s = slices[_num(slices, "distance_km") > 0]
+    if "scenario" in s.columns:
+        s_scen = s["scenario"]
+    elif "run_id" in s.columns and "database_name" in df.columns:
+        s_scen = s["run_id"].map(dict(zip(df["database_name"], scen)))
+    else:
+        s_scen = pd.Series(None, index=s.index, dtype=object)
+    dist = _num(s, "distance_km").to_numpy(dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speed = dist / (_num(s, "duration").to_numpy(dtype=float) / 3600)
+        pts_km = _num(s, "weighted_pts").to_numpy(dtype=float) / dist
+    ok = np.isfinite(speed) & (speed > 0)
+    pairs["SC4"] = (speed[ok], pts_km[ok], s_scen.to_numpy(dtype=object)[ok])
+    return pairs
 
-def plot_sanity_checks(proxy_results_path, plots_dir, features_path=None):
+
+def pearson(x, y):
+    # r along the last axis, so a (resamples, n) pair gives one r per resample
+    x = x - x.mean(axis=-1, keepdims=True)
+    y = y - y.mean(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (x * y).sum(axis=-1) / np.sqrt((x * x).sum(axis=-1) * (y * y).sum(axis=-1))
+
+
+def bootstrap_r(x, y, n_boot=N_BOOT, ci=0.95, seed=0, batch_cells=BOOT_BATCH_CELLS):
+    # (lo, hi, std) of r over n_boot resamples of the (x, y) pairs
+    n = len(x)
+    if n < MIN_POINTS or n_boot <= 0:
+        return np.nan, np.nan, np.nan
+    rng = np.random.default_rng(seed)
+    per = max(1, batch_cells // n)
+    rs = []
+    for a in range(0, n_boot, per):
+        idx = rng.integers(0, n, size=(min(per, n_boot - a), n))
+        rs.append(pearson(x[idx], y[idx]))
+    r = np.concatenate(rs)
+    # resamples that drew a single distinct x or y have no r
+    r = r[np.isfinite(r)]
+    if len(r) == 0:
+        return np.nan, np.nan, np.nan
+    lo, hi = np.quantile(r, [(1 - ci) / 2, (1 + ci) / 2])
+    return float(lo), float(hi), float(r.std(ddof=1)) if len(r) > 1 else np.nan
+
+
+def run_sanity_checks(runs, slices=None, by_scenario=True, n_boot=N_BOOT, ci=0.95, seed=0):
+    # one row per check for all rows ("all"), plus one per check and scenario
+    pairs = check_pairs(runs, slices)
+    rows = []
+    for i, (check, xl, yl, tests, level) in enumerate(CHECKS):
+        x, y, scen = pairs[check]
+        ok = np.isfinite(x) & np.isfinite(y)
+        x, y, scen = x[ok], y[ok], scen[ok]
+        groups = [("all", np.ones(len(x), dtype=bool))]
+        if by_scenario:
+            names = sorted({s for s in scen if isinstance(s, str)}, key=lambda s: (len(s), s))
+            groups += [(s, scen == s) for s in names]
+        for j, (name, mask) in enumerate(groups):
+            gx, gy = x[mask], y[mask]
+            # 2 points always give r = +-1, so like the CI, r needs 3
+            r = float(pearson(gx, gy)) if len(gx) >= MIN_POINTS else np.nan
+            lo, hi, se = bootstrap_r(gx, gy, n_boot=n_boot, ci=ci, seed=[seed, i, j])
+            rows.append({"check": check, "x": xl, "y": yl, "tests": tests, "level": level, "scenario": name,
+                         "n": int(len(gx)), "r": r, "r_lo": lo, "r_hi": hi, "r_std": se})
+    out = pd.DataFrame(rows)
+    for col in ("r", "r_lo", "r_hi", "r_std"):
+        out[col] = out[col].round(4)
+    return out
+
+
+def plot_sanity_checks(proxy_results_path, plots_dir, features_path=None, max_points=None):
+    import matplotlib.pyplot as plt
+
+    from .plots import SCATTER_MAX_POINTS, draw_points
+
+    if max_points is None:
+        max_points = SCATTER_MAX_POINTS
     plots_dir = Path(plots_dir)
     plots_dir.mkdir(exist_ok=True)
-    
-    df = pd.read_csv(proxy_results_path)
-    df = df[df["duration_seconds"] > 0]
-    df = df[df["distance_km"].notna() & (df["distance_km"] > 0)]
-    df["avg_speed_kmh"] = df["distance_km"] / df["duration_hours"]
-    df["avg_speed_kmh"] = df["avg_speed_kmh"].replace([np.inf, -np.inf], np.nan)
-    
-    results = []
+
+    runs, slices = load_sanity_inputs(proxy_results_path, features_path)
+    pairs = check_pairs(runs, slices)
+    # the plot only needs the point estimates, CIs come from sanity_check.py
+    summary = run_sanity_checks(runs, slices, by_scenario=False, n_boot=0)
+
     fig, axes = plt.subplots(1, 3, figsize=(16, 5))
-    
-    # distance vs SWP score
-    ax = axes[0]
-    ax.scatter(df["distance_km"], df["weighted_msg_count"], alpha=0.7, s=80, edgecolors='k', linewidth=0.5)
-    ax.set_xlabel('Distance (km)', fontweight='bold')
-    ax.set_ylabel('Total Proxy Points', fontweight='bold')
-    ax.set_title('SC1: Distance vs Total SWP', fontweight='bold')
-    ax.grid(True, alpha=0.3)
-    
-    r1 = df[["distance_km", "weighted_msg_count"]].corr().iloc[0, 1]
-    ax.text(0.05, 0.95, f'r = {r1:.3f}', transform=ax.transAxes, verticalalignment='top',
-            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-    results.append({"check": "SC1", "x": "Distance", "y": "Total SWP", "tests": "Accumulation", 
-                    "level": "run", "n": len(df), "r": round(r1, 4)})
-    
-    # duration vs SWP/hr
-    ax = axes[1]
-    ax.scatter(df["duration_seconds"], df["pts_per_hour"], alpha=0.7, s=80, edgecolors='k', 
-               linewidth=0.5, color='green')
-    ax.set_xlabel('Duration (s)', fontweight='bold')
-    ax.set_ylabel('SWP/hr', fontweight='bold')
-    ax.set_title('SC2: Duration vs SWP/hr', fontweight='bold')
-    ax.grid(True, alpha=0.3)
-    
-    r2 = df[["duration_seconds", "pts_per_hour"]].corr().iloc[0, 1]
-    ax.text(0.05, 0.95, f'r = {r2:.3f}', transform=ax.transAxes, verticalalignment='top',
-            bbox=dict(boxstyle='round', facecolor='lightgreen', alpha=0.5))
-    results.append({"check": "SC2", "x": "Duration", "y": "SWP/hr", "tests": "Time norm", 
-                    "level": "run", "n": len(df), "r": round(r2, 4)})
-    
-    # speed vs PWS/km
-    ax = axes[2]
-    valid = df[(df["avg_speed_kmh"].notna()) & (df["avg_speed_kmh"] > 0)]
-    ax.scatter(valid["avg_speed_kmh"], valid["pts_per_km"], alpha=0.7, s=80, edgecolors='k', 
-               linewidth=0.5, color='red')
-    ax.set_xlabel('Speed (km/h)', fontweight='bold')
-    ax.set_ylabel('SWP/km', fontweight='bold')
-    ax.set_title('SC3: Speed vs SWP/km', fontweight='bold')
-    ax.grid(True, alpha=0.3)
-    
-    r3 = valid[["avg_speed_kmh", "pts_per_km"]].corr().iloc[0, 1] if len(valid) > 1 else np.nan
-    if not np.isnan(r3):
-        ax.text(0.05, 0.95, f'r = {r3:.3f}', transform=ax.transAxes, verticalalignment='top',
-                bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.5))
-    results.append({"check": "SC3", "x": "Speed", "y": "SWP/km", "tests": "Distance norm", 
-                    "level": "run", "n": len(valid), "r": round(r3, 4) if not np.isnan(r3) else np.nan})
-    
+    panels = [
+        ("SC1", 'Distance (km)', 'Total Proxy Points', 'SC1: Distance vs Total SWP', None, 'wheat'),
+        ("SC2", 'Duration (s)', 'SWP/hr', 'SC2: Duration vs SWP/hr', 'green', 'lightgreen'),
+        ("SC3", 'Speed (km/h)', 'SWP/km', 'SC3: Speed vs SWP/km', 'red', 'lightblue'),
+    ]
+    for ax, (check, xlabel, ylabel, title, color, box) in zip(axes, panels):
+        x, y, _ = pairs[check]
+        ok = np.isfinite(x) & np.isfinite(y)
+        r = float(pearson(x[ok], y[ok])) if ok.sum() >= MIN_POINTS else np.nan
+        draw_points(ax, x, y, max_points, alpha=0.7, s=80, edgecolors='k', linewidth=0.5, color=color)
+        ax.set_xlabel(xlabel, fontweight='bold')
+        ax.set_ylabel(ylabel, fontweight='bold')
+        ax.set_title(title, fontweight='bold')
+        ax.grid(True, alpha=0.3)
+        if not np.isnan(r):
+            ax.text(0.05, 0.95, f'r = {r:.3f}', transform=ax.transAxes, verticalalignment='top',
+                    bbox=dict(boxstyle='round', facecolor=box, alpha=0.5))
+
     plt.tight_layout()
     plot_path = plots_dir / "proxy_sanity_checks.png"
     plt.savefig(plot_path, dpi=300, bbox_inches='tight')
     plt.close()
-    
-    # slice-level speed vs SWP/km
-    r4, n4 = np.nan, 0
-    if features_path and Path(features_path).exists():
-        slices = pd.read_csv(features_path)
-        slices = slices[slices["distance_km"].notna() & (slices["distance_km"] > 0)]
-        slices["speed"] = slices["distance_km"] / (slices["duration"] / 3600)
-        slices["speed"] = slices["speed"].replace([np.inf, -np.inf], np.nan)
-        slices["pts_km"] = slices["weighted_pts"] / slices["distance_km"]
-        
-        valid_s = slices[(slices["speed"].notna()) & (slices["speed"] > 0) & (slices["pts_km"].notna())]
-        n4 = len(valid_s)
-        if n4 > 1:
-            r4 = valid_s[["speed", "pts_km"]].corr().iloc[0, 1]
-    
-    results.append({"check": "SC4", "x": "Speed", "y": "SWP/km", "tests": "Distance norm", 
-                    "level": "slice", "n": n4, "r": round(r4, 4) if not np.isnan(r4) else np.nan})
-    
-    summary = pd.DataFrame(results)
+
+    summary = summary[["check", "x", "y", "tests", "level", "n", "r"]]
     summary_path = plots_dir.parent / "sanity_check_summary.csv"
     summary.to_csv(summary_path, index=False)
-    
+
     return plot_path, summary
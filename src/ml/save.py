@@ -4,6 +4,8 @@ import pandas as pd
 import joblib
 from pathlib import Path
 
+PREDICTIONS_FILE = "test_predictions.npz"
+
 
 def save_model(model, name, where):
     where = Path(where)
@@ -94,3 +96,25 @@ def save_robustness_results(data, where):
     if len(rows) > 0:
         df = pd.DataFrame(rows)
         df.to_csv(where / "robustness_feature_dropout.csv", index=False)
+
+
+def save_ablation_results(rows, where):
+    # exhaustive family ablation + permutation importance, one table for all models
+    where = Path(where)
+    if len(rows) > 0:
+        df = pd.DataFrame(rows)
+        df.to_csv(where / "robustness_ablation_grid.csv", index=False)
+
+
+def save_predictions(y_test, preds, where, distance_km=None, pts_per_km=None):
+    # test-set predictions of every model, what ml.render redraws from
+    import numpy as np
+
+    arrays = {"y_true": np.asarray(y_test, dtype=np.float64)}
+    if distance_km is not None:
+        arrays["distance_km"] = np.asarray(distance_km, dtype=np.float64)
+    if pts_per_km is not None:
+        arrays["pts_per_km"] = np.asarray(pts_per_km, dtype=np.float64)
+    for name in preds:
+        arrays[f"pred_{name}"] = np.asarray(preds[name], dtype=np.float64)
+    np.savez(Path(where) / PREDICTIONS_FILE, **arrays)
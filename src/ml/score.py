@@ -0,0 +1,107 @@
+# batch scoring with a trained model
+#
+# the model and training_summary.json are loaded once; new slices (a
+# features file from extract_features.py, a DataFrame, or row dicts straight
+# from the feature extractors) go through predict in large batches. the
+# columns are checked against the feature list the model was trained on and
+# put in that order. features are cleaned the way load_and_prepare does it
+# (non-numeric / inf -> 0), but no row is dropped: every input row gets a
+# prediction of weighted_pts.
+
+import json
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from utils.loaders import ID_COLUMNS
+from utils.tables import table_columns, iter_table
+
+SCORE_BATCH_ROWS = 200_000
+PRED_COLUMN = "pred_weighted_pts"
+
+
+class Scorer:
+
+    def __init__(self, model_dir, model=None):
+        model_dir = Path(model_dir)
+        with open(model_dir / "training_summary.json") as f:
+            summary = json.load(f)
+        self.features = list(summary["feature_names"])
+        self.name = model or summary["best_model"]
+        path = model_dir / f"{self.name}.joblib"
+        if not path.exists():
+            raise FileNotFoundError(f"no saved model {path}")
+        self.model = joblib.load(path)
+        self.rows = 0
+        self.seconds = 0.0
+
+    def check_columns(self, columns):
+        missing = [f for f in self.features if f not in set(columns)]
+        if missing:
+            raise RuntimeError(f"{self.name} was trained on {self.features}, input is missing {missing}")
+
+    def _matrix(self, df):
+        self.check_columns(df.columns)
+        X = df[self.features].apply(pd.to_numeric, errors="coerce")
+        return X.replace([np.inf, -np.inf], np.nan).fillna(0.0).astype("float64")
+
+    def predict(self, X):
+        # DataFrame (any column order, extra columns ignored) or an array
+        # already in training order
+        if not isinstance(X, pd.DataFrame):
+            X = np.asarray(X, dtype=np.float64)
+            if X.ndim != 2 or X.shape[1] != len(self.features):
+                raise RuntimeError(f"expected {len(self.features)} columns in order {self.features}, got {X.shape}")
+            X = pd.DataFrame(X, columns=self.features, copy=False)
+        else:
+            X = self._matrix(X)
+        t0 = time.perf_counter()
+        pred = np.asarray(self.model.predict(X), dtype=np.float64)
+        self.seconds += time.perf_counter() - t0
+        self.rows += len(pred)
+        return pred
+
+    def score_rows(self, rows):
+        # row dicts as built by features.extractors.build_feature_row
+        return self.predict(pd.DataFrame(rows))
+
+    def iter_file(self, path, batch_rows=SCORE_BATCH_ROWS):
+        # (id columns + prediction) DataFrame per batch
+        path = Path(path)
+        have = table_columns(path)
+        self.check_columns(have)
+        ids = [c for c in ID_COLUMNS if c in have]
+        for chunk in iter_table(path, columns=ids + self.features, batch_rows=batch_rows):
+            out = chunk[ids].copy()
+            out[PRED_COLUMN] = self.predict(chunk)
+            yield out
+
+    def score_file(self, path, out_path=None, batch_rows=SCORE_BATCH_ROWS):
+        # streams path through the model, writing (or returning) the id
+        # columns plus the prediction
+        t0 = time.perf_counter()
+        s0 = self.seconds
+        parts = []
+        first = True
+        n = 0
+        for out in self.iter_file(path, batch_rows=batch_rows):
+            n += len(out)
+            if out_path is None:
+                parts.append(out)
+            else:
+                out.to_csv(out_path, mode="w" if first else "a", header=first, index=False)
+            first = False
+        wall = time.perf_counter() - t0
+        stats = {
+            "model": self.name,
+            "rows": n,
+            "wall_s": round(wall, 3),
+            "predict_s": round(self.seconds - s0, 3),
+            "rows_per_s": round(n / wall, 1) if wall > 0 else None,
+        }
+        if out_path is None:
+            return (pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()), stats
+        return stats
@@ -0,0 +1,154 @@
+# budgeted hyperparameter search (successive halving over trees)
+#
+# n_candidates configs are drawn from SEARCH_SPACE and all start with few
+# trees. after each rung only the best 1/eta survive and get eta times more
+# trees, so most of the compute goes to the promising configs. scores come
+# from a grouped validation fold carved out of the training rows; the test
+# split is never seen. random forest survivors keep their trees and only
+# grow new ones (warm_start). xgboost uses early stopping on the validation
+# fold and a config that stopped early keeps its score. the search stops
+# when the wall-clock budget runs out and returns the best config of the
+# highest rung reached (params is None if not a single fit finished).
+
+import json
+import time
+
+import numpy as np
+from sklearn.metrics import r2_score
+from sklearn.model_selection import GroupShuffleSplit, ParameterGrid
+
+from .models import make_model
+
+SEARCH_SPACE = {
+    "random_forest": {
+        "max_depth": [None, 8, 12, 20],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": [1.0, 0.7, 0.5, "sqrt"],
+    },
+    "xgboost": {
+        "max_depth": [3, 4, 6, 8, 10],
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+        "subsample": [0.7, 0.8, 0.9, 1.0],
+        "colsample_bytree": [0.7, 0.9, 1.0],
+        "min_child_weight": [1, 3, 10],
+    },
+}
+
+EARLY_STOPPING_ROUNDS = 30
+
+
+def sample_configs(name, n, random_state=42):
+    grid = list(ParameterGrid(SEARCH_SPACE[name]))
+    rng = np.random.default_rng(random_state)
+    pick = rng.choice(len(grid), size=min(n, len(grid)), replace=False)
+    return [grid[i] for i in pick]
+
+
+def validation_split(X, y, groups, val_size=0.2, random_state=42):
+    # grouped holdout inside the training rows
+    if groups is not None:
+        splitter = GroupShuffleSplit(n_splits=1, test_size=val_size, random_state=random_state)
+        fit_idx, val_idx = next(splitter.split(X, y, groups=np.asarray(groups)))
+    else:
+        perm = np.random.default_rng(random_state).permutation(len(X))
+        cut = len(X) - int(len(X) * val_size)
+        fit_idx, val_idx = np.sort(perm[:cut]), np.sort(perm[cut:])
+    return X.iloc[fit_idx], X.iloc[val_idx], y.iloc[fit_idx], y.iloc[val_idx]
+
+
+def _rungs(n_candidates, max_trees, eta):
+    n_rungs = int(np.floor(np.log(max(n_candidates, 1)) / np.log(eta) + 1e-9)) + 1
+    return [max(1, int(round(max_trees / eta ** (n_rungs - 1 - i)))) for i in range(n_rungs)]
+
+
+def successive_halving(name, X, y, groups=None, budget_s=300, n_candidates=27, eta=3, max_trees=None,
+                       random_state=42, n_jobs=-1, verbose=True):
+    if name not in SEARCH_SPACE:
+        raise ValueError(f"no search space for '{name}', use one of {list(SEARCH_SPACE)}")
+    if max_trees is None:
+        # xgboost stops early anyway, so give it room
+        max_trees = 1200 if name == "xgboost" else 300
+
+    deadline = time.perf_counter() + budget_s
+    X_fit, X_val, y_fit, y_val = validation_split(X, y, groups, random_state=random_state)
+    configs = sample_configs(name, n_candidates, random_state=random_state)
+    rungs = _rungs(len(configs), max_trees, eta)
+
+    # per candidate: config, fitted model (rf), score, trees actually used,
+    # done (xgboost stopped early, more trees would not change it)
+    cands = [{"id": i, "params": c, "model": None, "score": -np.inf, "trees": 0, "done": False}
+             for i, c in enumerate(configs)]
+    alive = list(cands)
+    history = []
+    out_of_time = False
+    reached = -1
+
+    for level, trees in enumerate(rungs):
+        for c in alive:
+            if time.perf_counter() > deadline:
+                out_of_time = True
+                break
+            t0 = time.perf_counter()
+            if name == "random_forest":
+                if c["model"] is None:
+                    c["model"] = make_model(name, n_estimators=trees, random_state=random_state, n_jobs=n_jobs)
+                    c["model"].set_params(warm_start=True, **c["params"])
+                else:
+                    c["model"].set_params(n_estimators=trees)
+                c["model"].fit(X_fit, y_fit)
+                c["score"] = r2_score(y_val, c["model"].predict(X_val))
+                c["trees"] = trees
+            elif not c["done"]:
+                m = make_model(name, n_estimators=trees, random_state=random_state, n_jobs=n_jobs)
+                m.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS, **c["params"])
+                m.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+                best_it = m.best_iteration
+                c["score"] = r2_score(y_val, m.predict(X_val, iteration_range=(0, best_it + 1)))
+                c["trees"] = best_it + 1
+                c["done"] = best_it + 1 + EARLY_STOPPING_ROUNDS <= trees
+            c["level"] = level
+            history.append({
+                "model": name,
+                "rung": level,
+                "budget_trees": trees,
+                "trees": c["trees"],
+                "candidate": c["id"],
+                "params": json.dumps(c["params"]),
+                "val_r2": c["score"],
+                "fit_s": time.perf_counter() - t0,
+            })
+        if out_of_time:
+            break
+        reached = level
+        if verbose:
+            best = max(alive, key=lambda c: c["score"])
+            print(f"    {name} rung {level}: {len(alive)} configs x {trees} trees, best val R²={best['score']:.4f}")
+        keep = max(1, len(alive) // eta)
+        alive = sorted(alive, key=lambda c: c["score"], reverse=True)[:keep]
+        kept = {c["id"] for c in alive}
+        for c in cands:
+            if c["id"] not in kept:
+                c["model"] = None
+
+    # best among the configs scored on the highest rung reached (a partly
+    # done rung counts when the budget ran out in the middle of it)
+    top = max(c.get("level", -1) for c in cands)
+    params, val_r2 = None, None
+    if top >= 0:
+        best = max([c for c in cands if c.get("level", -1) == top], key=lambda c: c["score"])
+        params = dict(best["params"])
+        params["n_estimators"] = int(best["trees"])
+        val_r2 = float(best["score"])
+
+    return {
+        "model": name,
+        "params": params,
+        "val_r2": val_r2,
+        "candidates": len(configs),
+        "rungs": rungs,
+        "rungs_completed": reached + 1,
+        "fits": len(history),
+        "out_of_time": out_of_time,
+        "elapsed_s": round(budget_s - (deadline - time.perf_counter()), 3),
+        "history": history,
+    }
@@ -7,7 +7,10 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 def train_and_evaluate(model, name, X_train, X_test, y_train, y_test, features):
     model.fit(X_train, y_train)
     pred = model.predict(X_test)
+    return evaluate(model, name, pred, y_test, features)
 
+
+def evaluate(model, name, pred, y_test, features):
     # find most important feature
     mvp = None
     if hasattr(model, "feature_importances_"):
@@ -0,0 +1,5 @@
+# onboard package: numpy-only inference for exported models
+
+from .predictor import Predictor, load_predictor, load_predictors
+
+__all__ = ["Predictor", "load_predictor", "load_predictors"]
@@ -0,0 +1,89 @@
+# numpy-only predictor for models exported by ml.export
+#
+# one .npz per model, no pickle, no sklearn / xgboost / pandas needed:
+#   kind="linear"   coef, intercept
+#   kind="forest"   all trees' nodes flattened into shared arrays (left,
+#                   right, feature, threshold, value, default_left) with the
+#                   root of each tree in roots. leaves have left == -1.
+#                   aggregate "mean" (random forest) or "sum" + base_score
+#                   (xgboost); split "le" goes left on x <= t (sklearn),
+#                   "lt" on x < t (xgboost)
+# trees are walked for all rows and trees at once, one array step per depth
+# level. inputs are compared as float32 like both libraries do.
+
+from pathlib import Path
+
+import numpy as np
+
+# rows per walk, bounds the (rows, trees) node index matrix
+PREDICT_BATCH_ROWS = 20_000
+
+
+class Predictor:
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as z:
+            self.arrays = {k: z[k] for k in z.files}
+        a = self.arrays
+        self.kind = str(a["kind"])
+        self.name = str(a["name"])
+        self.features = [str(f) for f in a["features"]]
+        if self.kind == "forest":
+            self.roots = a["roots"]
+            self.left = a["left"]
+            self.right = a["right"]
+            self.feature = a["feature"]
+            self.threshold = a["threshold"]
+            self.value = a["value"]
+            self.default_left = a["default_left"]
+            self.aggregate = str(a["aggregate"])
+            self.split = str(a["split"])
+            self.base_score = float(a["base_score"])
+            self.depth = int(a["depth"])
+
+    def predict(self, X):
+        # X: (n, n_features) in self.features order, or one slice as (n_features,)
+        X = np.asarray(X, dtype=np.float64)
+        one = X.ndim == 1
+        if one:
+            X = X[None, :]
+        if X.shape[1] != len(self.features):
+            raise ValueError(f"expected {len(self.features)} features {self.features}, got {X.shape[1]}")
+        if self.kind == "linear":
+            out = X @ self.arrays["coef"] + float(self.arrays["intercept"])
+        else:
+            out = np.empty(len(X))
+            for a in range(0, len(X), PREDICT_BATCH_ROWS):
+                out[a:a + PREDICT_BATCH_ROWS] = self._forest(X[a:a + PREDICT_BATCH_ROWS])
+        return out[0] if one else out
+
+    def _forest(self, X):
+        X = X.astype(np.float32)
+        n = len(X)
+        rows = np.arange(n)[:, None]
+        node = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        for _ in range(self.depth):
+            left = self.left[node]
+            inner = left >= 0
+            if not inner.any():
+                break
+            x = X[rows, self.feature[node]]
+            if self.split == "le":
+                go_left = x <= self.threshold[node]
+            else:
+                go_left = x < self.threshold[node]
+            go_left = np.where(np.isnan(x), self.default_left[node], go_left)
+            node = np.where(inner, np.where(go_left, left, self.right[node]), node)
+        leaf = self.value[node]
+        if self.aggregate == "mean":
+            return leaf.mean(axis=1)
+        return leaf.sum(axis=1) + self.base_score
+
+
+def load_predictor(path):
+    return Predictor(path)
+
+
+def load_predictors(directory):
+    # {model name: Predictor} for every export in a folder
+    return {p.stem: Predictor(p) for p in sorted(Path(directory).glob("*.npz"))}
@@ -12,17 +12,71 @@ from .odometry import (
     get_distance_km_from_topic,
 )
 
-from .compute import sum_proxy
+from .gnss import (
+    get_distance_km_from_gnss,
+    haversine_m,
+)
+
+from .distance import get_distance_km
+
+from .vehicles import (
+    vehicle_id,
+    per_vehicle_weighted,
+)
+
+from .compute import sum_proxy, process_one_bag_per_vehicle
+
+from .estimate import estimate_one_bag, estimate_proxy
+
+# jitter and timeseries need numpy at import time, they are loaded on first
+# use (PEP 562) so `import proxy` / run_proxy.py --help stay cheap
+_LAZY = {
+    "topic_gap_stats": ".jitter",
+    "GapStats": ".jitter",
+    "topic_rate_matrix": ".timeseries",
+    "export_timeseries": ".timeseries",
+    "load_timeseries": ".timeseries",
+    "load_timeseries_dir": ".timeseries",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     # deterministic
-    match_weights,
-    weighted_msg_count,
-    simple_msg_count,
-    get_drive_duration,
-    print_topics,
+    "match_weights",
+    "weighted_msg_count",
+    "simple_msg_count",
+    "get_drive_duration",
+    "print_topics",
     # odometry
-    get_distance_km_from_topic,
+    "get_distance_km_from_topic",
+    # gnss
+    "get_distance_km_from_gnss",
+    "haversine_m",
+    "get_distance_km",
+    # vehicles
+    "vehicle_id",
+    "per_vehicle_weighted",
     # compute
-    sum_proxy,
-]
\ No newline at end of file
+    "sum_proxy",
+    "process_one_bag_per_vehicle",
+    # estimate
+    "estimate_one_bag",
+    "estimate_proxy",
+    # jitter
+    "topic_gap_stats",
+    "GapStats",
+    # timeseries
+    "topic_rate_matrix",
+    "export_timeseries",
+    "load_timeseries",
+    "load_timeseries_dir",
+]
@@ -1,17 +1,22 @@
 # compute proxy for all bags
 
-import csv
 import json
+import os
 from pathlib import Path
 from datetime import datetime
 
+from utils.progress import ProgressTracker
+from utils.tables import write_rows, parquet_engine
+from utils.store import ResultsStore
+
 from .deterministic import weighted_msg_count, simple_msg_count, get_drive_duration
-from .odometry import get_distance_km_from_topic
+from .distance import get_distance_km, distance_sources
+from .vehicles import per_vehicle_weighted, ALL_VEHICLES
 
 
-def process_one_bag(db_path, weights, odom_topic="local_odometry"):
+def process_one_bag(db_path, weights, odom_topic="local_odometry", sources=None):
 
-    km = get_distance_km_from_topic(str(db_path), topic_name_substring=odom_topic, verbose=False)
+    km = get_distance_km(str(db_path), distance_sources(odom_topic, sources), verbose=False)
     
     secs = get_drive_duration(str(db_path), time_unit="seconds")
     hrs = secs / 3600
@@ -35,6 +40,7 @@ def process_one_bag(db_path, weights, odom_topic="local_odometry"):
     return {
         "database_name": db_path.stem,
         "database_path": str(db_path),
+        "vehicle_id": ALL_VEHICLES,
         "simple_msg_count": raw_count,
         "weighted_msg_count": round(total_pts, 2),
         "duration_hours": round(hrs, 4),
@@ -45,48 +51,93 @@ def process_one_bag(db_path, weights, odom_topic="local_odometry"):
     }
 
 
-def sum_proxy(db_files, weights, output_dir, odometry_topic="local_odometry", config=None):
+def process_one_bag_per_vehicle(db_path, weights, odom_topic="local_odometry", sources=None):
+    # one row per vehicle namespace, same columns as process_one_bag
+    secs = get_drive_duration(str(db_path), time_unit="seconds")
+    hrs = secs / 3600
+    
+    rows = []
+    for vid, v in per_vehicle_weighted(db_path, weights, odom_topic, sources=sources).items():
+        total_pts = sum(v["weighted"].values())
+        km = v["distance_km"]
+        
+        pts_hr = total_pts / hrs if hrs > 0 else 0
+        pts_km = total_pts / km if km else None
+        
+        rows.append({
+            "database_name": db_path.stem,
+            "database_path": str(db_path),
+            "vehicle_id": vid,
+            "simple_msg_count": sum(v["counts"].values()),
+            "weighted_msg_count": round(total_pts, 2),
+            "duration_hours": round(hrs, 4),
+            "duration_seconds": int(secs),
+            "distance_km": round(km, 2) if km else None,
+            "pts_per_hour": round(pts_hr, 2),
+            "pts_per_km": round(pts_km, 2) if pts_km else None,
+        })
+    return rows
+
+
+def sum_proxy(db_files, weights, output_dir, odometry_topic="local_odometry", config=None,
+              progress_log=None, metrics_file=None, per_vehicle=False, distance_sources=None, output_format="csv",
+              store=None):
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
+    if output_format == "parquet":
+        parquet_engine()  # fail before hours of processing, not after
 
     print("PROXY COMPUTATION")
     
+    progress = ProgressTracker(len(db_files), "proxy", log_path=progress_log, metrics_path=metrics_file)
+    
     results = []
     for bag in db_files:
         try:
-            r = process_one_bag(bag, weights, odometry_topic)
-            results.append(r)
+            if per_vehicle:
+                rows = process_one_bag_per_vehicle(bag, weights, odometry_topic, distance_sources)
+            else:
+                rows = [process_one_bag(bag, weights, odometry_topic, distance_sources)]
+            results.extend(rows)
             print(f"  Processed:", bag.name)
+            progress.update(bag.name, msgs=sum(r["simple_msg_count"] for r in rows), nbytes=os.path.getsize(bag))
         except:
-            pass  # skip bad ones
+            progress.update(bag.name, ok=False)  # skip bad ones
+    
+    progress.finish()
     
     if len(results) == 0:
         return None
     
-    f = open(output_dir / "proxy_results.csv", "w", newline="")
-    writer = csv.DictWriter(f, fieldnames=results[0].keys())
-    writer.writeheader()
-    for r in results:
-        writer.writerow(r)
-    f.close()
+    results_path = write_rows(results, output_dir / "proxy_results", output_format)
+    if store:
+        with ResultsStore(store) as st:
+            st.add_proxy_rows(results)
     
     total_pts = 0
     total_hrs = 0
     total_km = 0
     total_msgs = 0
     
+    seen = set()
     for r in results:
         total_pts += r["weighted_msg_count"]
-        total_hrs += r["duration_hours"]
         total_msgs += r["simple_msg_count"]
         if r["distance_km"] is not None:
             total_km += r["distance_km"]
+        # per-vehicle rows share their bag's duration
+        if r["database_path"] not in seen:
+            total_hrs += r["duration_hours"]
+            seen.add(r["database_path"])
     
     summary = {
         "timestamp": datetime.now().isoformat(),
         "config": config if config else {},
-        "databases_processed": len(results),
+        "databases_processed": len(seen),
         "databases_found": len(db_files),
+        "per_vehicle": per_vehicle,
+        "rows": len(results),
+        "results_file": results_path.name,
         "total_messages": total_msgs,
         "total_weighted_pts": round(total_pts, 2),
         "total_duration_hours": round(total_hrs, 2),
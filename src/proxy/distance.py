@@ -0,0 +1,81 @@
+# distance with a priority list of sources
+#
+# a source is a topic name substring. bestpos / bestgnsspos go through the
+# gnss decoder, anything else through the odometry parser. the first source
+# that gives a distance wins, so a bag without local_odometry still gets one.
+
+from .odometry import get_distance_km_from_topic, odometry_track
+from .gnss import get_distance_km_from_gnss, gnss_track
+
+
+GNSS_SOURCES = ("bestpos", "bestgnsspos")
+
+
+def is_gnss_source(source):
+    return source.lower().rstrip("/").rsplit("/", 1)[-1] in GNSS_SOURCES
+
+
+def distance_sources(odometry_topic="local_odometry", sources=None):
+    # default priority: the odometry topic, then gnss fixes
+    if sources:
+        return list(sources)
+    return [odometry_topic, *GNSS_SOURCES]
+
+
+def get_distance_km(db_path, sources=None, verbose=False, start_ns=None, end_ns=None, vehicle=None,
+                    return_source=False):
+    if sources is None:
+        sources = distance_sources()
+
+    km = None
+    used = None
+    for src in sources:
+        if is_gnss_source(src):
+            km = get_distance_km_from_gnss(db_path, src, verbose=verbose, start_ns=start_ns, end_ns=end_ns,
+                                           vehicle=vehicle)
+        elif vehicle is None:
+            km = get_distance_km_from_topic(db_path, topic_name_substring=src, verbose=verbose,
+                                            start_ns=start_ns, end_ns=end_ns)
+        else:
+            km = get_distance_km_from_topic(db_path, topic_name_substring=f"/{vehicle}/{src.lstrip('/')}",
+                                            verbose=verbose, start_ns=start_ns, end_ns=end_ns)
+        if km is not None:
+            used = src
+            break
+
+    if return_source:
+        return km, used
+    return km
+
+
+def build_distance_index(db_path, sources=None):
+    # cumulative distance along the run, built once per bag from the first
+    # source that has a track. {"t_ns", "x_m", "y_m", "cum_km", "source"}
+    # with cum_km[i] = km driven up to t_ns[i]; None if nothing usable
+    import numpy as np
+
+    if sources is None:
+        sources = distance_sources()
+
+    for src in sources:
+        if is_gnss_source(src):
+            track = gnss_track(db_path, src)
+            if track is None:
+                continue
+            t, x, y, step = track
+        else:
+            track = odometry_track(db_path, src)
+            if track is None or not track[0]:
+                continue
+            t = np.asarray(track[0], dtype=np.int64)
+            x = np.asarray(track[1], dtype=np.float64)
+            y = np.asarray(track[2], dtype=np.float64)
+            step = np.zeros(len(t))
+            step[1:] = np.hypot(np.diff(x), np.diff(y))
+
+        cum_km = np.cumsum(step) / 1000.0
+        if len(t) < 2 or cum_km[-1] <= 0:
+            continue
+        return {"t_ns": t, "x_m": x, "y_m": y, "cum_km": cum_km, "source": src}
+
+    return None
@@ -0,0 +1,290 @@
+# quick estimate mode: sample blocks of each bag instead of scanning everything
+#
+# a bag is cut into n_blocks equal blocks (by timestamp when the timestamp
+# index exists, by rowid otherwise) and a fixed fraction of them is read.
+# totals are expansion estimates over the sampled blocks, pts_per_km is a
+# ratio estimate, and all of them get a normal-approx confidence interval
+# with finite population correction.
+
+import csv
+import json
+import math
+import os
+import random
+import sqlite3
+from pathlib import Path
+from datetime import datetime
+
+from utils.progress import ProgressTracker
+
+from .deterministic import match_weights
+from .odometry import find_topic, find_column_payload, path_length_m, ODOM_BATCH_SIZE
+
+
+Z95 = 1.96
+
+
+def has_timestamp_index(conn):
+    cur = conn.cursor()
+    cur.execute("PRAGMA index_list(messages)")
+    for row in cur.fetchall():
+        cur.execute(f"PRAGMA index_info('{row[1]}')")
+        cols = [r[2] for r in cur.fetchall()]
+        if cols and cols[0] == "timestamp":
+            return True
+    return False
+
+
+def _mean_var(vals):
+    n = len(vals)
+    mean = sum(vals) / n
+    if n < 2:
+        return mean, 0.0
+    var = sum((v - mean) ** 2 for v in vals) / (n - 1)
+    return mean, var
+
+
+def _interval(est, se, z):
+    return est - z * se, est + z * se
+
+
+def estimate_one_bag(db_path, weights, odom_topic="local_odometry", sample_frac=0.05, n_blocks=200,
+                     seed=0, z=Z95):
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+
+    cur.execute("SELECT id, name FROM topics")
+    topics = dict(cur.fetchall())
+    topic_w = {tid: match_weights(name, weights) for tid, name in topics.items()}
+
+    # exact duration is cheap with the index (or rowid ends), keep it exact
+    by_time = has_timestamp_index(conn)
+    if by_time:
+        cur.execute("SELECT MIN(timestamp), MAX(timestamp) FROM messages")
+        t1, t2 = cur.fetchone()
+        lo, hi = t1, t2
+        key = "timestamp"
+    else:
+        cur.execute("SELECT MIN(rowid), MAX(rowid) FROM messages")
+        lo, hi = cur.fetchone()
+        key = "rowid"
+        if lo is not None:
+            cur.execute("SELECT timestamp FROM messages WHERE rowid = ?", (lo,))
+            t1 = cur.fetchone()[0]
+            cur.execute("SELECT timestamp FROM messages WHERE rowid = ?", (hi,))
+            t2 = cur.fetchone()[0]
+
+    if lo is None or hi is None:
+        conn.close()
+        return None
+
+    secs = max(t2 - t1, 0) / 1e9
+    hrs = secs / 3600
+
+    n_blocks = max(2, min(int(n_blocks), hi - lo + 1))
+    block = -(-(hi - lo + 1) // n_blocks)  # ceil
+    k = min(n_blocks, max(2, int(round(n_blocks * sample_frac))))
+
+    rng = random.Random(f"{seed}-{Path(db_path).stem}")
+    picks = sorted(rng.sample(range(n_blocks), k))
+
+    odom_id, _ = find_topic(conn, odom_topic)
+    data_col = find_column_payload(conn) if odom_id is not None else None
+
+    y_blocks = []
+    c_blocks = []
+    d_blocks = []
+    topic_counts = {}
+
+    for b in picks:
+        b_lo = lo + b * block
+        b_hi = b_lo + block
+
+        cur.execute(
+            f"SELECT topic_id, COUNT(*) FROM messages WHERE {key} >= ? AND {key} < ? GROUP BY topic_id",
+            (b_lo, b_hi),
+        )
+        y = 0.0
+        c = 0
+        for tid, cnt in cur.fetchall():
+            y += cnt * topic_w.get(tid, 1.0)
+            c += cnt
+            topic_counts[tid] = topic_counts.get(tid, 0) + cnt
+        y_blocks.append(y)
+        c_blocks.append(c)
+
+        km = 0.0
+        if data_col is not None:
+            cur.execute(
+                f"SELECT timestamp, {data_col} FROM messages WHERE topic_id = ? AND {key} >= ? AND {key} < ? "
+                "ORDER BY timestamp",
+                (odom_id, b_lo, b_hi),
+            )
+
+            def batches():
+                while True:
+                    rows = cur.fetchmany(ODOM_BATCH_SIZE)
+                    if not rows:
+                        break
+                    yield rows
+
+            meters, _ = path_length_m(batches())
+            km = meters / 1000.0
+        d_blocks.append(km)
+
+    conn.close()
+
+    N = n_blocks
+    fpc = 1.0 - k / N
+
+    y_mean, y_var = _mean_var(y_blocks)
+    c_mean, _ = _mean_var(c_blocks)
+    d_mean, d_var = _mean_var(d_blocks)
+
+    total_pts = N * y_mean
+    se_pts = N * math.sqrt(fpc * y_var / k)
+    total_km = N * d_mean
+    se_km = N * math.sqrt(fpc * d_var / k)
+
+    pts_lo, pts_hi = _interval(total_pts, se_pts, z)
+    km_lo, km_hi = _interval(total_km, se_km, z)
+
+    pts_hr = pts_hr_lo = pts_hr_hi = 0
+    if hrs > 0:
+        pts_hr, pts_hr_lo, pts_hr_hi = total_pts / hrs, pts_lo / hrs, pts_hi / hrs
+
+    # ratio estimator for pts/km, variance from residuals y - R*d
+    pts_km = pts_km_lo = pts_km_hi = None
+    if d_mean > 0:
+        ratio = y_mean / d_mean
+        resid = [y - ratio * d for y, d in zip(y_blocks, d_blocks)]
+        _, r_var = _mean_var(resid)
+        se_ratio = math.sqrt(fpc * r_var / k) / d_mean
+        pts_km = ratio
+        pts_km_lo, pts_km_hi = _interval(ratio, se_ratio, z)
+
+    def r2(v):
+        return round(v, 2) if v is not None else None
+
+    return {
+        "database_name": Path(db_path).stem,
+        "database_path": str(db_path),
+        "sample_by": key,
+        "blocks_sampled": k,
+        "blocks_total": N,
+        "simple_msg_count": int(round(N * c_mean)),
+        "weighted_msg_count": r2(total_pts),
+        "weighted_msg_count_lo": r2(max(pts_lo, 0.0)),
+        "weighted_msg_count_hi": r2(pts_hi),
+        "duration_hours": round(hrs, 4),
+        "duration_seconds": int(secs),
+        "distance_km": r2(total_km) if total_km > 0 else None,
+        "distance_km_lo": r2(max(km_lo, 0.0)) if total_km > 0 else None,
+        "distance_km_hi": r2(km_hi) if total_km > 0 else None,
+        "pts_per_hour": r2(pts_hr),
+        "pts_per_hour_lo": r2(max(pts_hr_lo, 0.0)),
+        "pts_per_hour_hi": r2(pts_hr_hi),
+        "pts_per_km": r2(pts_km),
+        "pts_per_km_lo": r2(max(pts_km_lo, 0.0)) if pts_km_lo is not None else None,
+        "pts_per_km_hi": r2(pts_km_hi),
+        # extrapolated per-topic counts, kept out of the csv
+        "_topic_counts": {topics.get(tid, "unknown"): int(round(cnt * N / k)) for tid, cnt in topic_counts.items()},
+    }
+
+
+def rank_estimates(results, rank_by="pts_per_km"):
+    # sorts high -> low and marks which neighbours are separated by their CIs.
+    # returns list of (name_a, name_b) pairs whose order is not decided yet
+    ranked = [r for r in results if r.get(rank_by) is not None]
+    ranked.sort(key=lambda r: r[rank_by], reverse=True)
+
+    undecided = []
+    for i, r in enumerate(ranked):
+        r["rank"] = i + 1
+        r["rank_decided"] = True
+
+    for a, b in zip(ranked, ranked[1:]):
+        if a[f"{rank_by}_lo"] <= b[f"{rank_by}_hi"]:
+            a["rank_decided"] = False
+            b["rank_decided"] = False
+            undecided.append((a["database_name"], b["database_name"]))
+
+    for r in results:
+        if r.get(rank_by) is None:
+            r["rank"] = None
+            r["rank_decided"] = False
+
+    return undecided
+
+
+def estimate_proxy(db_files, weights, output_dir, odometry_topic="local_odometry", config=None,
+                   sample_frac=0.05, n_blocks=200, seed=0, rank_by="pts_per_km",
+                   progress_log=None, metrics_file=None):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"PROXY ESTIMATE (sampling {sample_frac:.0%} of each bag)")
+
+    progress = ProgressTracker(len(db_files), "estimate", log_path=progress_log, metrics_path=metrics_file)
+
+    results = []
+    for bag in db_files:
+        try:
+            r = estimate_one_bag(bag, weights, odometry_topic, sample_frac=sample_frac,
+                                 n_blocks=n_blocks, seed=seed)
+            if r is None:
+                progress.update(bag.name, nbytes=os.path.getsize(bag))
+                continue
+            results.append(r)
+            print(f"  Estimated:", bag.name)
+            progress.update(bag.name, msgs=r["simple_msg_count"], nbytes=os.path.getsize(bag))
+        except:
+            progress.update(bag.name, ok=False)  # skip bad ones
+
+    progress.finish()
+
+    if len(results) == 0:
+        return None
+
+    # fall back to time normalisation when no bag has a distance
+    if rank_by == "pts_per_km" and all(r["pts_per_km"] is None for r in results):
+        rank_by = "pts_per_hour"
+    undecided = rank_estimates(results, rank_by)
+
+    rows = [{k: v for k, v in r.items() if not k.startswith("_")} for r in results]
+    rows.sort(key=lambda r: r["rank"] if r["rank"] is not None else len(rows) + 1)
+
+    f = open(output_dir / "proxy_estimates.csv", "w", newline="")
+    writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+    writer.writeheader()
+    for r in rows:
+        writer.writerow(r)
+    f.close()
+
+    if undecided:
+        print(f"  Ranking by {rank_by} NOT decided for {len(undecided)} neighbouring pair(s) (CIs overlap):")
+        for a, b in undecided:
+            print(f"    {a} ~ {b}")
+    else:
+        print(f"  Ranking by {rank_by} decided: no overlapping intervals")
+
+    summary = {
+        "timestamp": datetime.now().isoformat(),
+        "config": config if config else {},
+        "mode": "estimate",
+        "sample_fraction": sample_frac,
+        "blocks_per_bag": n_blocks,
+        "confidence": 0.95,
+        "rank_by": rank_by,
+        "ranking_decided": len(undecided) == 0,
+        "undecided_pairs": [list(p) for p in undecided],
+        "databases_processed": len(results),
+        "databases_found": len(db_files),
+        "topic_counts": {r["database_name"]: r["_topic_counts"] for r in results},
+    }
+
+    f = open(output_dir / "proxy_estimate_summary.json", "w")
+    json.dump(summary, f, indent=2)
+    f.close()
+
+    return summary
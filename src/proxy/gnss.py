@@ -0,0 +1,232 @@
+# gnss distance: bulk decode of novatel bestpos / bestgnsspos + vectorized haversine
+#
+# every message of a topic has the same CDR layout and the same strings
+# (frame_id, message_name), so lat/lon sit at a fixed offset. we find that
+# offset once, stack a whole batch of payloads into a (n, len) byte matrix
+# and read lat/lon for all of them in one numpy view. no per-message loop.
+# numpy is imported in the functions so importing proxy stays cheap.
+
+import sqlite3
+import struct
+
+from .odometry import find_column_payload, iter_message_batches, ODOM_BATCH_SIZE
+
+
+EARTH_RADIUS_M = 6371008.8
+
+# throw away jumps faster than this, a single bad fix can add kilometres
+MAX_SPEED_MPS = 150.0
+
+
+def _align(pos, n):
+    # CDR alignment is relative to the body, after the 4 byte encapsulation header
+    return pos + (-(pos - 4)) % n
+
+
+def latlon_offset(payload):
+    # walks std_msgs/Header + Oem7Header + sol_status + pos_type, returns
+    # (offset of lat, little_endian). lon follows lat directly
+    little = payload[1] == 1
+    u32 = "<I" if little else ">I"
+
+    pos = 4
+    pos = _align(pos, 4) + 8                    # stamp sec, nanosec
+    pos = _align(pos, 4)
+    pos += 4 + struct.unpack_from(u32, payload, pos)[0]     # frame_id
+    pos = _align(pos, 4)
+    pos += 4 + struct.unpack_from(u32, payload, pos)[0]     # message_name
+    pos = _align(pos, 2) + 2                    # message_id
+    pos += 1                                    # message_type
+    pos = _align(pos, 4) + 4                    # sequence_number
+    pos += 1                                    # time_status
+    pos = _align(pos, 2) + 2                    # gps_week_number
+    pos = _align(pos, 4) + 4                    # gps_week_milliseconds
+    pos = _align(pos, 4) + 4                    # sol_status
+    pos = _align(pos, 4) + 4                    # pos_type
+    pos = _align(pos, 8)
+    return pos, little
+
+
+def decode_latlon(payloads):
+    # list of raw bestpos blobs -> (lat, lon) float64 arrays, NaN where undecodable
+    import numpy as np
+
+    n = len(payloads)
+    lat = np.full(n, np.nan)
+    lon = np.full(n, np.nan)
+    if n == 0:
+        return lat, lon
+
+    lengths = np.fromiter((len(p) if p is not None else 0 for p in payloads), dtype=np.int64, count=n)
+
+    # same length => same strings => same offset; normally one group per topic
+    for L in np.unique(lengths):
+        if L < 24:
+            continue
+        idx = np.flatnonzero(lengths == L)
+        first = payloads[idx[0]]
+        try:
+            off, little = latlon_offset(first)
+        except struct.error:
+            continue
+        if off + 16 > L:
+            continue
+
+        raw = np.frombuffer(b"".join(payloads[i] for i in idx), dtype=np.uint8).reshape(len(idx), L)
+        dt = np.dtype("<f8" if little else ">f8")
+        vals = np.ascontiguousarray(raw[:, off:off + 16]).view(dt)
+        lat[idx] = vals[:, 0]
+        lon[idx] = vals[:, 1]
+
+    return lat, lon
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    # element-wise great circle distance in metres, inputs in degrees
+    import numpy as np
+
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def gnss_path_length_m(batches, max_speed_mps=MAX_SPEED_MPS):
+    # (timestamp, payload) batches -> (metres, rows). the last good fix of a
+    # batch is prepended to the next one so no segment is lost at the seams
+    import numpy as np
+
+    total = 0.0
+    rows = 0
+    last = None
+
+    for batch in batches:
+        rows += len(batch)
+        ts = np.fromiter((r[0] for r in batch), dtype=np.int64, count=len(batch))
+        lat, lon = decode_latlon([r[1] for r in batch])
+
+        ok = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        ok &= ~((lat == 0) & (lon == 0))
+        ts, lat, lon = ts[ok], lat[ok], lon[ok]
+        if len(ts) == 0:
+            continue
+
+        if last is not None:
+            ts = np.concatenate(([last[0]], ts))
+            lat = np.concatenate(([last[1]], lat))
+            lon = np.concatenate(([last[2]], lon))
+
+        if len(ts) > 1:
+            step = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+            dt = np.diff(ts) / 1e9
+            keep = dt > 0
+            if max_speed_mps:
+                keep &= step <= max_speed_mps * dt
+            total += float(step[keep].sum())
+
+        last = (ts[-1], lat[-1], lon[-1])
+
+    return total, rows
+
+
+def find_gnss_topic(conn, topic_name_substring="bestpos", vehicle=None):
+    # a bare name ("bestpos") has to be the last path segment, so it doesn't
+    # pick up bestposx & co. anything with a slash is a plain substring match
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM topics")
+    want = topic_name_substring.lower()
+    for tid, name in cur.fetchall():
+        if vehicle is not None and not name.startswith(f"/{vehicle}/"):
+            continue
+        low = name.lower()
+        if "/" in want:
+            hit = want in low
+        else:
+            hit = low.rsplit("/", 1)[-1] == want
+        if hit:
+            return tid, name
+    return None, None
+
+
+def get_distance_km_from_gnss(db_path, topic_name_substring="bestpos", verbose=False, start_ns=None, end_ns=None,
+                              batch_size=ODOM_BATCH_SIZE, vehicle=None):
+    conn = sqlite3.connect(str(db_path))
+    topic_id, topic_name = find_gnss_topic(conn, topic_name_substring, vehicle=vehicle)
+
+    if topic_id is None:
+        conn.close()
+        if verbose:
+            print(f"couldn't find gnss topic '{topic_name_substring}'")
+        return None
+
+    data_col = find_column_payload(conn)
+    if data_col is None:
+        conn.close()
+        if verbose:
+            print("no data column?")
+        return None
+
+    if verbose:
+        print(f"using gnss topic {topic_id} '{topic_name}' with column '{data_col}'")
+
+    batches = iter_message_batches(conn, [topic_id], data_col, start_ns=start_ns, end_ns=end_ns,
+                                   batch_size=batch_size)
+    meters, rows = gnss_path_length_m(batches)
+    conn.close()
+
+    if not rows or meters <= 0:
+        if verbose:
+            print("no gnss distance calculated")
+        return None
+
+    return meters / 1000.0
+
+
+def gnss_track(db_path, topic_name_substring="bestpos", batch_size=ODOM_BATCH_SIZE, vehicle=None,
+               max_speed_mps=MAX_SPEED_MPS):
+    # (t_ns, x_m, y_m, step_m) arrays of the good fixes. x/y are a local
+    # equirectangular projection around the first fix, step_m the haversine
+    # distance from the previous fix (0 where the jump was filtered out)
+    import numpy as np
+
+    conn = sqlite3.connect(str(db_path))
+    topic_id, _ = find_gnss_topic(conn, topic_name_substring, vehicle=vehicle)
+    data_col = find_column_payload(conn) if topic_id is not None else None
+    if data_col is None:
+        conn.close()
+        return None
+
+    ts_parts, lat_parts, lon_parts = [], [], []
+    for batch in iter_message_batches(conn, [topic_id], data_col, batch_size=batch_size):
+        ts = np.fromiter((r[0] for r in batch), dtype=np.int64, count=len(batch))
+        lat, lon = decode_latlon([r[1] for r in batch])
+        ok = np.isfinite(lat) & np.isfinite(lon) & (np.abs(lat) <= 90) & (np.abs(lon) <= 180)
+        ok &= ~((lat == 0) & (lon == 0))
+        ts_parts.append(ts[ok])
+        lat_parts.append(lat[ok])
+        lon_parts.append(lon[ok])
+    conn.close()
+
+    if not ts_parts:
+        return None
+    ts = np.concatenate(ts_parts)
+    lat = np.concatenate(lat_parts)
+    lon = np.concatenate(lon_parts)
+    if len(ts) == 0:
+        return None
+
+    step = np.zeros(len(ts))
+    if len(ts) > 1:
+        step[1:] = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        dt = np.diff(ts) / 1e9
+        keep = dt > 0
+        if max_speed_mps:
+            keep &= step[1:] <= max_speed_mps * dt
+        step[1:][~keep] = 0.0
+
+    lat0 = np.radians(lat[0])
+    x = np.radians(lon - lon[0]) * np.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(lat - lat[0]) * EARTH_RADIUS_M
+    return ts, x, y, step
@@ -0,0 +1,245 @@
+# per-topic inter-arrival stats (rate, gap quantiles, max gap, drops)
+#
+# one ordered pass over (topic_id, timestamp). each topic keeps a log-bucket
+# gap histogram (DDSketch style, ~1% relative error) for the segment being
+# filled, so memory is fixed per topic no matter how long the bag is. a
+# segment is summarised and its histograms reset as soon as the scan moves
+# past it. gaps belong to the segment of the later message.
+
+import sqlite3
+
+import numpy as np
+
+from .vehicles import vehicle_id, ALL_VEHICLES
+
+
+GAP_BATCH_SIZE = 100_000
+
+# relative accuracy of the gap quantiles
+SKETCH_ALPHA = 0.01
+SKETCH_MIN_NS = 1_000            # 1 us, anything smaller lands in bucket 0
+SKETCH_MAX_NS = 10_000 * 10**9   # ~3 h, anything bigger lands in the last bucket
+
+# a gap this many nominal periods long counts as dropped messages
+DROP_FACTOR = 1.5
+
+# same families as the features (see build_feature_row)
+FAMILIES = {
+    "image": ("image",),
+    "lidar": ("luminar", "lidar"),
+    "radar": ("radar",),
+    "imu": ("imu",),
+    "odometry": ("odometry",),
+}
+
+_GAMMA = (1 + SKETCH_ALPHA) / (1 - SKETCH_ALPHA)
+_LOG_GAMMA = np.log(_GAMMA)
+N_BUCKETS = int(np.ceil(np.log(SKETCH_MAX_NS / SKETCH_MIN_NS) / _LOG_GAMMA)) + 2
+
+# representative gap of every bucket, bucket i covers (min*g^(i-1), min*g^i]
+_BUCKET_NS = SKETCH_MIN_NS * 2 * _GAMMA ** np.arange(N_BUCKETS) / (_GAMMA + 1)
+_BUCKET_NS[0] = SKETCH_MIN_NS / 2
+
+
+def gap_bucket(gaps_ns):
+    g = np.maximum(np.asarray(gaps_ns, dtype=np.float64), SKETCH_MIN_NS)
+    idx = np.ceil(np.log(g / SKETCH_MIN_NS) / _LOG_GAMMA).astype(np.int64)
+    return np.clip(idx, 0, N_BUCKETS - 1)
+
+
+def hist_quantile(hist, q):
+    # quantile in ns from one bucket histogram
+    n = hist.sum()
+    if n == 0:
+        return None
+    rank = q * (n - 1)
+    i = int(np.searchsorted(np.cumsum(hist), rank, side="right"))
+    return float(_BUCKET_NS[min(i, N_BUCKETS - 1)])
+
+
+def hist_drops(hist, period_ns):
+    # messages missing given a nominal period: a gap of k periods hides k-1
+    if not period_ns:
+        return 0
+    k = np.rint(_BUCKET_NS / period_ns)
+    lost = np.where(_BUCKET_NS > DROP_FACTOR * period_ns, k - 1, 0)
+    return int((hist * lost).sum())
+
+
+def _summary(hist, msgs, max_gap, duration_s, drops=None):
+    p50 = hist_quantile(hist, 0.50)
+    p99 = hist_quantile(hist, 0.99)
+    if drops is None:
+        drops = hist_drops(hist, p50)
+    return {
+        "msgs": int(msgs),
+        "rate_hz": msgs / duration_s if duration_s > 0 else 0,
+        "gap_p50_ms": p50 / 1e6 if p50 is not None else None,
+        "gap_p99_ms": p99 / 1e6 if p99 is not None else None,
+        "gap_max_ms": max_gap / 1e6 if hist.sum() else None,
+        "drops": int(drops),
+    }
+
+
+def topic_family(topic):
+    low = topic.lower()
+    for fam, keys in FAMILIES.items():
+        if any(k in low for k in keys):
+            return fam
+    return None
+
+
+class GapStats:
+    # streaming accumulator. feed() it time ordered (topic_id, timestamp)
+    # arrays, read .segments once finish() was called: one dict per segment
+    # with per-topic stats and per-(vehicle, family) stats.
+
+    def __init__(self, topics, edges):
+        # topics: {topic_id: name}, edges: segment boundaries in ns
+        self.edges = np.asarray(edges, dtype=np.int64)
+        self.n_seg = len(self.edges) - 1
+
+        ids = sorted(topics)
+        self.names = [topics[t] for t in ids] + ["unknown"]
+        n_top = len(self.names)
+        max_tid = max(ids) if ids else 0
+        self.lut = np.full(max_tid + 2, n_top - 1, dtype=np.int64)
+        for j, tid in enumerate(ids):
+            self.lut[tid] = j
+        self.max_tid = max_tid
+
+        # (vehicle, family) -> topic columns. ALL_VEHICLES covers every topic
+        self.groups = {}
+        for j, name in enumerate(self.names):
+            fam = topic_family(name)
+            if fam is None:
+                continue
+            self.groups.setdefault((ALL_VEHICLES, fam), []).append(j)
+            self.groups.setdefault((vehicle_id(name), fam), []).append(j)
+
+        self.prev_ts = np.full(n_top, -1, dtype=np.int64)
+        self.cur_seg = 0
+        self._reset()
+        self.segments = []
+
+    def _reset(self):
+        n_top = len(self.names)
+        self.hist = np.zeros(n_top * N_BUCKETS, dtype=np.int64)
+        self.msgs = np.zeros(n_top, dtype=np.int64)
+        self.max_gap = np.zeros(n_top, dtype=np.int64)
+
+    def _flush(self):
+        duration = (self.edges[self.cur_seg + 1] - self.edges[self.cur_seg]) / 1e9
+        hist = self.hist.reshape(len(self.names), N_BUCKETS)
+
+        per_topic = {}
+        drops = np.zeros(len(self.names), dtype=np.int64)
+        for j in np.flatnonzero(self.msgs):
+            s = _summary(hist[j], self.msgs[j], self.max_gap[j], duration)
+            drops[j] = s["drops"]
+            per_topic[self.names[j]] = s
+
+        per_group = {}
+        for key, cols in self.groups.items():
+            if not self.msgs[cols].any():
+                continue
+            # family quantiles from the merged histogram, drops per topic
+            # against each topic's own nominal rate
+            per_group[key] = _summary(hist[cols].sum(axis=0), self.msgs[cols].sum(), self.max_gap[cols].max(),
+                                      duration, drops=drops[cols].sum())
+
+        self.segments.append({"topics": per_topic, "groups": per_group})
+        self._reset()
+        self.cur_seg += 1
+
+    def _advance(self, seg):
+        while self.cur_seg < min(seg, self.n_seg):
+            self._flush()
+
+    def feed(self, topic_ids, timestamps):
+        tid = np.clip(np.asarray(topic_ids, dtype=np.int64), 0, self.max_tid + 1)
+        ts = np.asarray(timestamps, dtype=np.int64)
+        if len(ts) == 0:
+            return
+        col = self.lut[tid]
+
+        # per-topic order inside the batch, previous timestamp of every message
+        order = np.lexsort((ts, col))
+        col = col[order]
+        ts = ts[order]
+        prev = np.empty_like(ts)
+        prev[1:] = ts[:-1]
+        first = np.ones(len(ts), dtype=bool)
+        first[1:] = col[1:] != col[:-1]
+        prev[first] = self.prev_ts[col[first]]
+        last = np.append(first[1:], True)
+        self.prev_ts[col[last]] = ts[last]
+
+        seg = np.searchsorted(self.edges, ts, side="right") - 1
+        gap = ts - prev
+        has_gap = prev >= 0
+
+        # segments come in order, flush each one as soon as it's complete
+        for s in np.unique(seg):
+            if s < 0:
+                continue
+            if s >= self.n_seg:
+                break
+            self._advance(s)
+            m = seg == s
+            self.msgs += np.bincount(col[m], minlength=len(self.names))
+            g = m & has_gap
+            if g.any():
+                c = col[g]
+                self.hist += np.bincount(c * N_BUCKETS + gap_bucket(gap[g]), minlength=len(self.hist))
+                np.maximum.at(self.max_gap, c, gap[g])
+
+    def finish(self):
+        self._advance(self.n_seg)
+        return self.segments
+
+
+def topic_gap_stats(db_path, edges=None, batch_size=GAP_BATCH_SIZE):
+    # inter-arrival stats for the segments [edges[i], edges[i+1]) of one bag,
+    # or for the whole bag when no edges are given. returns a list with one
+    # {"topics": {name: stats}, "groups": {(vehicle, family): stats}} per segment
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM topics")
+    topics = dict(cur.fetchall())
+
+    if edges is None:
+        cur.execute("SELECT MIN(timestamp), MAX(timestamp) FROM messages")
+        t_min, t_max = cur.fetchone()
+        if t_min is None:
+            conn.close()
+            return []
+        edges = [t_min, t_max + 1]
+
+    stats = GapStats(topics, edges)
+    cur.execute(
+        "SELECT topic_id, timestamp FROM messages WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp",
+        (int(edges[0]), int(edges[-1])),
+    )
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        arr = np.array(batch, dtype=np.int64)
+        stats.feed(arr[:, 0], arr[:, 1])
+    conn.close()
+    return stats.finish()
+
+
+def gap_feature_columns(segment, vehicle=ALL_VEHICLES):
+    # flat features.csv columns for one segment, 0 when a family is missing.
+    # merged per family: topic names differ between bags and vehicles, per
+    # topic columns would give every bag its own csv layout
+    out = {}
+    groups = segment["groups"] if segment else {}
+    for fam in FAMILIES:
+        s = groups.get((vehicle, fam))
+        for key in ("rate_hz", "gap_p50_ms", "gap_p99_ms", "gap_max_ms", "drops"):
+            v = s[key] if s else None
+            out[f"{fam}_{key}"] = v if v is not None else 0
+    return out
@@ -4,6 +4,14 @@ import sqlite3
 import re
 import math
 import json
+import struct
+
+# rows per fetchmany() call, keeps peak memory flat no matter the bag length
+ODOM_BATCH_SIZE = 5000
+
+# regex for numbers
+NUM_PATTERN = re.compile(r'[-+]?\d*\.?\d+')
+
 
 def find_column_payload(conn):
     cursor = conn.cursor()
@@ -19,27 +27,152 @@ def find_column_payload(conn):
             return p
     return None
 
+
+def find_topic(conn, topic_name_substring):
+    # first topic whose name contains the substring -> (id, name)
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM topics")
+    for tid, name in cur.fetchall():
+        if topic_name_substring.lower() in name.lower():
+            return tid, name
+    return None, None
+
+
+def iter_message_batches(conn, topic_ids, data_col, start_ns=None, end_ns=None,
+                         batch_size=ODOM_BATCH_SIZE, with_topic=False):
+    # yields lists of (timestamp, payload) rows, at most batch_size at a time.
+    # payloads are the raw blobs straight from sqlite, nothing decoded.
+    # with_topic=True gives (topic_id, timestamp, payload) for multi-topic reads
+    cur = conn.cursor()
+    
+    marks = ",".join("?" for _ in topic_ids)
+    cols = f"topic_id, timestamp, {data_col}" if with_topic else f"timestamp, {data_col}"
+    
+    # slice-lvl or run-lvl
+    if start_ns is not None and end_ns is not None:
+        sql = f"SELECT {cols} FROM messages WHERE topic_id IN ({marks}) AND timestamp >= ? AND timestamp < ? ORDER BY timestamp"
+        params = (*topic_ids, int(start_ns), int(end_ns))
+    else:
+        sql = f"SELECT {cols} FROM messages WHERE topic_id IN ({marks}) ORDER BY timestamp"
+        params = tuple(topic_ids)
+    
+    cur.execute(sql, params)
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        yield batch
+
+
+def _cdr_position(payload):
+    # nav_msgs/msg/Odometry as rosbag2 stores it: 4 byte encapsulation header
+    # (0x00 0x00 big / 0x00 0x01 little endian), std_msgs/Header,
+    # child_frame_id, then pose.pose.position x, y as float64. alignment is
+    # relative to the body, like in gnss.latlon_offset. None if it isn't CDR
+    if len(payload) < 32 or payload[0] != 0 or payload[1] not in (0, 1):
+        return None
+    little = payload[1] == 1
+    u32 = "<I" if little else ">I"
+    try:
+        pos = 4 + 8                                             # stamp sec, nanosec
+        pos += 4 + struct.unpack_from(u32, payload, pos)[0]     # frame_id
+        pos += (-(pos - 4)) % 4
+        pos += 4 + struct.unpack_from(u32, payload, pos)[0]     # child_frame_id
+        pos += (-(pos - 4)) % 8
+        x, y = struct.unpack_from("<2d" if little else ">2d", payload, pos)
+    except struct.error:
+        return None
+    if not (math.isfinite(x) and math.isfinite(y)):
+        return None
+    return (x, y)
+
+
+def parse_position(payload):
+    # CDR odometry is decoded, anything else (text / json exports) goes
+    # through the regex on raw text, first two numbers are x, y
+    if payload is None:
+        return None
+    try:
+        if isinstance(payload, bytes):
+            position = _cdr_position(payload)
+            if position is not None:
+                return position
+            text = payload.decode('utf-8', errors='ignore') # ros2 normalization
+        else:
+            text = str(payload)
+        
+        numbers = []
+        for m in NUM_PATTERN.finditer(text):
+            numbers.append(float(m.group()))
+            if len(numbers) == 2:
+                return (numbers[0], numbers[1])
+    except:
+        pass
+    return None
+
+
 def calc_distance(x1, y1, x2, y2):
     """pythagoras thing"""
     dx = x2 - x1
     dy = y2 - y1
     return math.sqrt(dx**2 + dy**2)
 
-def get_distance_km_from_topic(db_path, topic_name_substring="local_odometry", verbose=False, start_ns=None, end_ns=None):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+
+def path_length_m(batches):
+    # sums point-to-point distance over (timestamp, payload) batches,
+    # previous position carries over batch boundaries. returns (meters, rows)
+    messages = 0
+    prev_pos = None
+    total_dist = 0.0
     
-    cur.execute("SELECT id, name FROM topics")
-    all_topics = cur.fetchall()
+    for batch in batches:
+        messages += len(batch)
+        
+        for timestamp, payload in batch:
+            position = parse_position(payload)
+            if position is None:
+                continue
+            
+            if prev_pos is None:
+                prev_pos = position
+                continue
+            
+            dist = calc_distance(prev_pos[0], prev_pos[1], position[0], position[1])
+            total_dist += dist
+            prev_pos = position
     
-    # find the odometry topic
-    topic_id = None
-    topic_name = None
-    for tid, name in all_topics:
-        if topic_name_substring.lower() in name.lower():
-            topic_id = tid
-            topic_name = name
-            break
+    return total_dist, messages
+
+
+def path_length_by_topic_m(batches):
+    # same as path_length_m but for (topic_id, timestamp, payload) rows of
+    # several topics at once, each topic keeps its own previous position.
+    # returns {topic_id: (meters, rows)}
+    state = {}
+    
+    for batch in batches:
+        for tid, timestamp, payload in batch:
+            st = state.get(tid)
+            if st is None:
+                st = state[tid] = [0.0, 0, None]
+            st[1] += 1
+            
+            position = parse_position(payload)
+            if position is None:
+                continue
+            
+            prev_pos = st[2]
+            if prev_pos is not None:
+                st[0] += calc_distance(prev_pos[0], prev_pos[1], position[0], position[1])
+            st[2] = position
+    
+    return {tid: (st[0], st[1]) for tid, st in state.items()}
+
+
+def get_distance_km_from_topic(db_path, topic_name_substring="local_odometry", verbose=False, start_ns=None, end_ns=None,
+                               batch_size=ODOM_BATCH_SIZE):
+    conn = sqlite3.connect(db_path)
+    topic_id, topic_name = find_topic(conn, topic_name_substring)
     
     if topic_id is None:
         conn.close()
@@ -58,16 +191,11 @@ def get_distance_km_from_topic(db_path, topic_name_substring="local_odometry", v
     if verbose:
         print(f"using topic {topic_id} '{topic_name}' with column '{data_col}'")
     
-    # slice-lvl or run-lvl
-    if start_ns is not None and end_ns is not None:
-        sql = f"SELECT timestamp, {data_col} FROM messages WHERE topic_id = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp"
-        params = (topic_id, int(start_ns), int(end_ns))
-    else:
-        sql = f"SELECT timestamp, {data_col} FROM messages WHERE topic_id = ? ORDER BY timestamp"
-        params = (topic_id,)
+    # stream the rows, fetchall() on a long bag pulls every payload into memory
+    batches = iter_message_batches(conn, [topic_id], data_col, start_ns=start_ns, end_ns=end_ns,
+                                   batch_size=batch_size)
+    total_dist, messages = path_length_m(batches)
     
-    cur.execute(sql, params)
-    messages = cur.fetchall()
     conn.close()
     
     if not messages:
@@ -75,47 +203,33 @@ def get_distance_km_from_topic(db_path, topic_name_substring="local_odometry", v
             print("no messages for this topic")
         return None
     
-    # regex for numbers
-    num_pattern = re.compile(r'[-+]?\d*\.?\d+')
-    
-    prev_pos = None
-    total_dist = 0.0
-    
-    for timestamp, payload in messages:
-        if payload is None:
-            continue
-        
-        position = None
-
-        # regex on raw text
-        if position is None:
-            try:
-                if isinstance(payload, bytes):
-                    text = payload.decode('utf-8', errors='ignore') # ros2 normalization
-                else:
-                    text = str(payload)
-                
-                numbers = [float(m.group()) for m in num_pattern.finditer(text)]
-                if len(numbers) >= 2:
-                    position = (numbers[0], numbers[1])
-            except:
-                pass
-        
-        if position is None:
-            continue
-        
-        if prev_pos is None:
-            prev_pos = position
-            continue
-        
-        dist = calc_distance(prev_pos[0], prev_pos[1], position[0], position[1])
-        total_dist += dist
-        prev_pos = position
-    
     if total_dist <= 0:
         if verbose:
             print("no distance calculated")
         return None
     
     # m -> km
-    return total_dist / 1000.0
\ No newline at end of file
+    return total_dist / 1000.0
+
+
+def odometry_track(db_path, topic_name_substring="local_odometry", batch_size=ODOM_BATCH_SIZE):
+    # (t_ns, x_m, y_m) lists of every parsable odometry position, in time order
+    conn = sqlite3.connect(str(db_path))
+    topic_id, _ = find_topic(conn, topic_name_substring)
+    data_col = find_column_payload(conn) if topic_id is not None else None
+    if data_col is None:
+        conn.close()
+        return None
+    
+    ts, xs, ys = [], [], []
+    for batch in iter_message_batches(conn, [topic_id], data_col, batch_size=batch_size):
+        for timestamp, payload in batch:
+            position = parse_position(payload)
+            if position is None:
+                continue
+            ts.append(timestamp)
+            xs.append(position[0])
+            ys.append(position[1])
+    conn.close()
+    
+    return ts, xs, ys
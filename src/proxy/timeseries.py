@@ -0,0 +1,159 @@
+# per-second topic x time message counts for dashboards
+#
+# one unordered pass per bag drops every message into its (topic, bin) cell
+# with np.bincount. the matrix is stored uint32 in an uncompressed .npz, so
+# the reader can memory-map the counts member straight out of the zip:
+# opening hours of data for dozens of bags only touches the headers.
+# parquet (long format, dictionary-encoded topic column) needs pyarrow.
+
+import sqlite3
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+TS_BATCH_SIZE = 200_000
+
+FORMATS = ("npz", "parquet")
+
+
+def topic_rate_matrix(db_path, bin_s=1.0, batch_size=TS_BATCH_SIZE):
+    # -> (topic names, t0_ns, uint32 counts of shape (n_topics, n_bins)), or None for an empty bag
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM topics")
+    topics = sorted(cur.fetchall())
+    cur.execute("SELECT MIN(timestamp), MAX(timestamp) FROM messages")
+    t0, t1 = cur.fetchone()
+    if t0 is None:
+        conn.close()
+        return None
+
+    bin_ns = int(bin_s * 1e9)
+    n_bins = (t1 - t0) // bin_ns + 1
+
+    names = [name for _, name in topics]
+    max_tid = max(tid for tid, _ in topics) if topics else 0
+    n_top = len(names) + 1  # last row catches topic ids missing from topics
+    lut = np.full(max_tid + 2, n_top - 1, dtype=np.int64)
+    for j, (tid, _) in enumerate(topics):
+        lut[tid] = j
+
+    counts = np.zeros(n_top * n_bins, dtype=np.int64)
+    cur.execute("SELECT topic_id, timestamp FROM messages")
+    while True:
+        batch = cur.fetchmany(batch_size)
+        if not batch:
+            break
+        arr = np.array(batch, dtype=np.int64)
+        row = lut[np.clip(arr[:, 0], 0, max_tid + 1)]
+        col = (arr[:, 1] - t0) // bin_ns
+        counts += np.bincount(row * n_bins + col, minlength=len(counts))
+    conn.close()
+
+    counts = counts.reshape(n_top, n_bins)
+    if counts[-1].any():
+        names.append("unknown")
+    else:
+        counts = counts[:-1]
+    return names, t0, counts.astype(np.uint32)
+
+
+def export_timeseries(db_path, out_dir, bin_s=1.0, fmt="npz"):
+    # writes <out_dir>/<bag>.npz (or .parquet), returns the path or None
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown format '{fmt}', use one of {FORMATS}")
+
+    res = topic_rate_matrix(db_path, bin_s=bin_s)
+    if res is None:
+        return None
+    names, t0, counts = res
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    stem = Path(db_path).stem
+
+    if fmt == "npz":
+        path = out_dir / f"{stem}.npz"
+        # savez (not savez_compressed): members must be stored for the mmap reader
+        np.savez(path, counts=counts, topics=np.array(names), t0_ns=np.int64(t0), bin_s=np.float64(bin_s))
+        return path
+
+    pa, pq = _pyarrow()
+    topic_idx, bins = np.nonzero(counts)
+    table = pa.table({
+        "topic": pa.DictionaryArray.from_arrays(pa.array(topic_idx.astype(np.int32)), pa.array(names)),
+        "second": pa.array((bins * bin_s).astype(np.float64)),
+        "count": pa.array(counts[topic_idx, bins]),
+    })
+    table = table.replace_schema_metadata({"t0_ns": str(t0), "bin_s": str(bin_s), "n_bins": str(counts.shape[1])})
+    path = out_dir / f"{stem}.parquet"
+    pq.write_table(table, path)
+    return path
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("parquet export needs pyarrow (pip install pyarrow), or use the npz format")
+    return pa, pq
+
+
+def _npz_member_memmap(path, member):
+    # memory-maps one stored (uncompressed) .npy member of a zip archive
+    with zipfile.ZipFile(path) as zf:
+        info = zf.getinfo(member)
+        if info.compress_type != zipfile.ZIP_STORED:
+            return None
+    with open(path, "rb") as f:
+        # local file header: 30 bytes + name + extra, the npy file follows
+        f.seek(info.header_offset)
+        local = f.read(30)
+        name_len = int.from_bytes(local[26:28], "little")
+        extra_len = int.from_bytes(local[28:30], "little")
+        f.seek(info.header_offset + 30 + name_len + extra_len)
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape, order="F" if fortran else "C")
+
+
+def load_timeseries(path):
+    # {"topics", "t0_ns", "bin_s", "counts"}; for .npz the counts are a
+    # read-only memmap, nothing is read until a slice of it is used
+    path = Path(path)
+    if path.suffix == ".parquet":
+        _, pq = _pyarrow()
+        table = pq.read_table(path, memory_map=True)
+        meta = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+        bin_s = float(meta["bin_s"])
+        topic = table.column("topic").combine_chunks()
+        names = topic.dictionary.to_pylist()
+        counts = np.zeros((len(names), int(meta["n_bins"])), dtype=np.uint32)
+        bins = np.rint(table.column("second").to_numpy() / bin_s).astype(np.int64)
+        counts[topic.indices.to_numpy(), bins] = table.column("count").to_numpy()
+        return {"topics": names, "t0_ns": int(meta["t0_ns"]), "bin_s": bin_s, "counts": counts}
+
+    with np.load(path) as z:
+        names = z["topics"].tolist()
+        t0 = int(z["t0_ns"])
+        bin_s = float(z["bin_s"])
+    counts = _npz_member_memmap(path, "counts.npy")
+    if counts is None:  # compressed by someone else, read it normally
+        with np.load(path) as z:
+            counts = z["counts"]
+    return {"topics": names, "t0_ns": t0, "bin_s": bin_s, "counts": counts}
+
+
+def load_timeseries_dir(ts_dir):
+    # {bag name: load_timeseries(...)} for every export in a directory
+    out = {}
+    for p in sorted(Path(ts_dir).iterdir()):
+        if p.suffix in (".npz", ".parquet"):
+            out[p.stem] = load_timeseries(p)
+    return out
@@ -0,0 +1,109 @@
+# per-vehicle breakdown for multi-agent bags
+#
+# the vehicle comes from the topic namespace (/vehicle_3/...). counts for all
+# vehicles come out of one GROUP BY and odometry for all vehicles out of one
+# ordered scan, so adding vehicles doesn't add queries.
+
+import re
+import sqlite3
+
+from .deterministic import match_weights
+from .odometry import find_column_payload, iter_message_batches, path_length_by_topic_m, ODOM_BATCH_SIZE
+from .distance import get_distance_km, distance_sources, is_gnss_source
+
+
+VEHICLE_PATTERN = re.compile(r"^/(vehicle_\d+)/")
+
+# vehicle_id used when a bag is not split, and for topics outside any vehicle namespace
+ALL_VEHICLES = "all"
+NO_VEHICLE = "none"
+
+
+def vehicle_id(topic):
+    m = VEHICLE_PATTERN.match(topic)
+    if m:
+        return m.group(1)
+    return NO_VEHICLE
+
+
+def per_vehicle_topic_counts(conn, start_ns=None, end_ns=None):
+    # {vehicle_id: {topic_name: count}} from a single GROUP BY
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM topics")
+    topics = dict(cur.fetchall())
+
+    if start_ns is not None and end_ns is not None:
+        cur.execute(
+            "SELECT topic_id, COUNT(*) FROM messages WHERE timestamp >= ? AND timestamp < ? GROUP BY topic_id",
+            (int(start_ns), int(end_ns))
+        )
+    else:
+        cur.execute("SELECT topic_id, COUNT(*) FROM messages GROUP BY topic_id")
+
+    out = {}
+    for tid, cnt in cur.fetchall():
+        name = topics.get(tid, "unknown")
+        vid = vehicle_id(name)
+        out.setdefault(vid, {})
+        out[vid][name] = out[vid].get(name, 0) + cnt
+    return out
+
+
+def per_vehicle_distance_km(conn, topic_name_substring="local_odometry", start_ns=None, end_ns=None,
+                            batch_size=ODOM_BATCH_SIZE):
+    # {vehicle_id: km} for every vehicle with a matching odometry topic,
+    # all of them read in one ordered pass
+    cur = conn.cursor()
+    cur.execute("SELECT id, name FROM topics")
+
+    odom = {}
+    for tid, name in cur.fetchall():
+        if topic_name_substring.lower() in name.lower():
+            vid = vehicle_id(name)
+            # first matching topic per vehicle, like get_distance_km_from_topic
+            if vid not in odom.values():
+                odom[tid] = vid
+
+    data_col = find_column_payload(conn)
+    if not odom or data_col is None:
+        return {}
+
+    batches = iter_message_batches(conn, list(odom), data_col, start_ns=start_ns, end_ns=end_ns,
+                                   batch_size=batch_size, with_topic=True)
+    lengths = path_length_by_topic_m(batches)
+
+    out = {}
+    for tid, (meters, _) in lengths.items():
+        if meters > 0:
+            out[odom[tid]] = meters / 1000.0
+    return out
+
+
+def per_vehicle_weighted(db_path, weights, odometry_topic="local_odometry", start_ns=None, end_ns=None,
+                         sources=None):
+    # {vehicle_id: {"counts": {topic: n}, "weighted": {topic: pts}, "distance_km": km or None}}
+    sources = distance_sources(odometry_topic, sources)
+    
+    conn = sqlite3.connect(str(db_path))
+    counts = per_vehicle_topic_counts(conn, start_ns, end_ns)
+    dist = {}
+    rest = sources
+    if not is_gnss_source(sources[0]):
+        dist = per_vehicle_distance_km(conn, sources[0], start_ns, end_ns)
+        rest = sources[1:]
+    conn.close()
+    
+    # vehicles the single odometry scan missed fall back down the source list
+    for vid in counts:
+        if vid not in dist and vid != NO_VEHICLE and rest:
+            km = get_distance_km(db_path, rest, start_ns=start_ns, end_ns=end_ns, vehicle=vid)
+            if km is not None:
+                dist[vid] = km
+
+    out = {}
+    for vid in sorted(counts):
+        weighted = {}
+        for name, cnt in counts[vid].items():
+            weighted[name] = cnt * match_weights(name, weights)
+        out[vid] = {"counts": counts[vid], "weighted": weighted, "distance_km": dist.get(vid)}
+    return out
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# command line interface for exporting trained models to the numpy-only onboard format
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def main():
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="Export trained models for the numpy-only onboard predictor")
+    parser.add_argument("--models-dir", "-m", type=str, default=str(project_root / "outputs" / "models"))
+    parser.add_argument("--output", "-o", type=str, default=str(project_root / "outputs" / "onboard"))
+    parser.add_argument("--models", nargs="+", default=None, help="Models to export (default: all in the summary)")
+    parser.add_argument("--check", type=str, default=None, metavar="FEATURES",
+                        help="Compare the exports against the originals on this features file")
+    args = parser.parse_args()
+
+    from ml.export import export_models
+
+    if not (Path(args.models_dir) / "training_summary.json").exists():
+        print(f"Error: no training_summary.json in {args.models_dir}. Run train_model.py first.")
+        return
+
+    X_check = None
+    if args.check:
+        from utils.loaders import load_and_prepare
+        X_check = load_and_prepare(args.check)[0]
+
+    print(f"Exporting to {args.output}/")
+    export_models(args.models_dir, args.output, models=args.models, X_check=X_check)
+
+
+if __name__ == "__main__":
+    main()
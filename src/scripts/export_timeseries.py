@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# command line interface for the per-second topic rate export
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.db_utils import find_all_db3_files
+from utils.progress import ProgressTracker
+from proxy.timeseries import export_timeseries, FORMATS
+
+
+def main():
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="Export per-second topic message counts for every bag")
+    parser.add_argument("--data", "-d", default=str(project_root / "data"))
+    parser.add_argument("--output", "-o", default=str(project_root / "outputs" / "timeseries"))
+    parser.add_argument("--bin", type=float, default=1.0, help="Bin width in seconds (default: 1)")
+    parser.add_argument("--format", default="npz", choices=FORMATS, help="npz (default) or parquet (needs pyarrow)")
+    parser.add_argument("--exclude", nargs="+", default=[])
+    parser.add_argument("--progress-log", default=None, help="JSON-lines progress log ('-' for stdout)")
+    args = parser.parse_args()
+
+    db_files = find_all_db3_files(args.data, exclude_patterns=args.exclude)
+    if not db_files:
+        print("No .db3 files found")
+        return
+    print(f"Exporting {len(db_files)} databases to {args.output}/")
+
+    progress = ProgressTracker(len(db_files), "timeseries", log_path=args.progress_log)
+    for db in sorted(db_files):
+        try:
+            path = export_timeseries(db, args.output, bin_s=args.bin, fmt=args.format)
+            progress.update(db.name, nbytes=os.path.getsize(db))
+            if path is not None:
+                print(f"  {db.name} -> {path.name}")
+        except RuntimeError as e:  # missing pyarrow, no point going on
+            print(f"  {e}")
+            return
+        except Exception as e:
+            print(f"  {db.name}: {e}")
+            progress.update(db.name, ok=False)
+    progress.finish()
+
+
+if __name__ == "__main__":
+    main()
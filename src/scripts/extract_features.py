@@ -8,7 +8,7 @@ from pathlib import Path
 # parent path for import
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from features import extract_all_features
+from utils.tables import OUTPUT_FORMATS
 
 
 def main():
@@ -29,12 +29,44 @@ def main():
         default=str(project_root / "outputs" / "features.csv"),
         help="Output CSV file path (default: ./outputs/features.csv)"
     )
+    parser.add_argument(
+        "--format",
+        type=str,
+        default="csv",
+        choices=OUTPUT_FORMATS,
+        help="csv (default) or typed parquet, written next to --output as .parquet (needs pyarrow)"
+    )
     parser.add_argument(
         "--slice", "-s",
         type=int,
         default=60,
         help="Time slice duration in seconds (default: 60)"
     )
+    parser.add_argument(
+        "--slice-mode",
+        type=str,
+        default="time",
+        choices=["time", "distance", "lap"],
+        help="Slice by wall-clock time, by distance or by lap (default: time)"
+    )
+    parser.add_argument(
+        "--slice-km",
+        type=float,
+        default=1.0,
+        help="Segment length in km for --slice-mode distance (default: 1.0)"
+    )
+    parser.add_argument(
+        "--lap-min-km",
+        type=float,
+        default=1.0,
+        help="Minimum lap length for --slice-mode lap (default: 1.0)"
+    )
+    parser.add_argument(
+        "--lap-radius-m",
+        type=float,
+        default=30.0,
+        help="Distance to the start point that closes a lap (default: 30)"
+    )
     parser.add_argument(
         "--weights", "-w",
         type=str,
@@ -47,6 +79,13 @@ def main():
         default="local_odometry",
         help="Odometry topic name substring for distance (default: local_odometry)"
     )
+    parser.add_argument(
+        "--distance-sources",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Distance sources in priority order (default: <odometry-topic> bestpos bestgnsspos)"
+    )
     parser.add_argument(
         "--exclude",
         type=str,
@@ -54,17 +93,61 @@ def main():
         default=[],
         help="Folder patterns to exclude (e.g., --exclude S1 S2)"
     )
+    parser.add_argument(
+        "--progress-log",
+        type=str,
+        default=None,
+        help="Write progress as JSON lines to this file ('-' for stdout)"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=str,
+        default=None,
+        help="Prometheus textfile collector file updated during the run (.prom)"
+    )
+    parser.add_argument(
+        "--per-vehicle",
+        action="store_true",
+        help="One row per vehicle namespace per slice (multi-agent bags)"
+    )
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help="Also upsert the feature rows into this sqlite results store"
+    )
+    parser.add_argument(
+        "--no-gap-stats",
+        action="store_true",
+        help="Skip the per-topic inter-arrival (gap / drop) columns"
+    )
     
     args = parser.parse_args()
+
+    from features import extract_all_features
     
-    extract_all_features(
-        root_path=args.data,
-        output_csv=args.output,
-        slice_seconds=args.slice,
-        weights_path=args.weights,
-        exclude_patterns=args.exclude,
-        odometry_topic=args.odometry_topic,
-    )
+    try:
+        extract_all_features(
+            root_path=args.data,
+            output_csv=args.output,
+            slice_seconds=args.slice,
+            weights_path=args.weights,
+            exclude_patterns=args.exclude,
+            odometry_topic=args.odometry_topic,
+            progress_log=args.progress_log,
+            metrics_file=args.metrics_file,
+            per_vehicle=args.per_vehicle,
+            distance_sources=args.distance_sources,
+            slice_mode=args.slice_mode,
+            slice_km=args.slice_km,
+            min_lap_km=args.lap_min_km,
+            lap_radius_m=args.lap_radius_m,
+            gap_stats=not args.no_gap_stats,
+            output_format=args.format,
+            store=args.store,
+        )
+    except RuntimeError as e:
+        print(e)
 
 
 if __name__ == "__main__":
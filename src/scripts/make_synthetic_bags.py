@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# command line interface for writing synthetic RACECAR-like .db3 bags
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def main():
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="Generate synthetic rosbag2 databases with the RACECAR topic layout")
+    parser.add_argument("--output", "-o", default=str(project_root / "data" / "synthetic"),
+                        help="Output folder (default: ./data/synthetic)")
+    parser.add_argument("--bags", "-n", type=int, default=1, help="Number of bags to write")
+    parser.add_argument("--duration", type=float, default=60.0, help="Bag duration in seconds")
+    parser.add_argument("--vehicles", type=int, default=1, help="Vehicles per bag (multi-agent: 2+)")
+    parser.add_argument("--cameras", type=int, default=6)
+    parser.add_argument("--lidars", type=int, default=3)
+    parser.add_argument("--side-radars", type=int, default=2)
+    parser.add_argument("--rate-scale", type=float, default=1.0, help="Multiplier on all topic rates")
+    parser.add_argument("--payload-scale", type=float, default=0.01, help="Multiplier on real payload sizes")
+    parser.add_argument("--speed", type=float, default=40.0, help="Vehicle speed in m/s")
+    parser.add_argument("--drop-prob", type=float, default=0.0, help="Per-message drop probability")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--weights", "-w", default=str(project_root / "configs" / "weights.yaml"))
+    args = parser.parse_args()
+
+    from bench.synthetic import write_synthetic_bag
+    from utils.loaders import load_weights
+
+    weights = load_weights(args.weights)
+    out = Path(args.output)
+
+    for i in range(args.bags):
+        name = f"SYN-{int(args.duration)}s-V{args.vehicles}-{i:03d}"
+        info = write_synthetic_bag(
+            out / name / f"{name}.db3",
+            duration_s=args.duration,
+            n_vehicles=args.vehicles,
+            cameras=args.cameras,
+            lidars=args.lidars,
+            side_radars=args.side_radars,
+            rate_scale=args.rate_scale,
+            payload_scale=args.payload_scale,
+            speed_mps=args.speed,
+            drop_prob=args.drop_prob,
+            seed=args.seed + i,
+            weights=weights,
+        )
+        print(f"[{i + 1}/{args.bags}] {info['path']}: {info['n_messages']} msgs, "
+              f"{info['bytes'] / 1e6:.1f} MB, ~{info['expected_km']} km")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+# command line interface for querying the sqlite results store
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.store import ResultsStore, TABLES
+
+
+def main():
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="Query proxy results and feature slices from the results store")
+    parser.add_argument("--store", "-s", default=str(project_root / "outputs" / "results.db"))
+    parser.add_argument("--table", "-t", default="features", choices=list(TABLES))
+    parser.add_argument("--where", "-w", default=None,
+                        help="SQL condition, e.g. \"scenario = 'S3' AND lidar_ratio > 0.4\"")
+    parser.add_argument("--columns", "-c", nargs="+", default=None, help="Columns to return (default: all)")
+    parser.add_argument("--limit", type=int, default=None)
+    parser.add_argument("--output", "-o", default=None, help="Write the result to this CSV instead of printing")
+    args = parser.parse_args()
+
+    if not Path(args.store).exists():
+        print(f"No results store at {args.store}")
+        return
+
+    with ResultsStore(args.store) as st:
+        df = st.query(args.table, where=args.where, columns=args.columns, limit=args.limit)
+
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"Saved {len(df)} rows to {args.output}")
+    else:
+        print(df.to_string(index=False, max_rows=50))
+        print(f"({len(df)} rows)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+# command line interface for the synthetic benchmark suite
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from bench.harness import BENCHES, run_benchmarks, compare, save_results
+
+
+def main():
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="Benchmark proxy, feature and training paths on synthetic bags")
+    parser.add_argument("--output", "-o", default=str(project_root / "outputs" / "benchmark.json"),
+                        help="Result JSON path (default: ./outputs/benchmark.json)")
+    parser.add_argument("--work-dir", default=None, help="Where synthetic bags go (default: temp dir)")
+    parser.add_argument("--durations", type=float, nargs="+", default=[60, 300], help="Bag sizes in seconds")
+    parser.add_argument("--feature-rows", type=int, nargs="+", default=[2000, 20000],
+                        help="Feature table sizes for run_pipeline")
+    parser.add_argument("--benches", nargs="+", default=BENCHES, choices=BENCHES)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--vehicles", type=int, default=1)
+    parser.add_argument("--rate-scale", type=float, default=1.0)
+    parser.add_argument("--payload-scale", type=float, default=0.01)
+    parser.add_argument("--weights", "-w", default=str(project_root / "configs" / "weights.yaml"))
+    parser.add_argument("--compare", default=None, help="Earlier benchmark JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Slowdown ratio counted as regression")
+    args = parser.parse_args()
+
+    work = args.work_dir or tempfile.mkdtemp(prefix="swp_bench_")
+    print(f"BENCHMARK (work dir: {work})")
+
+    res = run_benchmarks(
+        work,
+        durations=args.durations,
+        feature_rows=args.feature_rows,
+        benches=args.benches,
+        repeat=args.repeat,
+        weights_path=args.weights,
+        n_vehicles=args.vehicles,
+        rate_scale=args.rate_scale,
+        payload_scale=args.payload_scale,
+    )
+    save_results(res, args.output)
+    print(f"Saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        rows = compare(old, res, threshold=args.threshold)
+        print(f"\nCompared with {old['meta'].get('git_commit')}:")
+        n_bad = 0
+        for r in rows:
+            flag = "  REGRESSION" if r["regression"] else ""
+            print(f"  {r['bench']:<28} {r['size']:>8}  {r['old_wall_s']:8.3f}s -> {r['new_wall_s']:8.3f}s "
+                  f"(x{r['ratio']:.2f}){flag}")
+            n_bad += r["regression"]
+        if n_bad:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
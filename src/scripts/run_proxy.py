@@ -11,6 +11,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 from utils.db_utils import find_all_db3_files
 from utils.loaders import load_weights
 from proxy.compute import sum_proxy
+from proxy.estimate import estimate_proxy
+from utils.tables import OUTPUT_FORMATS
 
 
 def main():
@@ -21,8 +23,24 @@ def main():
     parser.add_argument("--weights", "-w", default=str(project_root / "configs" / "weights.yaml"))
     parser.add_argument("--output", "-o", default=str(project_root / "outputs"))
     parser.add_argument("--odometry-topic", default="local_odometry")
+    parser.add_argument("--distance-sources", nargs="+", default=None,
+                        help="Distance sources in priority order (default: <odometry-topic> bestpos bestgnsspos)")
     parser.add_argument("--exclude", nargs="+", default=[])
+    parser.add_argument("--progress-log", default=None, help="JSON-lines progress log ('-' for stdout)")
+    parser.add_argument("--metrics-file", default=None, help="Prometheus textfile collector output (.prom)")
+    parser.add_argument("--format", default="csv", choices=OUTPUT_FORMATS,
+                        help="proxy_results as csv (default) or typed parquet (needs pyarrow)")
+    parser.add_argument("--store", default=None, help="Also upsert the results into this sqlite results store")
+    parser.add_argument("--per-vehicle", action="store_true", help="One result row per vehicle namespace")
+    parser.add_argument("--estimate", action="store_true", help="Quick sampled estimate with confidence intervals")
+    parser.add_argument("--sample-frac", type=float, default=0.05, help="Fraction of blocks read per bag (--estimate)")
+    parser.add_argument("--blocks", type=int, default=200, help="Blocks per bag (--estimate)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rank-by", default="pts_per_km", choices=["pts_per_km", "pts_per_hour", "weighted_msg_count"])
     args = parser.parse_args()
+    if args.estimate and args.per_vehicle:
+        # the sampled estimate counts whole-bag blocks, it has no per-vehicle rows
+        parser.error("--per-vehicle can't be combined with --estimate")
     
     print("[1/3] Discovering databases...")
     db_files = find_all_db3_files(args.data, exclude_patterns=args.exclude)
@@ -38,8 +56,23 @@ def main():
         return
 
     print("[2/3] Processing... (might take a little while)")
-    config = {"data_path": args.data, "weights_path": args.weights, "odometry_topic": args.odometry_topic}
-    summary = sum_proxy(db_files, weights, args.output, args.odometry_topic, config)
+    config = {"data_path": args.data, "weights_path": args.weights, "odometry_topic": args.odometry_topic,
+              "per_vehicle": args.per_vehicle, "distance_sources": args.distance_sources}
+    if args.estimate:
+        config.update({"sample_frac": args.sample_frac, "blocks": args.blocks, "seed": args.seed})
+        summary = estimate_proxy(db_files, weights, args.output, args.odometry_topic, config,
+                                 sample_frac=args.sample_frac, n_blocks=args.blocks, seed=args.seed,
+                                 rank_by=args.rank_by,
+                                 progress_log=args.progress_log, metrics_file=args.metrics_file)
+    else:
+        try:
+            summary = sum_proxy(db_files, weights, args.output, args.odometry_topic, config,
+                                progress_log=args.progress_log, metrics_file=args.metrics_file,
+                                per_vehicle=args.per_vehicle, distance_sources=args.distance_sources,
+                                output_format=args.format, store=args.store)
+        except RuntimeError as e:
+            print(f"      {e}")
+            return
     
     if not summary:
         print("      No databases processed")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+# command line interface for the proxy sanity checks (no plots)
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def main():
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="SC1-SC4 sanity-check correlations with bootstrap confidence intervals")
+    parser.add_argument("--proxy-results", "-p", type=str, default=None,
+                        help="proxy_results.csv / .parquet (default: outputs/proxy_results.*)")
+    parser.add_argument("--features", "-f", type=str, default=None,
+                        help="features.csv / .parquet for the slice-level check (default: outputs/features.*)")
+    parser.add_argument("--store", type=str, default=None, help="Read both tables from this sqlite results store instead")
+    parser.add_argument("--where", type=str, default=None,
+                        help="SQL condition on the --store rows, e.g. \"scenario IN ('S1', 'S2')\"")
+    parser.add_argument("--n-boot", type=int, default=2000, help="Bootstrap resamples per check (0 = no CIs)")
+    parser.add_argument("--ci", type=float, default=0.95, help="Confidence level")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-scenarios", action="store_true", help="Only the checks over all rows, no per-scenario rows")
+    parser.add_argument("--output", "-o", type=str, default=str(project_root / "outputs" / "sanity_checks.csv"))
+    args = parser.parse_args()
+
+    import time
+    from ml.sanity import load_sanity_inputs, run_sanity_checks
+    from utils.tables import find_table
+
+    t0 = time.perf_counter()
+    if args.store:
+        if not Path(args.store).exists():
+            print(f"Error: results store {args.store} not found.")
+            return
+        runs, slices = load_sanity_inputs(store=args.store, where=args.where)
+        source = Path(args.store).name
+    else:
+        proxy_path = Path(args.proxy_results) if args.proxy_results else find_table(project_root / "outputs", "proxy_results")
+        if not proxy_path.exists():
+            print(f"Error: {proxy_path} not found. Run run_proxy.py first.")
+            return
+        features_path = Path(args.features) if args.features else find_table(project_root / "outputs", "features")
+        runs, slices = load_sanity_inputs(proxy_path, features_path)
+        source = proxy_path.name
+    if len(runs) == 0:
+        print("Error: no proxy results selected.")
+        return
+
+    out = run_sanity_checks(runs, slices, by_scenario=not args.no_scenarios, n_boot=args.n_boot, ci=args.ci,
+                            seed=args.seed)
+    out.to_csv(args.output, index=False)
+
+    print(f"{len(runs)} runs, {0 if slices is None else len(slices)} slices from {source} "
+          f"({time.perf_counter() - t0:.2f}s)")
+    print(out[out["scenario"] == "all"][["check", "level", "n", "r", "r_lo", "r_hi"]].to_string(index=False))
+    print(f"\nSaved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
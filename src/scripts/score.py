@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# command line interface for scoring new slices with a trained model
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def main():
+    project_root = Path(__file__).parent.parent.parent
+
+    parser = argparse.ArgumentParser(description="Predict weighted_pts for new slices with a trained model")
+    parser.add_argument("features", type=str, help="features.csv / .parquet from extract_features.py")
+    parser.add_argument("--models-dir", "-m", type=str, default=str(project_root / "outputs" / "models"),
+                        help="Folder with training_summary.json and the .joblib models")
+    parser.add_argument("--model", type=str, default=None, help="Model to use (default: best_model of the summary)")
+    parser.add_argument("--output", "-o", type=str, default=None,
+                        help="Output CSV (default: <features>_scores.csv next to the input)")
+    parser.add_argument("--batch-rows", type=int, default=200_000, help="Rows per predict call")
+    args = parser.parse_args()
+
+    from ml.score import Scorer
+
+    features_path = Path(args.features)
+    if not features_path.exists():
+        print(f"Error: {features_path} not found.")
+        return
+    out_path = Path(args.output) if args.output else features_path.with_name(features_path.stem + "_scores.csv")
+
+    try:
+        scorer = Scorer(args.models_dir, model=args.model)
+        stats = scorer.score_file(features_path, out_path, batch_rows=args.batch_rows)
+    except (FileNotFoundError, RuntimeError) as e:
+        print(f"Error: {e}")
+        return
+
+    print(f"Scored {stats['rows']} rows with {stats['model']} in {stats['wall_s']:.2f}s "
+          f"({stats['rows_per_s']:.0f} rows/s, predict {stats['predict_s']:.2f}s)")
+    print(f"Saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
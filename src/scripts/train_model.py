@@ -7,28 +7,28 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-import matplotlib
-matplotlib.use('Agg')
-
-from utils.loaders import load_and_prepare
-from ml import run_pipeline
-
 
 def find_features():
-    locations = [
-        Path.cwd() / "features.csv",
-        Path(__file__).parent.parent.parent / "outputs" / "features.csv",
-    ]
+    from utils.tables import find_table
+
+    locations = [Path.cwd(), Path(__file__).parent.parent.parent / "outputs"]
     for loc in locations:
-        if loc.exists():
-            return loc
+        path = find_table(loc, "features")
+        if path.exists():
+            return path
     return None
 
 
 def main():
     parser = argparse.ArgumentParser(description="Train ML models for proxy prediction")
-    parser.add_argument("--features", "-f", type=str, help="Path to features.csv")
+    parser.add_argument("--features", "-f", type=str, help="Path to features.csv or features.parquet")
     parser.add_argument("--output", "-o", type=str, help="Output directory")
+    parser.add_argument("--store", type=str, default=None, help="Train on feature rows from this sqlite results store")
+    parser.add_argument("--query", type=str, default=None,
+                        help="SQL condition selecting the training rows from --store, e.g. \"scenario = 'S3'\"")
+    parser.add_argument("--slicing", type=str, default="time:60",
+                        help="Slicing of the --store rows to train on, e.g. time:60, distance:1, time:60:vehicle "
+                             "(all = every slicing, the same drive then appears once per slicing)")
     parser.add_argument("--test-size", type=float, default=0.2)
     parser.add_argument("--random-state", type=int, default=42)
     parser.add_argument("--models", "-m", nargs="+", default=["linear_regression", "random_forest", "xgboost"],
@@ -36,23 +36,179 @@ def main():
     parser.add_argument("--n-estimators", type=int, default=300)
     parser.add_argument("--max-depth", type=int, default=6)
     parser.add_argument("--skip-plots", action="store_true")
+    parser.add_argument("--plots-only", action="store_true",
+                        help="Only redraw the plots from the results saved in --output, no training")
+    parser.add_argument("--max-points", type=int, default=None,
+                        help="Scatter plots with more points are drawn as hexbins (default 20000)")
     parser.add_argument("--skip-robustness", action="store_true")
+    parser.add_argument("--dropout-pairs", action="store_true",
+                        help="Robustness test also drops every pair of sensor families")
+    parser.add_argument("--ablation-grid", action="store_true",
+                        help="Also run every combination of missing sensor families and permutation importance")
+    parser.add_argument("--perm-repeats", type=int, default=5, help="Shuffles per feature for permutation importance")
+    parser.add_argument("--jobs", "-j", type=int, default=-1, help="Worker processes for --ablation-grid, --cv and plot rendering (-1 = all cores)")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="Total CPU threads split over the models trained at once (default: all cores)")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Train one model at a time, each with every thread")
+    parser.add_argument("--search", action="store_true",
+                        help="Tune random_forest / xgboost by successive halving before the final fit")
+    parser.add_argument("--search-budget", type=float, default=300, help="Wall-clock seconds for --search")
+    parser.add_argument("--search-candidates", type=int, default=27, help="Configs per model in the first rung")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Always refit, don't read or write the model cache")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Model cache folder (default: <output>/cache)")
+    parser.add_argument("--update", type=str, default=None, metavar="NEW_FEATURES",
+                        help="Update the saved models in --output with the slices in this file instead of retraining")
+    parser.add_argument("--update-trees", type=int, default=50, help="Trees added per forest by --update")
+    parser.add_argument("--cv", type=int, default=None, metavar="K",
+                        help="Grouped K-fold cross-validation over worker processes instead of a single split")
+    parser.add_argument("--out-of-core", type=str, default=None, metavar="DIR",
+                        help="Train from a memory-mapped float32 copy of features.csv kept in DIR")
+    parser.add_argument("--batch-rows", type=int, default=200_000, help="Rows per batch with --out-of-core")
     args = parser.parse_args()
-    
-    features_path = Path(args.features) if args.features else find_features()
-    if not features_path or not features_path.exists():
-        print("Error: features.csv not found. Run extract_features.py first.")
+
+    # heavy imports only once the arguments are known and only for the mode
+    # that runs (--help stays instant)
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from utils.loaders import load_and_prepare, ID_COLUMNS, CANDIDATE_FEATURES
+    from utils.store import ResultsStore
+    from utils.tables import find_table
+
+    output_dir = Path(args.output) if args.output else Path(__file__).parent.parent.parent / "outputs" / "models"
+
+    if args.update:
+        new_path = Path(args.update)
+        if not new_path.exists():
+            print(f"Error: {new_path} not found.")
+            return
+        if not (output_dir / "training_summary.json").exists():
+            print(f"Error: no trained models in {output_dir}. Train once first.")
+            return
+        print("[1/3] Loading new slices...")
+        X, y, feat_list, groups, distance_km, df = load_and_prepare(new_path)
+        print(f"      {len(y)} new samples")
+        print("[2/3] Updating models...")
+        from ml.incremental import update_models
+        upd = update_models(X, y, feat_list, output_dir, groups=groups, models=args.models,
+                            new_trees=args.update_trees, random_state=args.random_state)
+        print("[3/3] Drift on held-out new runs:")
+        for m in upd["models"]:
+            print(f"      {m['name']:<18} test R²={m['r2_test']:.4f}  new R² {m['r2_new_before']:.4f} -> "
+                  f"{m['r2_new_after']:.4f}  ({m['update_s']:.2f}s)")
+        print(f"\nSaved update_report.json to {output_dir}/")
         return
+
+    if args.store:
+        store_path = Path(args.store)
+        if not store_path.exists():
+            print(f"Error: results store {store_path} not found.")
+            return
+        features_path = None
+        proxy_results_path = find_table(store_path.parent, "proxy_results")
+    else:
+        features_path = Path(args.features) if args.features else find_features()
+        if not features_path or not features_path.exists():
+            print("Error: features.csv not found. Run extract_features.py first.")
+            return
+        proxy_results_path = find_table(features_path.parent, "proxy_results")
     
-    output_dir = Path(args.output) if args.output else Path(__file__).parent.parent.parent / "outputs" / "models"
     plots_dir = output_dir / "plots"
-    proxy_results_path = features_path.parent / "proxy_results.csv"
     
+    if args.plots_only:
+        if not (output_dir / "training_summary.json").exists():
+            print(f"Error: no trained models in {output_dir}. Train once first.")
+            return
+        print("[1/1] Rendering plots...")
+        from ml.render import render_plots
+        render_plots(output_dir, plots_dir, proxy_results_path=proxy_results_path, features_path=features_path,
+                     n_jobs=args.jobs, max_points=args.max_points)
+        print(f"\nSaved plots to {plots_dir}/")
+        return
+    
+    dropout_scenarios = None
+    if args.dropout_pairs:
+        from ml.robustness import dropout_combinations
+        dropout_scenarios = dropout_combinations(max_size=2)
+    
+    if args.out_of_core:
+        if args.store or features_path.suffix != ".csv":
+            print("Error: --out-of-core streams a features.csv file.")
+            return
+        if args.ablation_grid:
+            print("      --ablation-grid needs the test matrix in memory, skipped with --out-of-core")
+        print("[1/4] Memory-mapping features...")
+        from ml.outofcore import build_feature_memmap, memmap_is_current, run_pipeline_out_of_core
+        if not memmap_is_current(args.out_of_core, features_path):
+            build_feature_memmap(features_path, args.out_of_core, chunksize=args.batch_rows)
+        print("[2/4] Training (out of core)...")
+        summary = run_pipeline_out_of_core(
+            args.out_of_core, output_dir,
+            models=args.models,
+            test_size=args.test_size,
+            random_state=args.random_state,
+            n_estimators=args.n_estimators,
+            max_depth=args.max_depth,
+            skip_robustness=args.skip_robustness,
+            batch_rows=args.batch_rows,
+            dropout_scenarios=dropout_scenarios,
+            verbose=False,
+        )
+        if summary and not args.skip_plots:
+            from ml.render import render_plots
+            render_plots(output_dir, plots_dir, proxy_results_path=proxy_results_path, features_path=features_path,
+                         n_jobs=args.jobs, max_points=args.max_points, verbose=False)
+        report(summary, output_dir)
+        return
+
     print("[1/4] Loading data...")
-    X, y, feat_list, groups, distance_km, df = load_and_prepare(features_path)
+    if args.store:
+        # every slicing of a bag is stored side by side, mixing them would
+        # train on the same drive several times and leak it across the split
+        conds, params = [], []
+        if args.slicing != "all":
+            conds.append("slicing = ?")
+            params.append(args.slicing)
+        if args.query:
+            conds.append(f"({args.query})")
+        where = " AND ".join(conds) or None
+        with ResultsStore(store_path) as st:
+            data = st.query("features", where=where, params=params, columns=ID_COLUMNS + CANDIDATE_FEATURES)
+            slicings = st.slicings()
+        print(f"      {len(data)} rows from {store_path.name} (slicing {args.slicing})"
+              + (f" where {args.query}" if args.query else ""))
+        if data.empty:
+            print(f"Error: no feature rows selected. Slicings in the store: {', '.join(slicings) or 'none'}")
+            return
+        X, y, feat_list, groups, distance_km, df = load_and_prepare(data)
+    else:
+        X, y, feat_list, groups, distance_km, df = load_and_prepare(features_path)
     print(f"      {len(y)} samples, {len(feat_list)} features")
 
+    if args.cv:
+        print(f"[2/4] Cross-validating ({args.cv} folds)...")
+        from ml.cv import cross_validate
+        summary = cross_validate(
+            X, y, groups, feat_list, output_dir,
+            k=args.cv,
+            models=args.models,
+            random_state=args.random_state,
+            n_estimators=args.n_estimators,
+            max_depth=args.max_depth,
+            n_jobs=args.jobs,
+            n_threads=args.threads,
+            verbose=False,
+        )
+        print("[3/4] Results (mean ± std over folds):")
+        for m in summary["models"]:
+            print(f"      {m['name']:<18} R²={m['r2']:.4f} ± {m['r2_std']:.4f}")
+        print(f"[4/4] Saved cv_folds.csv / cv_summary.csv / cv_summary.json to {output_dir}/")
+        return
+
     print("[2/4] Training...")
+    from ml import run_pipeline
     summary = run_pipeline(
         X, y, df, feat_list, groups,
         output_dir=output_dir,
@@ -66,16 +222,36 @@ def main():
         skip_robustness=args.skip_robustness,
         proxy_results_path=proxy_results_path,
         features_path=features_path,
+        dropout_scenarios=dropout_scenarios,
+        ablation=args.ablation_grid,
+        perm_repeats=args.perm_repeats,
+        n_jobs=args.jobs,
+        n_threads=args.threads,
+        concurrent=not args.sequential,
+        search=args.search,
+        search_budget_s=args.search_budget,
+        search_candidates=args.search_candidates,
+        cache_dir=False if args.no_cache else args.cache_dir,
+        max_points=args.max_points,
         verbose=False,
+        search_verbose=args.search,
     )
     
+    report(summary, output_dir)
+
+
+def report(summary, output_dir):
     if not summary:
         print("No models trained")
         return
     
     print("[3/4] Results:")
     for m in summary["models"]:
-        print(f"      {m['name']:<18} R²={m['r2']:.4f}")
+        line = f"      {m['name']:<18} R²={m['r2']:.4f}"
+        if "train_s" in m:
+            fit = "cached" if m.get("cached") else f"fit {m['train_s']:.1f}s ({m['threads']} thr)"
+            line += f"  {fit}, post {m['post_s']:.1f}s"
+        print(line)
     print(f"[4/4] Saved to {output_dir}/")
     print(f"\nBest: {summary['best_model']} (R²={summary['best_r2']:.4f})")
 
@@ -1,13 +1,13 @@
 # config loaders
+#
+# yaml, numpy, pandas and sklearn are imported inside the functions that
+# need them: run_proxy.py only needs load_weights, and --help nothing at all
 
-import numpy as np
-import pandas as pd
-from sklearn.model_selection import GroupShuffleSplit
 from pathlib import Path
-import yaml
-import random
     
 def load_weights(config_path: str = None):
+    import yaml
+
     if config_path is None:
         current_file = Path(__file__).resolve()
         config_path = current_file.parent.parent.parent / "configs" / "weights.yaml"
@@ -37,54 +37,141 @@ def normalize_weights(weight_map: dict) -> dict:
     print(f"Normalized weight map")
     return normalized
 
-def load_and_prepare(csv_path: str): # load features and prep data
-    df = pd.read_csv(csv_path)
+CANDIDATE_FEATURES = [
+    "duration",
+    "distance_km",
+    "avg_speed_kmh",
+    "image_ratio",
+    "lidar_ratio", 
+    "radar_ratio",
+    "imu_ratio",
+    "odometry_ratio",
+    "lidar_to_camera_ratio",
+    "radar_to_lidar_ratio", 
+    "perception_to_nav_ratio",
+    "n_active_topics",
+]
+
+# columns load_and_prepare keeps besides the features
+ID_COLUMNS = ["run_id", "vehicle_id", "bag_name", "slice_idx", "weighted_pts"]
+
+
+def load_and_prepare(csv_path: str, chunksize=None, float_dtype="float64"): # load features and prep data
+    # csv_path can also be a DataFrame already loaded (e.g. from the results store).
+    # only the id / target / feature columns are read. chunksize reads the csv
+    # in pieces and keeps just the valid rows of each, float_dtype="float32"
+    # halves the feature matrix (default float64 keeps X exactly as before)
+    import pandas as pd
+
+    if isinstance(csv_path, pd.DataFrame):
+        df = csv_path.copy()
+        df.columns = [c.strip() for c in df.columns]
+        return _finish_prepare(_filter_valid(df, "features.csv"), float_dtype)
+
+    path = Path(csv_path)
+    name = path.name
+    cols = _needed_columns(path)
+
+    if path.suffix == ".parquet":
+        from .tables import read_table
+        df = _filter_valid(read_table(path, columns=cols), name)
+    elif chunksize:
+        parts = [_filter_valid(c, name, check=False) for c in _read_csv_chunks(path, cols, chunksize, float_dtype)]
+        df = _check_valid(pd.concat(parts) if parts else pd.DataFrame(columns=cols), name)
+    else:
+        df = _filter_valid(_read_csv(path, cols, float_dtype), name)
+
+    return _finish_prepare(df, float_dtype)
+
+
+def iter_prepared_chunks(csv_path, chunksize=100_000, float_dtype="float32"):
+    # streams (X, y, groups, distance_km) per chunk for features files larger
+    # than RAM. the feature list is fixed by the header, chunks without any
+    # valid row are skipped
+    path = Path(csv_path)
+    cols = _needed_columns(path)
+    for chunk in _read_csv_chunks(path, cols, chunksize, float_dtype):
+        chunk = _filter_valid(chunk, path.name, check=False)
+        if chunk.empty:
+            continue
+        X, y, _, groups, distance_km, _ = _finish_prepare(chunk, float_dtype)
+        yield X, y, groups, distance_km
+
+
+def feature_columns(csv_path):
+    # feature names load_and_prepare would use for this file
+    from .tables import table_columns
+    have = set(table_columns(csv_path))
+    return [f for f in CANDIDATE_FEATURES if f in have]
+
+
+def _needed_columns(path):
+    from .tables import table_columns
+    have = table_columns(path)
+    if "distance_km" not in have:
+        raise RuntimeError(f"{Path(path).name} missing columns: {{'distance_km'}}")
+    return [c for c in ID_COLUMNS + CANDIDATE_FEATURES if c in have]
+
+
+def _csv_dtypes(cols, float_dtype):
+    # features are plain numbers; distance_km may hold "N/A" and is coerced later
+    return {c: float_dtype for c in cols if c in CANDIDATE_FEATURES and c != "distance_km"}
+
+
+def _read_csv(path, cols, float_dtype):
+    import pandas as pd
+    df = pd.read_csv(path, usecols=lambda c: c.strip() in cols, dtype=_csv_dtypes(cols, float_dtype))
     df.columns = [c.strip() for c in df.columns]
+    return df
 
-    required = {"distance_km"}
-    missing = required - set(df.columns)
-    if missing:
-        raise RuntimeError(f"features.csv missing columns: {missing}")
-    
-    good_rows = []
-    for idx, row in df.iterrows():
-        dist = row["distance_km"]
-        if pd.notna(dist) and str(dist) != "N/A" and float(dist) > 0:
-            good_rows.append(idx)
-    
-    df = df.loc[good_rows]
 
+def _read_csv_chunks(path, cols, chunksize, float_dtype):
+    import pandas as pd
+    reader = pd.read_csv(path, usecols=lambda c: c.strip() in cols, dtype=_csv_dtypes(cols, float_dtype),
+                         chunksize=chunksize)
+    for chunk in reader:
+        chunk.columns = [c.strip() for c in chunk.columns]
+        yield chunk
+
+
+def _filter_valid(df, name, check=True):
+    # rows with a positive numeric distance, plus the target columns
+    import pandas as pd
+
+    if "distance_km" not in df.columns:
+        raise RuntimeError(f"{name} missing columns: {{'distance_km'}}")
+
+    dist = pd.to_numeric(df["distance_km"], errors="coerce")
+    keep = dist.notna() & (dist > 0)
+    df = df[keep].copy()
+    df["distance_km"] = dist[keep].astype(float)
+
+    if check:
+        df = _check_valid(df, name)
+    if "weighted_pts" not in df.columns:
+        raise RuntimeError(f"{name} missing 'weighted_pts' column")
+
+    # target
+    df["proxy_total_pts"] = df["weighted_pts"].astype(float)
+    df["pts_per_km"] = df["proxy_total_pts"] / df["distance_km"]
+    return df
+
+
+def _check_valid(df, name):
     if df.empty:
         raise RuntimeError(
-            "No valid data found in features.csv. "
+            f"No valid data found in {name}. "
             "All rows have invalid or missing distance_km values. "
             "Please check that odometry data is available in the ROS bags and re-run feature extraction."
         )
+    return df
 
-    # target
-    if "weighted_pts" not in df.columns:
-        raise RuntimeError("features.csv missing 'weighted_pts' column")
-    
-    df["proxy_total_pts"] = df["weighted_pts"].astype(float)
-    df["pts_per_km"] = df["proxy_total_pts"] / df["distance_km"]
 
-    candidate_feats = [
-        "duration",
-        "distance_km",
-        "avg_speed_kmh",
-        "image_ratio",
-        "lidar_ratio", 
-        "radar_ratio",
-        "imu_ratio",
-        "odometry_ratio",
-        "lidar_to_camera_ratio",
-        "radar_to_lidar_ratio", 
-        "perception_to_nav_ratio",
-        "n_active_topics",
-    ]
+def _finish_prepare(df, float_dtype="float64"):
+    import numpy as np
 
     feature_names = []
-    for feat in candidate_feats:
+    for feat in CANDIDATE_FEATURES:
         if feat in df.columns:
             feature_names.append(feat)
     
@@ -92,7 +179,7 @@ def load_and_prepare(csv_path: str): # load features and prep data
         raise RuntimeError("No valid feature columns found in features.csv")
 
     # data fix
-    X = df[feature_names].replace([np.inf, -np.inf], np.nan).fillna(0.0).astype(float)
+    X = df[feature_names].replace([np.inf, -np.inf], np.nan).fillna(0.0).astype(float_dtype)
     y = df["proxy_total_pts"].astype(float)
     groups = df["run_id"] if "run_id" in df.columns else None
     distance_km = df["distance_km"].astype(float).to_numpy()
@@ -101,6 +188,8 @@ def load_and_prepare(csv_path: str): # load features and prep data
 
 
 def split_data(X, y, groups, test_size=0.2, random_state=42):
+    from sklearn.model_selection import GroupShuffleSplit
+
     if groups is not None and len(groups) > 0:
         splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=random_state)
         train_idx, test_idx = next(splitter.split(X, y, groups=groups))
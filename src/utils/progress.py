@@ -0,0 +1,134 @@
+# progress / throughput tracking for long batch runs
+#
+# reports bags/s, messages/s, MB/s and ETA. every update can go out as a JSON
+# line (to a log file, or stdout with "-") and into a prometheus textfile
+# collector file that gets rewritten atomically while the run goes on.
+
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+
+def _fmt_eta(secs):
+    if secs is None:
+        return "?"
+    secs = int(secs)
+    if secs >= 3600:
+        return f"{secs // 3600}h {(secs % 3600) // 60}m"
+    if secs >= 60:
+        return f"{secs // 60}m {secs % 60}s"
+    return f"{secs}s"
+
+
+class ProgressTracker:
+
+    def __init__(self, total, stage, log_path=None, metrics_path=None, verbose=True):
+        self.total = int(total)
+        self.stage = stage
+        self.log_path = log_path
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+        self.verbose = verbose
+
+        self.done = 0
+        self.failed = 0
+        self.msgs = 0
+        self.nbytes = 0
+        self.t0 = time.monotonic()
+
+        if self.log_path and self.log_path != "-":
+            Path(self.log_path).parent.mkdir(parents=True, exist_ok=True)
+        if self.metrics_path:
+            self.metrics_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def snapshot(self):
+        elapsed = time.monotonic() - self.t0
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+
+        eta = None
+        if rate > 0:
+            eta = (self.total - self.done) / rate
+
+        return {
+            "stage": self.stage,
+            "done": self.done,
+            "total": self.total,
+            "failed": self.failed,
+            "messages": self.msgs,
+            "bytes": self.nbytes,
+            "elapsed_s": round(elapsed, 3),
+            "bags_per_s": round(rate, 4),
+            "msgs_per_s": round(self.msgs / elapsed, 1) if elapsed > 0 else 0.0,
+            "mb_per_s": round(self.nbytes / 1e6 / elapsed, 3) if elapsed > 0 else 0.0,
+            "eta_s": round(eta, 1) if eta is not None else None,
+        }
+
+    def update(self, name, msgs=0, nbytes=0, ok=True):
+        # one call per finished (or failed) bag
+        self.done += 1
+        if ok:
+            self.msgs += int(msgs)
+            self.nbytes += int(nbytes)
+        else:
+            self.failed += 1
+
+        snap = self.snapshot()
+        self._emit("bag", snap, bag=name, ok=ok)
+        return snap
+
+    def finish(self):
+        snap = self.snapshot()
+        self._emit("done", snap)
+        return snap
+
+    def _emit(self, event, snap, **extra):
+        if self.log_path:
+            rec = {"ts": time.time(), "event": event}
+            rec.update(extra)
+            rec.update(snap)
+            line = json.dumps(rec)
+            if self.log_path == "-":
+                print(line)
+                sys.stdout.flush()
+            else:
+                with open(self.log_path, "a") as f:
+                    f.write(line + "\n")
+        elif self.verbose and event == "bag":
+            print(
+                f"   {snap['done']}/{snap['total']} bags | {snap['bags_per_s']:.2f} bags/s | "
+                f"{snap['msgs_per_s']:,.0f} msg/s | {snap['mb_per_s']:.1f} MB/s | "
+                f"ETA {_fmt_eta(snap['eta_s'])}"
+            )
+
+        if self.metrics_path:
+            self._write_metrics(snap)
+
+    def _write_metrics(self, snap):
+        label = f'{{stage="{self.stage}"}}'
+        metrics = [
+            ("swp_bags_total", "Bags scheduled in this run", snap["total"]),
+            ("swp_bags_done", "Bags finished (ok or failed)", snap["done"]),
+            ("swp_bags_failed", "Bags that failed", snap["failed"]),
+            ("swp_messages_processed", "Messages processed so far", snap["messages"]),
+            ("swp_bytes_processed", "Bag bytes processed so far", snap["bytes"]),
+            ("swp_bags_per_second", "Bag throughput", snap["bags_per_s"]),
+            ("swp_messages_per_second", "Message throughput", snap["msgs_per_s"]),
+            ("swp_megabytes_per_second", "Bag read throughput in MB/s", snap["mb_per_s"]),
+            ("swp_eta_seconds", "Estimated seconds left (-1 if unknown)",
+             snap["eta_s"] if snap["eta_s"] is not None else -1),
+            ("swp_elapsed_seconds", "Seconds since the run started", snap["elapsed_s"]),
+            ("swp_last_update_timestamp_seconds", "Unix time of last update", round(time.time(), 3)),
+        ]
+
+        lines = []
+        for name, help_text, value in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{label} {value}")
+
+        # textfile collector wants atomic replace, never a half written file
+        tmp = self.metrics_path.with_name(self.metrics_path.name + f".{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp, self.metrics_path)
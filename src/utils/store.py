@@ -0,0 +1,161 @@
+# embedded results store (sqlite) for proxy results and feature slices
+#
+# both tables grow a column whenever rows bring a new key, so the store
+# follows the csv layouts without a fixed schema. rows are keyed so that
+# re-running a bag replaces its rows instead of duplicating them:
+#   proxy_results: (database_path, vehicle_id)
+#   features:      (database_path, bag_name, slicing)   slicing is e.g. "time:60",
+#                  "time:60:vehicle" for per-vehicle rows
+# storing a bag's features first deletes its earlier rows with the same
+# slicing, so a re-run with fewer slices leaves nothing stale behind.
+# run_id, scenario and slice_idx are indexed.
+
+import re
+import sqlite3
+from pathlib import Path
+
+SCENARIO_PATTERN = re.compile(r"^S\d+$")
+
+TABLES = {
+    "proxy_results": {"key": ["database_path", "vehicle_id"], "index": ["run_id", "scenario"]},
+    "features": {"key": ["database_path", "bag_name", "slicing"], "index": ["run_id", "scenario", "slice_idx"]},
+}
+
+
+def scenario_of(path):
+    # dataset folders are S1, S2, ... ; the closest one to the file wins.
+    # proxy_results.csv written on windows holds backslash paths
+    for part in reversed(Path(str(path).replace("\\", "/")).parts[:-1]):
+        if SCENARIO_PATTERN.match(part):
+            return part
+    return None
+
+
+def _sql_type(value):
+    if isinstance(value, bool) or isinstance(value, int):
+        return "INTEGER"
+    if isinstance(value, float):
+        return "REAL"
+    return "TEXT"
+
+
+def _clean(value):
+    # "N/A" in the csv rows is a real NULL here
+    if value == "N/A":
+        return None
+    return value
+
+
+class ResultsStore:
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def columns(self, table):
+        cur = self.conn.execute(f"PRAGMA table_info({table})")
+        return [r[1] for r in cur.fetchall()]
+
+    def _ensure_table(self, table, rows):
+        spec = TABLES[table]
+        have = self.columns(table)
+
+        # first non-null value decides a new column's type. a column that is
+        # all NULL so far gets NUMERIC affinity: later numbers are stored as
+        # numbers (TEXT would keep them as text and "lidar_ratio > 0.4" would
+        # compare strings), later strings still stay text
+        types = {}
+        for r in rows:
+            for k, v in r.items():
+                v = _clean(v)
+                if k not in types or (types[k] is None and v is not None):
+                    types[k] = _sql_type(v) if v is not None else None
+
+        if not have:
+            cols = ", ".join(f'"{k}" {t or "NUMERIC"}' for k, t in types.items())
+            key = ", ".join(f'"{k}"' for k in spec["key"])
+            self.conn.execute(f'CREATE TABLE {table} ({cols}, PRIMARY KEY ({key}))')
+            for col in spec["index"]:
+                self.conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table} ("{col}")')
+        else:
+            for k, t in types.items():
+                if k not in have:
+                    self.conn.execute(f'ALTER TABLE {table} ADD COLUMN "{k}" {t or "NUMERIC"}')
+
+    def _upsert(self, table, rows, clear=None):
+        # clear: columns whose value combinations in rows are deleted first
+        if not rows:
+            return 0
+        self._ensure_table(table, rows)
+        cols = self.columns(table)
+        names = ", ".join(f'"{c}"' for c in cols)
+        marks = ", ".join("?" for _ in cols)
+        with self.conn:
+            if clear:
+                cond = " AND ".join(f'"{c}" = ?' for c in clear)
+                old = {tuple(_clean(r.get(c)) for c in clear) for r in rows}
+                self.conn.executemany(f"DELETE FROM {table} WHERE {cond}", sorted(old, key=str))
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {table} ({names}) VALUES ({marks})",
+                ([_clean(r.get(c)) for c in cols] for r in rows),
+            )
+        return len(rows)
+
+    def add_proxy_rows(self, rows):
+        # rows as written to proxy_results.csv
+        out = []
+        for r in rows:
+            r = dict(r)
+            r["run_id"] = r["database_name"]
+            r["scenario"] = scenario_of(r["database_path"])
+            out.append(r)
+        return self._upsert("proxy_results", out)
+
+    def add_feature_rows(self, rows, slicing, db_paths):
+        # rows as written to features.csv, db_paths[i] is the bag of rows[i]
+        out = []
+        for r, db in zip(rows, db_paths):
+            r = dict(r)
+            r["database_path"] = str(db)
+            r["scenario"] = scenario_of(db)
+            r["slicing"] = slicing
+            out.append(r)
+        return self._upsert("features", out, clear=["database_path", "slicing"])
+
+    def slicings(self):
+        # distinct slicing keys in the features table, e.g. ["time:60", "time:60:vehicle"]
+        if "slicing" not in self.columns("features"):
+            return []
+        return [r[0] for r in self.conn.execute("SELECT DISTINCT slicing FROM features ORDER BY slicing")]
+
+    def query(self, table, where=None, params=(), columns=None, limit=None):
+        # DataFrame of the matching rows. where is a plain SQL condition,
+        # e.g. "scenario = ? AND lidar_ratio > ?" with params ("S3", 0.4)
+        import pandas as pd
+
+        if table not in TABLES:
+            raise ValueError(f"unknown table '{table}', use one of {list(TABLES)}")
+        have = self.columns(table)
+        if not have:
+            return pd.DataFrame()
+        if columns is not None:
+            cols = ", ".join(f'"{c}"' for c in columns if c in have)
+        else:
+            cols = "*"
+        sql = f"SELECT {cols} FROM {table}"
+        if where:
+            sql += f" WHERE {where}"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return pd.read_sql_query(sql, self.conn, params=params)
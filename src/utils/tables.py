@@ -0,0 +1,140 @@
+# result tables: csv (default) or parquet
+#
+# the csv files keep their old layout ("N/A" / empty cells for missing
+# values). parquet gets typed columns with real nulls, and readers can
+# project just the columns they need. pandas is only imported by the
+# functions that build or read DataFrames.
+
+import csv
+from pathlib import Path
+
+OUTPUT_FORMATS = ("csv", "parquet")
+
+
+def parquet_engine():
+    # pandas needs pyarrow or fastparquet for parquet, fail early and clearly
+    for engine in ("pyarrow", "fastparquet"):
+        try:
+            __import__(engine)
+            return engine
+        except ImportError:
+            pass
+    raise RuntimeError("parquet output needs pyarrow or fastparquet (pip install pyarrow), or use --format csv")
+
+
+def with_format(path, fmt):
+    # parquet always gets .parquet, csv keeps whatever suffix it was given
+    path = Path(path)
+    if fmt == "parquet" or not path.suffix:
+        return path.with_suffix(f".{fmt}")
+    return path
+
+
+def typed_frame(rows):
+    # list of row dicts -> DataFrame with "N/A"/None as NaN and numeric columns as numbers
+    import numpy as np
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    df = df.replace({"N/A": np.nan})
+    for col in df.columns:
+        if df[col].dtype == object:
+            conv = pd.to_numeric(df[col], errors="coerce")
+            # only when every non-null value was a number
+            if conv.notna().sum() == df[col].notna().sum():
+                df[col] = conv
+    return df
+
+
+def write_rows(rows, path, fmt="csv"):
+    # writes the rows to path (suffix follows fmt), returns the path written
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"unknown format '{fmt}', use one of {OUTPUT_FORMATS}")
+    path = with_format(path, fmt)
+
+    if fmt == "parquet":
+        typed_frame(rows).to_parquet(path, index=False, engine=parquet_engine())
+        return path
+
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+def table_columns(path):
+    # column names without reading the data
+    path = Path(path)
+    if path.suffix == ".parquet":
+        engine = parquet_engine()
+        if engine == "pyarrow":
+            import pyarrow.parquet as pq
+            return pq.read_schema(path).names
+        from fastparquet import ParquetFile
+        return list(ParquetFile(path).columns)
+    with open(path, newline="") as f:
+        return [c.strip() for c in next(csv.reader(f), [])]
+
+
+def read_table(path, columns=None):
+    # DataFrame from a csv or parquet result table. columns that don't exist
+    # in the file are left out instead of raising
+    import pandas as pd
+
+    path = Path(path)
+    if columns is not None:
+        have = set(table_columns(path))
+        columns = [c for c in columns if c in have]
+
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=columns, engine=parquet_engine())
+
+    df = pd.read_csv(path, usecols=(lambda c: c.strip() in columns) if columns is not None else None)
+    df.columns = [c.strip() for c in df.columns]
+    return df
+
+
+def iter_table(path, columns=None, batch_rows=200_000):
+    # DataFrames of at most batch_rows rows, without holding the whole table:
+    # csv in chunks, parquet by record batch (pyarrow) or row group (fastparquet)
+    import pandas as pd
+
+    path = Path(path)
+    if columns is not None:
+        have = set(table_columns(path))
+        columns = [c for c in columns if c in have]
+
+    if path.suffix == ".parquet":
+        engine = parquet_engine()
+        if engine == "pyarrow":
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows, columns=columns):
+                yield batch.to_pandas()
+        else:
+            from fastparquet import ParquetFile
+            for df in ParquetFile(path).iter_row_groups(columns=columns):
+                for a in range(0, len(df), batch_rows):
+                    yield df.iloc[a:a + batch_rows]
+        return
+
+    reader = pd.read_csv(path, usecols=(lambda c: c.strip() in columns) if columns is not None else None,
+                         chunksize=batch_rows)
+    for chunk in reader:
+        chunk.columns = [c.strip() for c in chunk.columns]
+        yield chunk
+
+
+def find_table(directory, stem):
+    # <directory>/<stem>.parquet or .csv, whichever was written last when
+    # both exist (a stale parquet must not shadow a fresh csv). the .csv
+    # path if neither exists
+    directory = Path(directory)
+    found = [p for p in (directory / f"{stem}.parquet", directory / f"{stem}.csv") if p.exists()]
+    if len(found) == 0:
+        return directory / f"{stem}.csv"
+    newest = max(found, key=lambda p: p.stat().st_mtime)
+    if len(found) == 2 and found[0].stat().st_mtime != found[1].stat().st_mtime:
+        older = found[1] if newest is found[0] else found[0]
+        print(f"Warning: both {newest.name} and {older.name} in {directory}, using the newer {newest.name}")
+    return newest